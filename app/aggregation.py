@@ -0,0 +1,174 @@
+# app/aggregation.py
+"""
+Columnar aggregation engine for visibility scoring and competitor statistics.
+
+Model results are converted once into NumPy columns (presence, rank, accuracy
+per response), an interned competitor x response incidence matrix and interned
+source occurrences. Scores, mention rates, average ranks and prompt/source
+association are then computed with vectorized operations instead of nested
+Python loops and list-membership checks.
+"""
+
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+from app.schemas import ModelResponse, SearchSource
+
+# Rank -> points (STRICT rank-based scoring); mentioned without a rank scores 15
+RANK_POINTS = ((1, 100), (2, 80), (3, 60), (5, 40))
+BURIED_POINTS = 25
+UNRANKED_POINTS = 15
+
+
+@dataclass
+class AuditColumns:
+    presence: np.ndarray          # bool[R]   brand mentioned in response r
+    ranks: np.ndarray             # float[R]  recommendation rank (NaN if none)
+    accuracy: np.ndarray          # float[R]  accuracy score
+    prompt_ids: np.ndarray        # int[R]    interned prompt text per response
+    prompt_texts: List[str]       # prompt id -> text
+    competitor_names: List[str]   # competitor id -> name (first-mention order)
+    mention_counts: np.ndarray    # int[C, R] 1 if competitor c was mentioned in response r
+    rank_pairs: np.ndarray        # int[K, 2] (competitor id, rank) for every reported rank
+    sources: List[SearchSource]   # source id -> first SearchSource seen for that URL
+    source_rows: np.ndarray       # int[M]    response index of each source occurrence (response order)
+    source_ids: np.ndarray        # int[M]    interned source id of each occurrence
+
+
+@dataclass
+class CompetitorStats:
+    name: str
+    mentions: int
+    avg_rank: Optional[float]
+    prompts: List[str] = field(default_factory=list)
+    sources: List[SearchSource] = field(default_factory=list)
+
+
+def build_columns(model_results: List[ModelResponse], prompt_texts: List[str], resolve: Optional[Callable[[str], str]] = None) -> AuditColumns:
+    """
+    Single pass over the results, interning prompts, competitors and source URLs.
+    `resolve` maps raw competitor names to canonical ones (see app.entity_resolution);
+    a competitor counts once per response even if named in several forms.
+    """
+    resolve = resolve or (lambda name: name)
+    n = len(model_results)
+    presence = np.zeros(n, dtype=bool)
+    ranks = np.full(n, np.nan)
+    accuracy = np.zeros(n)
+    prompt_ids = np.zeros(n, dtype=np.int64)
+
+    prompt_index: Dict[str, int] = {}
+    comp_index: Dict[str, int] = {}
+    source_index: Dict[str, int] = {}
+    sources: List[SearchSource] = []
+    mention_r, mention_c = [], []
+    rank_c, rank_v = [], []
+    src_r, src_s = [], []
+
+    for r, result in enumerate(model_results):
+        ev = result.evaluation
+        presence[r] = ev.brand_present
+        if ev.recommendation_rank:
+            ranks[r] = ev.recommendation_rank
+        accuracy[r] = ev.accuracy_score
+
+        text = prompt_texts[r] if r < len(prompt_texts) else "Unknown Query"
+        prompt_ids[r] = prompt_index.setdefault(text, len(prompt_index))
+
+        in_response = set()
+        for name in ev.competitors_mentioned:
+            c = comp_index.setdefault(resolve(name), len(comp_index))
+            if c not in in_response:
+                in_response.add(c)
+                mention_r.append(r)
+                mention_c.append(c)
+
+        for c in ev.competitor_ranks:
+            if c.rank is not None:
+                rank_c.append(resolve(c.name))
+                rank_v.append(c.rank)
+
+        for src in result.sources:
+            s = source_index.get(src.url)
+            if s is None:
+                s = source_index[src.url] = len(sources)
+                sources.append(src)
+            src_r.append(r)
+            src_s.append(s)
+
+    mention_counts = np.zeros((len(comp_index), n), dtype=np.int64)
+    np.add.at(mention_counts, (np.asarray(mention_c, dtype=np.int64), np.asarray(mention_r, dtype=np.int64)), 1)
+
+    # Ranks only count for competitors that were actually mentioned
+    pairs = [(comp_index[name], rank) for name, rank in zip(rank_c, rank_v) if name in comp_index]
+    rank_pairs = np.asarray(pairs, dtype=np.int64).reshape(-1, 2)
+
+    return AuditColumns(
+        presence=presence,
+        ranks=ranks,
+        accuracy=accuracy,
+        prompt_ids=prompt_ids,
+        prompt_texts=list(prompt_index),
+        competitor_names=list(comp_index),
+        mention_counts=mention_counts,
+        rank_pairs=rank_pairs,
+        sources=sources,
+        source_rows=np.asarray(src_r, dtype=np.int64),
+        source_ids=np.asarray(src_s, dtype=np.int64),
+    )
+
+
+def score_responses(cols: AuditColumns) -> np.ndarray:
+    """Per-response visibility score (0-100) with the accuracy penalty applied."""
+    ranks = cols.ranks
+    with np.errstate(invalid="ignore"):
+        conditions = [ranks <= limit for limit, _ in RANK_POINTS] + [ranks > RANK_POINTS[-1][0]]
+    points = np.select(conditions, [p for _, p in RANK_POINTS] + [BURIED_POINTS], default=UNRANKED_POINTS)
+    return np.where(cols.presence, points * (0.5 + cols.accuracy * 0.5), 0.0)
+
+
+def _first_occurrences(values: np.ndarray) -> np.ndarray:
+    """Distinct values in order of first occurrence."""
+    if not len(values):
+        return values
+    _, first = np.unique(values, return_index=True)
+    return values[np.sort(first)]
+
+
+def competitor_stats(cols: AuditColumns, max_prompts: Optional[int] = None, max_sources: Optional[int] = None) -> List[CompetitorStats]:
+    """
+    Competitor statistics sorted by mentions (ties keep first-mention order).
+    avg_rank is the mean of the distinct ranks a competitor was given.
+    """
+    n_comp = len(cols.competitor_names)
+    if n_comp == 0:
+        return []
+
+    mentions = cols.mention_counts.sum(axis=1)
+    incidence = cols.mention_counts > 0  # C x R
+
+    # Mean of distinct (competitor, rank) pairs
+    avg_rank = np.full(n_comp, np.nan)
+    if len(cols.rank_pairs):
+        unique_pairs = np.unique(cols.rank_pairs, axis=0)
+        counts = np.bincount(unique_pairs[:, 0], minlength=n_comp)
+        totals = np.bincount(unique_pairs[:, 0], weights=unique_pairs[:, 1], minlength=n_comp)
+        has_rank = counts > 0
+        avg_rank[has_rank] = totals[has_rank] / counts[has_rank]
+
+    stats = []
+    for c in np.argsort(-mentions, kind="stable"):
+        in_response = incidence[c]
+        # Distinct prompts / sources in order of first appearance alongside this competitor
+        prompt_ids = _first_occurrences(cols.prompt_ids[in_response])[:max_prompts]
+        source_ids = _first_occurrences(cols.source_ids[in_response[cols.source_rows]])[:max_sources]
+        stats.append(CompetitorStats(
+            name=cols.competitor_names[c],
+            mentions=int(mentions[c]),
+            avg_rank=None if np.isnan(avg_rank[c]) else float(avg_rank[c]),
+            prompts=[cols.prompt_texts[p] for p in prompt_ids],
+            sources=[cols.sources[s] for s in source_ids],
+        ))
+    return stats
@@ -3,57 +3,42 @@
 import json
 import time
 import random
-from datetime import datetime, timedelta
-from google import genai
-from google.genai import types
-from cerebras.cloud.sdk import Cerebras
-from openai import OpenAI
-from app.config import GEMINI_API_KEY, GEMINI_MODEL_NAME, CEREBRAS_API_KEY, CEREBRAS_MODEL_NAME, OPENROUTER_API_KEY, OPENROUTER_MODEL_NAME
-
-# Provider State Management
-class ProviderState:
-    def __init__(self):
-        self.disabled_until = {} # provider_name -> datetime
-        self.temp_disabled = {
-            "openrouter": True # TEMP DISABLED until auth verified
-        }
+import threading
+from functools import lru_cache, partial
+from typing import Any, Callable, Dict, Tuple
+from app.config import GEMINI_API_KEY, GEMINI_MODEL_NAME, CEREBRAS_API_KEY, CEREBRAS_MODEL_NAME, OPENROUTER_API_KEY, OPENROUTER_MODEL_NAME, OFFLINE_MODE
+from app.config import GEMINI_BASE_URL, CEREBRAS_BASE_URL, OPENROUTER_BASE_URL
+# Provider health (quota disables, circuit breaker, rate limits) is shared by all worker processes
+from app.provider_health import provider_health
+from app.simulated_provider import generate_simulated_response
+from app.recorder import recorder, encode_provider_result, decode_provider_result
+from app.telemetry import provider_call, record_retry
+from app.structured_logging import get_logger
 
-    def is_enabled(self, name):
-        if self.temp_disabled.get(name):
-            return False
-        until = self.disabled_until.get(name)
-        if until and datetime.now() < until:
-            return False
-        return True
-
-    def disable(self, name, hours=24):
-        print(f"[CRITICAL] Disabling provider '{name}' for {hours} hours due to quota limits.")
-        self.disabled_until[name] = datetime.now() + timedelta(hours=hours)
-
-provider_state = ProviderState()
-
-# Initialize Gemini Client (Official Modern SDK)
-gemini_client = None
-grounding_tool = None  # Google Search tool configuration
-
-if GEMINI_API_KEY:
-    gemini_client = genai.Client(api_key=GEMINI_API_KEY)
-    # Use Google Search tool for grounding (Modern SDK way for Gemini 2.0+)
-    grounding_tool = types.Tool(
-        google_search=types.GoogleSearch()
-    )
-    print(f"[INFO] Gemini client initialized with Google Search grounding support")
-
-# Initialize Cerebras Client
-cerebras_client = None
-if CEREBRAS_API_KEY:
-    cerebras_client = Cerebras(api_key=CEREBRAS_API_KEY)
-
-# Initialize OpenRouter Client (GPT-OSS)
-openrouter_client = None
-if OPENROUTER_API_KEY:
-    openrouter_client = OpenAI(
-        base_url="https://openrouter.ai/api/v1",
+logger = get_logger(__name__)
+
+# Provider SDK clients are built on first use. Importing google-genai, the Cerebras SDK
+# and OpenAI costs over a second, which the CLI, workers and offline runs shouldn't pay
+# for providers they never call.
+
+def _build_gemini():
+    # Official Modern SDK
+    from google import genai
+    from google.genai import types
+    http_options = types.HttpOptions(base_url=GEMINI_BASE_URL) if GEMINI_BASE_URL else None
+    client = genai.Client(api_key=GEMINI_API_KEY, http_options=http_options)
+    logger.info("Gemini client initialized with Google Search grounding support")
+    return client
+
+def _build_cerebras():
+    from cerebras.cloud.sdk import Cerebras
+    return Cerebras(api_key=CEREBRAS_API_KEY, base_url=CEREBRAS_BASE_URL)
+
+def _build_openrouter():
+    # GPT-OSS via OpenRouter's OpenAI-compatible API
+    from openai import OpenAI
+    return OpenAI(
+        base_url=OPENROUTER_BASE_URL,
         api_key=OPENROUTER_API_KEY,
         default_headers={
             "HTTP-Referer": "http://localhost:8000",
@@ -61,61 +46,178 @@ if OPENROUTER_API_KEY:
         }
     )
 
-def generate_ai_response(prompt: str, provider: str = "gemini", response_mime_type: str = "text/plain", use_search: bool = False, return_full_response: bool = False) -> any:
+# provider -> (configured?, factory)
+_CLIENT_FACTORIES: Dict[str, Tuple[bool, Callable[[], Any]]] = {
+    "gemini": (bool(GEMINI_API_KEY), _build_gemini),
+    "cerebras": (bool(CEREBRAS_API_KEY), _build_cerebras),
+    "openrouter": (bool(OPENROUTER_API_KEY), _build_openrouter),
+}
+_clients: Dict[str, Any] = {}
+_clients_lock = threading.Lock()
+
+def has_provider(name: str) -> bool:
+    """True when the provider is configured (API key set). Never imports an SDK."""
+    entry = _CLIENT_FACTORIES.get(name)
+    return bool(entry and entry[0])
+
+def get_client(name: str) -> Any:
+    """The provider's SDK client, built on first use; None when the provider isn't configured."""
+    client = _clients.get(name)
+    if client is None and has_provider(name):
+        with _clients_lock:
+            client = _clients.get(name)
+            if client is None:
+                client = _clients[name] = _CLIENT_FACTORIES[name][1]()
+    return client
+
+@lru_cache(maxsize=1)
+def _grounding_tool():
+    # Google Search tool for grounding (Modern SDK way for Gemini 2.0+)
+    from google.genai import types
+    return types.Tool(google_search=types.GoogleSearch())
+
+def _openai_response_format(response_mime_type: str, response_schema=None):
+    """OpenAI-style response_format: json_schema when a pydantic schema is given, else json_object."""
+    if response_mime_type != "application/json":
+        return None
+    if response_schema is not None:
+        return {
+            "type": "json_schema",
+            "json_schema": {
+                "name": response_schema.__name__,
+                "schema": response_schema.model_json_schema(),
+                "strict": False
+            }
+        }
+    return {"type": "json_object"}
+
+def _error_headers(error: Exception):
+    """Response headers attached to SDK HTTP errors (rate-limit state, retry-after), if any."""
+    return getattr(getattr(error, "response", None), "headers", None)
+
+def _record_failure(name: str, error: Exception):
+    # A rejected response schema is a request problem, not provider ill health
+    err_str = str(error).lower()
+    if "schema" in err_str or "response_format" in err_str:
+        return
+    provider_health.record_failure(name, error, _error_headers(error))
+
+def _record_usage(call, response):
+    # OpenAI-compatible usage block (Cerebras, OpenRouter)
+    usage = getattr(response, "usage", None)
+    if usage is not None:
+        call.usage(usage.prompt_tokens, usage.completion_tokens)
+
+def generate_ai_response(prompt: str, provider: str = "gemini", response_mime_type: str = "text/plain", use_search: bool = False, return_full_response: bool = False, response_schema=None) -> any:
+    """
+    Unified interface to generate content from different providers (see _generate_ai_response).
+    With GEO_RECORD / GEO_REPLAY set, calls are recorded to or served from an archive (app.recorder).
+    """
+    call = partial(_generate_ai_response, prompt, provider=provider, response_mime_type=response_mime_type, use_search=use_search, return_full_response=return_full_response, response_schema=response_schema)
+    if not recorder.active:
+        return call()
+    request = {
+        "prompt": prompt,
+        "provider": provider,
+        "response_mime_type": response_mime_type,
+        "use_search": use_search,
+        "return_full_response": return_full_response,
+        "response_schema": response_schema.__name__ if response_schema is not None else None,
+    }
+    return recorder.call("provider", request, call, encode=encode_provider_result, decode=decode_provider_result)
+
+def _generate_ai_response(prompt: str, provider: str = "gemini", response_mime_type: str = "text/plain", use_search: bool = False, return_full_response: bool = False, response_schema=None) -> any:
     """
-    Unified interface to generate content from different providers (Gemini, Cerebras, or OpenRouter).
+    Unified interface to generate content from different providers (Gemini, Cerebras, OpenRouter,
+    or the offline "simulated" backend, which OFFLINE_MODE forces for every call).
     Includes retry logic for rate limits and hard-disabling on quota hits.
+    `response_schema` (a pydantic model) enables schema-constrained JSON output where supported.
     """
     
     max_retries = 3
     base_delay = 2
     
     last_exception = None
+
+    if OFFLINE_MODE:
+        provider = "simulated"
     
     for attempt in range(max_retries):
         try:
+            # 0. Simulated (offline load tests / benchmarks; never falls back to a real provider)
+            if provider == "simulated":
+                if not provider_health.is_enabled("simulated"):
+                    raise ValueError("Provider 'simulated' is temporarily unavailable (circuit open or disabled).")
+                try:
+                    with provider_call("simulated", attempt=attempt):
+                        result = generate_simulated_response(prompt, response_mime_type=response_mime_type, use_search=use_search, return_full_response=return_full_response, response_schema=response_schema)
+                    provider_health.record_success("simulated")
+                    return result
+                except Exception as e:
+                    _record_failure("simulated", e)
+                    if "429" in str(e) or "quota" in str(e).lower():
+                        record_retry("simulated")
+                        delay = base_delay * (2 ** attempt) + random.uniform(0, 1)
+                        time.sleep(delay)
+                        continue
+                    raise e
+
             # 1. OpenRouter (Claude via GPT-OSS)
-            if provider == "openrouter" and openrouter_client and provider_state.is_enabled("openrouter"):
+            if provider == "openrouter" and has_provider("openrouter") and provider_health.is_enabled("openrouter"):
                 try:
-                    response = openrouter_client.chat.completions.create(
-                        model=OPENROUTER_MODEL_NAME,
-                        messages=[{"role": "user", "content": prompt}],
-                        response_format={"type": "json_object"} if response_mime_type == "application/json" else None
-                    )
+                    with provider_call("openrouter", attempt=attempt) as call:
+                        raw = get_client("openrouter").chat.completions.with_raw_response.create(
+                            model=OPENROUTER_MODEL_NAME,
+                            messages=[{"role": "user", "content": prompt}],
+                            response_format=_openai_response_format(response_mime_type, response_schema)
+                        )
+                        response = raw.parse()
+                        _record_usage(call, response)
+                    provider_health.record_success("openrouter", raw.headers)
                     return response.choices[0].message.content
                 except Exception as e:
                     err_str = str(e).lower()
+                    _record_failure("openrouter", e)
                     if "401" in err_str or "auth" in err_str:
-                        print(f"[ERROR] OpenRouter Authentication Failed. Disabling until manual fix.")
-                        provider_state.temp_disabled["openrouter"] = True
+                        logger.error("OpenRouter authentication failed; disabling until manual fix", extra={"provider": "openrouter"})
+                        provider_health.disable("openrouter", hours=24, reason="authentication failure")
                         provider = "gemini" # Fallback
                     elif "429" in err_str or "quota" in err_str:
-                        print(f"[WARNING] OpenRouter Rate Limit. Retrying...")
+                        logger.warning("OpenRouter rate limit; retrying", extra={"provider": "openrouter", "attempt": attempt})
+                        record_retry("openrouter")
                         delay = base_delay * (2 ** attempt) + random.uniform(0, 1)
                         time.sleep(delay)
                         continue
                     else:
-                        print(f"[WARNING] OpenRouter error: {e}. Falling back to Gemini.")
+                        logger.warning("OpenRouter error; falling back to Gemini", extra={"provider": "openrouter", "error": str(e)})
                         provider = "gemini"
 
             # 2. Cerebras
-            if provider == "cerebras" and cerebras_client and provider_state.is_enabled("cerebras"):
+            if provider == "cerebras" and has_provider("cerebras") and provider_health.is_enabled("cerebras"):
                 try:
-                    response = cerebras_client.chat.completions.create(
-                        messages=[{"role": "user", "content": prompt}],
-                        model=CEREBRAS_MODEL_NAME,
-                        response_format={"type": "json_object"} if response_mime_type == "application/json" else None
-                    )
+                    with provider_call("cerebras", attempt=attempt) as call:
+                        raw = get_client("cerebras").chat.completions.with_raw_response.create(
+                            messages=[{"role": "user", "content": prompt}],
+                            model=CEREBRAS_MODEL_NAME,
+                            response_format=_openai_response_format(response_mime_type, response_schema)
+                        )
+                        response = raw.parse()
+                        _record_usage(call, response)
+                    provider_health.record_success("cerebras", raw.headers)
                     return response.choices[0].message.content
                 except Exception as e:
                     err_data = str(e).lower()
+                    _record_failure("cerebras", e)
                     if "token_quota_exceeded" in err_data or "quota" in err_data:
-                        print(f"[STOP] Cerebras daily/token quota hit.")
-                        provider_state.disable("cerebras", hours=24)
+                        logger.error("Cerebras daily/token quota hit; switching to Gemini", extra={"provider": "cerebras"})
+                        # Shared with every worker: none of them will try Cerebras again until it expires
+                        provider_health.disable("cerebras", hours=24)
                         provider = "gemini" # Immediate switch
-                        return generate_ai_response(prompt, provider="gemini", response_mime_type=response_mime_type, use_search=use_search)
+                        record_retry("cerebras", "quota_fallback")
+                        return _generate_ai_response(prompt, provider="gemini", response_mime_type=response_mime_type, use_search=use_search, response_schema=response_schema)
                     
                     if "429" in err_data:
+                        record_retry("cerebras")
                         delay = base_delay * (2 ** attempt) + random.uniform(0, 1)
                         time.sleep(delay)
                         continue
@@ -123,23 +225,36 @@ def generate_ai_response(prompt: str, provider: str = "gemini", response_mime_ty
                     provider = "gemini" # Fallback
 
             # Default: Gemini
+            gemini_client = get_client("gemini")
             if gemini_client:
+                if not provider_health.is_enabled("gemini"):
+                    # Circuit open / quota exhausted: fail fast instead of making a call that will fail
+                    raise ValueError("Provider 'gemini' is temporarily unavailable (circuit open or disabled).")
                 try:
+                    from google.genai import types  # Already imported by get_client("gemini")
                     config_params = {}
                     
                     # Rule: Gemini WITH search -> Free text ONLY (NO JSON mode at the same time)
-                    if use_search and grounding_tool and response_mime_type != "application/json":
-                        config_params["tools"] = [grounding_tool]
+                    if use_search and response_mime_type != "application/json":
+                        config_params["tools"] = [_grounding_tool()]
                     elif response_mime_type == "application/json":
                         config_params["response_mime_type"] = "application/json"
+                        if response_schema is not None:
+                            config_params["response_schema"] = response_schema
                     
                     config = types.GenerateContentConfig(**config_params) if config_params else None
                     
-                    response = gemini_client.models.generate_content(
-                        model=GEMINI_MODEL_NAME,
-                        contents=prompt,
-                        config=config
-                    )
+                    with provider_call("gemini", attempt=attempt, search=bool(config_params.get("tools"))) as call:
+                        response = gemini_client.models.generate_content(
+                            model=GEMINI_MODEL_NAME,
+                            contents=prompt,
+                            config=config
+                        )
+                        usage = getattr(response, "usage_metadata", None)
+                        if usage is not None:
+                            call.usage(usage.prompt_token_count, usage.candidates_token_count)
+                    http_response = getattr(response, "sdk_http_response", None)
+                    provider_health.record_success("gemini", getattr(http_response, "headers", None))
                     
                     # Handle return types
                     if return_full_response:
@@ -148,7 +263,9 @@ def generate_ai_response(prompt: str, provider: str = "gemini", response_mime_ty
                         return response.text
                     return response.text
                 except Exception as e:
+                    _record_failure("gemini", e)
                     if "429" in str(e) or "quota" in str(e).lower():
+                        record_retry("gemini")
                         delay = base_delay * (2 ** attempt) + random.uniform(0, 1)
                         time.sleep(delay)
                         continue
@@ -0,0 +1,188 @@
+# app/audit_store.py
+"""
+Persistent audit history.
+
+Each VisibilityReport from /evaluate-all is written in one transaction: a single
+Audit row followed by bulk inserts for prompts, responses, sources and
+competitor mentions. Trend queries answer from the (company, created_at) and
+(competitor, created_at) indexes without loading stored reports.
+"""
+
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from sqlalchemy import func, insert
+from sqlalchemy.orm import Session
+
+from app.database import DATABASE_URL, SessionLocal
+from app.entity_resolution import competitor_resolver
+from app.models import Audit, AuditPrompt, AuditResponse, AuditSource, CompetitorMention
+from app.rollups import update_rollups
+from app.schemas import CompanyUnderstanding, GeneratedPrompt, VisibilityReport
+from app.structured_logging import get_logger
+
+logger = get_logger(__name__)
+
+
+def save_audit(db: Session, company: CompanyUnderstanding, prompts: List[GeneratedPrompt], report: VisibilityReport, provider: str, use_google_search: bool = False) -> int:
+    """Write a full audit in one transaction using bulk inserts. Returns the audit id."""
+    created_at = datetime.utcnow()
+    results = report.model_results
+    ranks = [r.evaluation.recommendation_rank for r in results if r.evaluation.brand_present and r.evaluation.recommendation_rank]
+
+    try:
+        audit = Audit(
+            company=company.company_name,
+            company_url=company.url,
+            region=company.region,
+            provider=provider,
+            use_google_search=use_google_search,
+            overall_score=report.overall_score,
+            prompt_count=len(prompts),
+            mention_count=sum(1 for r in results if r.evaluation.brand_present),
+            avg_rank=sum(ranks) / len(ranks) if ranks else None,
+            avg_accuracy=sum(r.evaluation.accuracy_score for r in results) / len(results) if results else None,
+            key_findings=report.key_findings,
+            optimizer_tips=report.optimizer_tips,
+            created_at=created_at
+        )
+        db.add(audit)
+        db.flush()  # Only the parent id is needed; children reference (audit_id, position)
+
+        prompt_rows, response_rows, source_rows, mention_rows = [], [], [], []
+        for pos, p in enumerate(prompts):
+            prompt_rows.append({"audit_id": audit.id, "position": pos, "prompt_text": p.prompt_text, "intent_category": p.intent_category})
+
+        for pos, r in enumerate(results):
+            ev = r.evaluation
+            response_rows.append({
+                "audit_id": audit.id,
+                "position": pos,
+                "model_name": r.model_name,
+                "response_text": r.response_text,
+                "brand_present": ev.brand_present,
+                "url_cited": ev.url_cited,
+                "recommendation_rank": ev.recommendation_rank,
+                "accuracy_score": ev.accuracy_score,
+                "sentiment": ev.sentiment,
+                "competitor_ranks": [c.model_dump() for c in ev.competitor_ranks],
+                "evaluated_at": r.evaluated_at or created_at,
+                "error": r.error
+            })
+            for src in r.sources:
+                source_rows.append({
+                    "audit_id": audit.id,
+                    "response_position": pos,
+                    "url": src.url,
+                    "title": src.title,
+                    "domain": src.domain,
+                    "favicon": src.favicon,
+                    "description": src.description,
+                    "is_grounded": src.is_grounded,
+                    "source_type": src.source_type
+                })
+
+            ranks_by_name = {competitor_resolver.resolve(c.name): c for c in ev.competitor_ranks}
+            for name in {competitor_resolver.resolve(n) for n in ev.competitors_mentioned}:
+                ranked = ranks_by_name.get(name)
+                mention_rows.append({
+                    "audit_id": audit.id,
+                    "response_position": pos,
+                    "company": company.company_name,
+                    "competitor": name,
+                    "rank": ranked.rank if ranked else None,
+                    "url_cited": ranked.url_cited if ranked else False,
+                    "created_at": created_at
+                })
+
+        for model, rows in ((AuditPrompt, prompt_rows), (AuditResponse, response_rows), (AuditSource, source_rows), (CompetitorMention, mention_rows)):
+            if rows:
+                db.execute(insert(model), rows)
+
+        # Rollups are maintained in the same transaction as the raw rows
+        update_rollups(
+            db, company.company_name, created_at, provider, use_google_search,
+            overall_score=report.overall_score,
+            response_count=len(results),
+            mention_count=audit.mention_count,
+            brand_ranks=ranks,
+            competitors=[m["competitor"] for m in mention_rows]
+        )
+
+        db.commit()
+        return audit.id
+    except Exception:
+        db.rollback()
+        raise
+
+
+def record_audit(company: CompanyUnderstanding, prompts: List[GeneratedPrompt], report: VisibilityReport, provider: str, use_google_search: bool = False) -> Optional[int]:
+    """save_audit with its own session, for use from worker threads. Failures are logged, not raised."""
+    if not DATABASE_URL:
+        return None  # No database configured: audits are returned but not stored
+    db = None
+    try:
+        db = SessionLocal()
+        return save_audit(db, company, prompts, report, provider, use_google_search)
+    except Exception as e:
+        logger.warning("Failed to persist audit", extra={"company": company.company_name, "error": str(e)})
+        return None
+    finally:
+        if db is not None:
+            db.close()
+
+
+def list_audits(db: Session, company: str, limit: int = 20) -> List[dict]:
+    """Most recent audit summaries for a company (index range scan, no child rows)."""
+    rows = (
+        db.query(Audit.id, Audit.created_at, Audit.provider, Audit.use_google_search, Audit.overall_score, Audit.mention_count, Audit.prompt_count)
+        .filter(Audit.company == company)
+        .order_by(Audit.created_at.desc())
+        .limit(limit)
+        .all()
+    )
+    return [
+        {
+            "id": r.id,
+            "created_at": r.created_at.isoformat(),
+            "provider": r.provider,
+            "use_google_search": r.use_google_search,
+            "overall_score": r.overall_score,
+            "mention_count": r.mention_count,
+            "prompt_count": r.prompt_count
+        }
+        for r in rows
+    ]
+
+
+def share_of_voice(db: Session, company: str, days: int = 90, limit: int = 10) -> dict:
+    """
+    Share of voice over the last `days`: the company's own mentions vs. each
+    competitor's, counted per response. Answered from the indexed columns only.
+    """
+    since = datetime.utcnow() - timedelta(days=days)
+
+    own_mentions, responses = (
+        db.query(func.coalesce(func.sum(Audit.mention_count), 0), func.coalesce(func.sum(Audit.prompt_count), 0))
+        .filter(Audit.company == company, Audit.created_at >= since)
+        .one()
+    )
+    competitor_filter = (CompetitorMention.company == company, CompetitorMention.created_at >= since)
+    # Shares are of all mentions, not just of the competitors listed below
+    competitor_mentions = db.query(func.count(CompetitorMention.id)).filter(*competitor_filter).scalar() or 0
+    competitor_rows = (
+        db.query(CompetitorMention.competitor, func.count(CompetitorMention.id).label("mentions"))
+        .filter(*competitor_filter)
+        .group_by(CompetitorMention.competitor)
+        .order_by(func.count(CompetitorMention.id).desc())
+        .limit(limit)
+        .all()
+    )
+
+    total = own_mentions + competitor_mentions
+    entries = [{"name": company, "mentions": int(own_mentions), "is_company": True}]
+    entries += [{"name": r.competitor, "mentions": int(r.mentions), "is_company": False} for r in competitor_rows]
+    for e in entries:
+        e["share"] = round(e["mentions"] / total, 4) if total else 0.0
+
+    return {"company": company, "days": days, "responses": int(responses), "share_of_voice": entries}
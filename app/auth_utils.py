@@ -1,5 +1,13 @@
+import base64
+import hashlib
+import hmac
+import time
+from typing import Optional
+
 import bcrypt
 
+from app.config import SESSION_SECRET, SESSION_TTL_HOURS
+
 def get_password_hash(password):
     pwd_bytes = password.encode('utf-8')
     salt = bcrypt.gensalt()
@@ -15,3 +23,22 @@ def verify_password(plain_password, hashed_password):
         hashed_password_byte_enc = hashed_password
         
     return bcrypt.checkpw(password_byte_enc, hashed_password_byte_enc)
+
+def create_session_token(user_id: int, ttl_hours: float = SESSION_TTL_HOURS) -> str:
+    """`<user_id>.<expiry>.<signature>`: HMAC-SHA256 over id and expiry with SESSION_SECRET."""
+    payload = f"{user_id}.{int(time.time() + ttl_hours * 3600)}"
+    return f"{payload}.{_sign(payload)}"
+
+def verify_session_token(token: str) -> Optional[int]:
+    """The user id of a valid, unexpired token; None otherwise."""
+    try:
+        user_id, expires, signature = token.split(".")
+        if not hmac.compare_digest(signature, _sign(f"{user_id}.{expires}")) or int(expires) < time.time():
+            return None
+        return int(user_id)
+    except ValueError:
+        return None
+
+def _sign(payload: str) -> str:
+    digest = hmac.new(SESSION_SECRET.encode("utf-8"), payload.encode("utf-8"), hashlib.sha256).digest()
+    return base64.urlsafe_b64encode(digest).rstrip(b"=").decode("ascii")
@@ -0,0 +1,223 @@
+# app/batch.py
+"""
+Bulk multi-company audits (`python main.py --batch companies.csv`).
+
+Every row of a CSV (columns url, points, region) or JSONL file (objects with
+the same keys) goes through crawl -> summarize -> generate prompts -> evaluate.
+Rows run concurrently in one process, so they share:
+
+- the provider budget: evaluation calls go through the fair scheduler, whose
+  per-provider slot count (PROVIDER_CONCURRENCY, or --provider-concurrency)
+  applies across all companies; analysis (crawl + summarize + generate) is
+  limited separately by --concurrency
+- the caches: site metadata, competitor resolution and the prompt library are
+  process-wide
+
+Each company's report is appended to the output JSONL as soon as it finishes.
+Progress is checkpointed to <output>.checkpoint: analyzed companies keep their
+profile and prompts, so a re-run skips finished rows (status "ok" in the
+output) and resumes analyzed ones at the evaluation stage. Failed rows are
+written with status "error" and retried on the next run.
+"""
+
+import asyncio
+import csv
+import hashlib
+import json
+import os
+import threading
+import time
+from dataclasses import dataclass
+from functools import partial
+from typing import Dict, List, Optional, Set
+
+from app.schemas import CompanyUnderstanding, GeneratedPrompt
+from app.pipeline import analyze_pipeline
+from app.evaluator import evaluate_visibility
+from app.fair_queue import current_tenant, set_provider_capacity
+from app.structured_logging import get_logger, log_context, new_audit_id
+
+logger = get_logger(__name__)
+
+BATCH_TENANT = "batch"
+
+
+@dataclass
+class BatchItem:
+    url: str
+    points: str = ""
+    region: str = "Global"
+
+    @property
+    def key(self) -> str:
+        """Stable id of the row's inputs; used to match checkpoints and output lines across runs."""
+        raw = json.dumps([self.url, self.points, self.region])
+        return hashlib.sha1(raw.encode("utf-8")).hexdigest()[:12]
+
+
+def load_batch_file(path: str) -> List[BatchItem]:
+    """Reads a .jsonl file or a CSV with a header row; rows without url and points are skipped."""
+    with open(path, "r", encoding="utf-8-sig") as f:
+        if path.endswith((".jsonl", ".ndjson")):
+            rows = [json.loads(line) for line in f if line.strip()]
+        else:
+            rows = list(csv.DictReader(f))
+
+    items = []
+    for row in rows:
+        url = (row.get("url") or "").strip()
+        points = (row.get("points") or "").strip()
+        if not url and not points:
+            continue
+        items.append(BatchItem(url=url, points=points, region=(row.get("region") or "").strip() or "Global"))
+    return items
+
+
+class JsonlWriter:
+    """Append-only JSONL file shared by concurrent audits; each line is flushed as written."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def write(self, entry: dict):
+        line = json.dumps(entry, ensure_ascii=False, default=str) + "\n"
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(line)
+            f.flush()
+            os.fsync(f.fileno())
+
+    def read(self) -> List[dict]:
+        if not os.path.exists(self.path):
+            return []
+        entries = []
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entries.append(json.loads(line))
+                except ValueError:
+                    continue  # Torn last line after a crash
+        return entries
+
+
+def load_progress(output: JsonlWriter, checkpoint: JsonlWriter):
+    """(keys finished with status ok, {key: checkpointed analysis})."""
+    done: Set[str] = {e["key"] for e in output.read() if e.get("status") == "ok"}
+    analyzed: Dict[str, dict] = {}
+    for entry in checkpoint.read():
+        if entry.get("stage") == "analyzed":
+            analyzed[entry["key"]] = entry
+    return done, analyzed
+
+
+async def audit_company(
+    item: BatchItem,
+    analyzed: Optional[dict],
+    analyze_sem: asyncio.Semaphore,
+    checkpoint: JsonlWriter,
+    provider: str,
+    use_google_search: bool,
+    max_prompts: Optional[int],
+    store: bool,
+) -> dict:
+    loop = asyncio.get_running_loop()
+    started = time.perf_counter()
+    timings: Dict[str, float] = {}
+
+    if analyzed:
+        company_profile = CompanyUnderstanding.model_validate(analyzed["company_profile"])
+        prompts = [GeneratedPrompt.model_validate(p) for p in analyzed["prompts"]]
+    else:
+        async with analyze_sem:
+            company_profile, prompts, timings = await analyze_pipeline(item.url, item.points, item.region)
+        await loop.run_in_executor(None, checkpoint.write, {
+            "key": item.key, "stage": "analyzed", "url": item.url,
+            "company_profile": company_profile.model_dump(),
+            "prompts": [p.model_dump() for p in prompts],
+        })
+
+    if max_prompts:
+        prompts = prompts[:max_prompts]
+    stage_start = time.perf_counter()
+    report = await evaluate_visibility(company_profile, prompts, use_google_search=use_google_search, provider=provider)
+    timings["evaluate"] = round(time.perf_counter() - stage_start, 3)
+
+    if store:
+        from app.audit_store import record_audit  # Needs DATABASE_URL; only imported when persisting
+        report.audit_id = await loop.run_in_executor(None, partial(
+            record_audit, company_profile, prompts, report, provider, use_google_search
+        ))
+
+    timings["total"] = round(time.perf_counter() - started, 3)
+    return {
+        "company_profile": company_profile.model_dump(),
+        "prompts": [p.model_dump() for p in prompts],
+        "report": report.model_dump(),
+        "timings": timings,
+        "resumed": bool(analyzed),
+    }
+
+
+async def run_batch(
+    items: List[BatchItem],
+    output_path: str,
+    concurrency: int = 4,
+    provider: str = "gemini",
+    use_google_search: bool = False,
+    provider_concurrency: Optional[int] = None,
+    max_prompts: Optional[int] = None,
+    store: bool = False,
+) -> dict:
+    """Audits every item, appending one JSONL line per company to output_path; returns run totals."""
+    if provider_concurrency:
+        set_provider_capacity(provider_concurrency)
+    current_tenant.set(BATCH_TENANT)  # One tenant: companies queue FIFO, so early rows finish (and stream) first
+
+    output = JsonlWriter(output_path)
+    checkpoint = JsonlWriter(output_path + ".checkpoint")
+    done, analyzed = load_progress(output, checkpoint)
+
+    pending = []
+    seen: Set[str] = set()
+    for item in items:
+        if item.key not in done and item.key not in seen:
+            seen.add(item.key)
+            pending.append(item)
+    totals = {"total": len(items), "skipped": len(items) - len(pending), "ok": 0, "error": 0}
+    logger.info("Batch started", extra={
+        "companies": len(items), "pending": len(pending), "resuming": sum(1 for i in pending if i.key in analyzed),
+        "concurrency": concurrency, "provider": provider, "output": output_path,
+    })
+
+    loop = asyncio.get_running_loop()
+    analyze_sem = asyncio.Semaphore(max(1, concurrency))
+    # Evaluations are bounded by the shared provider slots; this just keeps analyzed-but-waiting audits in check
+    audit_sem = asyncio.Semaphore(max(1, concurrency) * 2)
+    started = time.perf_counter()
+
+    async def run_item(item: BatchItem):
+        entry = {"key": item.key, "url": item.url, "points": item.points, "region": item.region}
+        async with audit_sem:
+            with log_context(audit_id=new_audit_id(), batch_key=item.key, provider=provider):
+                try:
+                    result = await audit_company(
+                        item, analyzed.get(item.key), analyze_sem, checkpoint,
+                        provider, use_google_search, max_prompts, store,
+                    )
+                    entry.update(status="ok", **result)
+                except Exception as e:
+                    logger.exception("Company audit failed", extra={"url": item.url})
+                    entry.update(status="error", error=str(e))
+                await loop.run_in_executor(None, output.write, entry)
+
+        totals[entry["status"]] += 1
+        logger.info("Company audited", extra={
+            "url": item.url, "status": entry["status"],
+            "overall_score": entry.get("report", {}).get("overall_score"),
+            "progress": f"{totals['ok'] + totals['error']}/{len(pending)}",
+        })
+
+    await asyncio.gather(*(run_item(item) for item in pending))
+    totals["elapsed_s"] = round(time.perf_counter() - started, 3)
+    logger.info("Batch finished", extra=totals)
+    return totals
@@ -14,6 +14,11 @@ CEREBRAS_MODEL_NAME = os.getenv("CEREBRAS_MODEL_NAME", "llama-3.3-70b")
 OPENROUTER_API_KEY = os.getenv("OPENROUTER_API_KEY")
 OPENROUTER_MODEL_NAME = os.getenv("OPENROUTER_MODEL_NAME", "openai/gpt-oss-120b")
 
+# Provider endpoints (override to point at stand-in servers, e.g. benchmarks/load_test.py)
+GEMINI_BASE_URL = os.getenv("GEMINI_BASE_URL")
+CEREBRAS_BASE_URL = os.getenv("CEREBRAS_BASE_URL")
+OPENROUTER_BASE_URL = os.getenv("OPENROUTER_BASE_URL", "https://openrouter.ai/api/v1")
+
 if not GEMINI_API_KEY:
     print("[WARNING] GEMINI_API_KEY not found in environment variables.")
 
@@ -27,3 +32,98 @@ if not OPENROUTER_API_KEY:
 DEFAULT_TIMEOUT = 10
 MAX_CONCURRENT_REQUESTS = 5
 IMPORTANT_PATHS = ["", "about", "about-us", "solutions", "products", "services"]
+
+# Local persistent stores (prompt library, lookup caches, etc.)
+DATA_DIR = os.getenv("GEO_DATA_DIR", ".geo_data")
+PROMPT_LIBRARY_PATH = os.getenv("PROMPT_LIBRARY_PATH", os.path.join(DATA_DIR, "prompt_library.json"))
+PROMPT_LIBRARY_MAX_PER_KEY = int(os.getenv("PROMPT_LIBRARY_MAX_PER_KEY", "200"))
+PROMPT_DUPLICATE_THRESHOLD = float(os.getenv("PROMPT_DUPLICATE_THRESHOLD", "0.7"))
+
+# Judge input compaction (approximate tokens of model response sent to the judge)
+JUDGE_MAX_TOKENS = int(os.getenv("JUDGE_MAX_TOKENS", "900"))
+JUDGE_BRAND_CONTEXT_SENTENCES = int(os.getenv("JUDGE_BRAND_CONTEXT_SENTENCES", "1"))
+
+# Competitor entity resolution (persistent raw name -> canonical competitor lookup)
+ENTITY_INDEX_PATH = os.getenv("ENTITY_INDEX_PATH", os.path.join(DATA_DIR, "competitor_index.json"))
+ENTITY_FUZZY_THRESHOLD = float(os.getenv("ENTITY_FUZZY_THRESHOLD", "0.9"))
+
+# Incremental audits: stored results younger than this are reused instead of re-run
+AUDIT_FRESHNESS_HOURS = float(os.getenv("AUDIT_FRESHNESS_HOURS", "24"))
+
+# Bounded executors per workload class (workers, max queued tasks before 503; queue <= 0 = unbounded)
+PROVIDER_IO_WORKERS = int(os.getenv("PROVIDER_IO_WORKERS", "16"))
+PROVIDER_IO_QUEUE = int(os.getenv("PROVIDER_IO_QUEUE", "256"))
+CRAWL_IO_WORKERS = int(os.getenv("CRAWL_IO_WORKERS", str(MAX_CONCURRENT_REQUESTS * 2)))
+CRAWL_IO_QUEUE = int(os.getenv("CRAWL_IO_QUEUE", "100"))
+HTML_PARSE_WORKERS = int(os.getenv("HTML_PARSE_WORKERS", str(min(4, os.cpu_count() or 1))))
+HTML_PARSE_QUEUE = int(os.getenv("HTML_PARSE_QUEUE", "200"))
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", "2"))
+PASSWORD_HASH_QUEUE = int(os.getenv("PASSWORD_HASH_QUEUE", "50"))
+
+# Fair scheduling of provider calls across tenants (concurrent calls per provider, optional "tenant=weight,..." list)
+PROVIDER_CONCURRENCY = int(os.getenv("PROVIDER_CONCURRENCY", "8"))
+FAIR_TENANT_WEIGHTS = os.getenv("FAIR_TENANT_WEIGHTS", "")
+
+# Provider health shared across worker processes (SQLite WAL): quota disables, circuit breaker, rate limits
+PROVIDER_HEALTH_PATH = os.getenv("PROVIDER_HEALTH_PATH", os.path.join(DATA_DIR, "provider_health.db"))
+PROVIDER_HEALTH_CACHE_SECONDS = float(os.getenv("PROVIDER_HEALTH_CACHE_SECONDS", "2"))
+PROVIDER_HEALTH_FLUSH_SECONDS = float(os.getenv("PROVIDER_HEALTH_FLUSH_SECONDS", "10"))  # Call counters from successes are batched this long
+PROVIDER_CIRCUIT_FAILURES = int(os.getenv("PROVIDER_CIRCUIT_FAILURES", "5"))
+PROVIDER_CIRCUIT_COOLDOWN = float(os.getenv("PROVIDER_CIRCUIT_COOLDOWN", "60"))
+
+# Offline mode: every provider call goes to the simulated backend, crawls and metadata fetches use synthetic pages
+OFFLINE_MODE = os.getenv("GEO_OFFLINE_MODE", "false").lower() in ("1", "true", "yes")
+
+# Simulated provider (provider="simulated" or OFFLINE_MODE): latency, throughput and error injection
+SIMULATED_LATENCY_MS = float(os.getenv("SIMULATED_LATENCY_MS", "800"))
+SIMULATED_LATENCY_SIGMA = float(os.getenv("SIMULATED_LATENCY_SIGMA", "0.5"))  # Log-normal spread
+SIMULATED_TOKENS_PER_SECOND = float(os.getenv("SIMULATED_TOKENS_PER_SECOND", "400"))
+SIMULATED_RATE_LIMIT_RATE = float(os.getenv("SIMULATED_RATE_LIMIT_RATE", "0"))
+SIMULATED_QUOTA_ERROR_RATE = float(os.getenv("SIMULATED_QUOTA_ERROR_RATE", "0"))
+SIMULATED_BRAND_MENTION_RATE = float(os.getenv("SIMULATED_BRAND_MENTION_RATE", "0.5"))
+SIMULATED_SEED = int(os.environ["SIMULATED_SEED"]) if os.getenv("SIMULATED_SEED") else None
+
+# Record/replay of provider, crawl and metadata traffic (gzip JSONL archive; see app/recorder.py)
+RECORD_PATH = os.getenv("GEO_RECORD")
+REPLAY_PATH = os.getenv("GEO_REPLAY")
+REPLAY_PACING = float(os.getenv("GEO_REPLAY_PACING", "0"))  # 1.0 = original latency, 0 = as fast as possible
+
+# Event-loop lag monitor (sampling interval; see app/loop_monitor.py)
+LOOP_LAG_INTERVAL_MS = float(os.getenv("LOOP_LAG_INTERVAL_MS", "100"))
+
+# Tracing (OpenTelemetry spans, exported when opentelemetry-sdk is installed) and Prometheus metrics; see app/telemetry.py
+TRACE_FILE = os.getenv("GEO_TRACE_FILE")  # One JSON span per line
+TRACE_OTLP_ENDPOINT = os.getenv("OTEL_EXPORTER_OTLP_ENDPOINT")  # Collector (needs opentelemetry-exporter-otlp)
+TRACE_SERVICE_NAME = os.getenv("OTEL_SERVICE_NAME", "geo-engine")
+
+# Structured logging (JSON lines written by a background thread; see app/structured_logging.py)
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json")  # json | text
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+LOG_LEVELS = os.getenv("LOG_LEVELS", "")  # Per-module overrides: "app.site_metadata=DEBUG,app.ai_client=WARNING"
+LOG_DEBUG_SAMPLE_RATE = float(os.getenv("LOG_DEBUG_SAMPLE_RATE", "0.1"))  # Fraction of DEBUG records kept
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+
+# On-demand request profiling (X-Profile header or ?profile=1 with X-Admin-Token; see app/profiling.py)
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")  # Unset disables profiling and the /admin endpoints
+PROFILE_DIR = os.getenv("PROFILE_DIR", os.path.join(DATA_DIR, "profiles"))
+PROFILE_SAMPLE_INTERVAL_MS = float(os.getenv("PROFILE_SAMPLE_INTERVAL_MS", "5"))
+PROFILE_MAX_SECONDS = float(os.getenv("PROFILE_MAX_SECONDS", "300"))  # Stop sampling long-running requests after this
+
+# Recurring monitoring audits (in-process scheduler; see app/monitoring.py)
+MONITOR_ENABLED = os.getenv("MONITOR_ENABLED", "true").lower() in ("1", "true", "yes")
+MONITOR_TICK_SECONDS = float(os.getenv("MONITOR_TICK_SECONDS", "30"))
+MONITOR_MAX_CONCURRENT_RUNS = int(os.getenv("MONITOR_MAX_CONCURRENT_RUNS", "2"))
+MONITOR_SLOT_MINUTES = int(os.getenv("MONITOR_SLOT_MINUTES", "5"))  # Granularity of the load-spreading plan
+MONITOR_PROVIDER_QUOTAS = os.getenv("MONITOR_PROVIDER_QUOTAS", "")  # Calls per minute: "gemini=60,cerebras=30"
+MONITOR_DEFAULT_QUOTA_PER_MINUTE = float(os.getenv("MONITOR_DEFAULT_QUOTA_PER_MINUTE", "60"))
+MONITOR_MISSED_GRACE_SECONDS = float(os.getenv("MONITOR_MISSED_GRACE_SECONDS", "600"))  # Later than this = missed
+MONITOR_CATCHUP_WINDOW_MINUTES = int(os.getenv("MONITOR_CATCHUP_WINDOW_MINUTES", "360"))
+MONITOR_RUN_TIMEOUT_MINUTES = int(os.getenv("MONITOR_RUN_TIMEOUT_MINUTES", "120"))  # Runs still 'running' after this were interrupted
+
+# Signed session tokens issued by /login; they identify the tenant for fair scheduling.
+# Set SESSION_SECRET in production: the random fallback differs per worker and per restart.
+SESSION_SECRET = os.getenv("SESSION_SECRET") or os.urandom(32).hex()
+SESSION_TTL_HOURS = float(os.getenv("SESSION_TTL_HOURS", "168"))
+
+# Site metadata (title/description/favicon) cache used by source enrichment
+SITE_METADATA_CACHE_SIZE = int(os.getenv("SITE_METADATA_CACHE_SIZE", "5000"))
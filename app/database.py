@@ -1,4 +1,5 @@
 import os
+import threading
 from sqlalchemy import create_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
@@ -12,13 +13,30 @@ DATABASE_URL = os.getenv("DATABASE_URL")
 if DATABASE_URL and DATABASE_URL.startswith("postgres://"):
     DATABASE_URL = DATABASE_URL.replace("postgres://", "postgresql://", 1)
 
-if not DATABASE_URL:
-    raise ValueError("DATABASE_URL environment variable is not set. Please set it in your environment configuration (e.g., Render Dashboard).")
+Base = declarative_base()
 
-engine = create_engine(DATABASE_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# The engine is created on first use, so the CLI and analysis-only workers can import
+# modules that touch the database without DATABASE_URL being set
+_engine = None
+_session_factory = None
+_engine_lock = threading.Lock()
 
-Base = declarative_base()
+def get_engine():
+    global _engine, _session_factory
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                if not DATABASE_URL:
+                    raise ValueError("DATABASE_URL environment variable is not set. Please set it in your environment configuration (e.g., Render Dashboard).")
+                engine = create_engine(DATABASE_URL)
+                _session_factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+                _engine = engine
+    return _engine
+
+def SessionLocal():
+    """A new Session on the lazily created engine (drop-in for the former sessionmaker)."""
+    get_engine()
+    return _session_factory()
 
 def get_db():
     db = SessionLocal()
@@ -0,0 +1,164 @@
+# app/entity_resolution.py
+"""
+Competitor entity resolution.
+
+The judge returns competitor names verbatim, so "HubSpot", "HubSpot Inc." and
+"hubspot.com" would otherwise be counted as three competitors. Names are
+canonicalized (case, legal suffixes, punctuation, domains -> names) with a
+fuzzy fallback, and every raw string seen is cached in a lookup table that is
+persisted across audits. After the first sighting a lookup is a single dict hit.
+"""
+
+import difflib
+import json
+import os
+import re
+import threading
+from typing import Dict, List, Optional
+
+from app.config import ENTITY_INDEX_PATH, ENTITY_FUZZY_THRESHOLD
+from app.telemetry import record_cache
+from app.structured_logging import get_logger
+
+logger = get_logger(__name__)
+
+LEGAL_SUFFIXES = {
+    "inc", "incorporated", "llc", "llp", "ltd", "limited", "pvt", "private", "corp",
+    "corporation", "co", "company", "gmbh", "plc", "ag", "sa", "bv", "pte", "pty", "srl",
+}
+
+_DOMAIN_RE = re.compile(r"^(?:https?://)?(?:www\.)?((?:[a-z0-9-]+\.)+[a-z]{2,})(?:/.*)?$")
+# Second-level labels that are part of a public suffix (hubspot.co.uk -> hubspot)
+_SECOND_LEVEL = {"co", "com", "org", "net", "gov", "ac", "edu"}
+
+
+def domain_to_name(value: str) -> Optional[str]:
+    """'https://www.hubspot.co.uk/pricing' -> 'hubspot'; None if not a domain."""
+    match = _DOMAIN_RE.match(value.strip().lower())
+    if not match:
+        return None
+    labels = match.group(1).split(".")
+    if len(labels) >= 3 and labels[-2] in _SECOND_LEVEL:
+        return labels[-3]
+    return labels[-2]
+
+
+def display_name(name: str) -> str:
+    """Readable form of a raw name: trimmed, trailing legal suffixes removed ('HubSpot, Inc.' -> 'HubSpot')."""
+    value = name.strip()
+    while True:
+        parts = re.split(r"[\s,]+", value)
+        if len(parts) < 2 or parts[-1].rstrip(".").lower() not in LEGAL_SUFFIXES:
+            return value
+        value = value[:value.rfind(parts[-1])].rstrip(" ,")
+
+
+def normalize_name(name: str) -> str:
+    """Canonical key for a competitor name."""
+    value = display_name(name or "")
+    as_domain = domain_to_name(value)
+    if as_domain:
+        value = as_domain
+    value = value.lower().replace("&", " and ")
+    tokens = re.sub(r"[^\w\s]", " ", value).split()
+    while len(tokens) > 1 and tokens[-1] in LEGAL_SUFFIXES:
+        tokens.pop()
+    return " ".join(tokens)
+
+
+class CompetitorResolver:
+    """
+    Maps raw competitor strings to a canonical display name.
+    Hot path: one dict lookup on the raw string. Misses normalize the name, try a
+    fuzzy match against known keys of similar length, then cache the result.
+    """
+
+    def __init__(self, path: str = ENTITY_INDEX_PATH, fuzzy_threshold: float = ENTITY_FUZZY_THRESHOLD):
+        self.path = path
+        self.fuzzy_threshold = fuzzy_threshold
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._dirty = False
+        self._lookup: Dict[str, str] = {}     # raw string -> canonical key
+        self._display: Dict[str, str] = {}    # canonical key -> display name
+        self._from_domain: set = set()        # keys whose display name is still a bare domain
+        self._buckets: Dict[str, List[str]] = {}  # first character -> keys (fuzzy candidates)
+
+    def _load(self):
+        if self._loaded:
+            return
+        self._loaded = True
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            self._lookup = data.get("lookup", {})
+            self._display = data.get("display", {})
+            self._from_domain = set(data.get("from_domain", []))
+            for key in self._display:
+                self._buckets.setdefault(key[:1], []).append(key)
+        except Exception as e:
+            logger.warning("Could not read competitor index", extra={"path": self.path, "error": str(e)})
+
+    def _fuzzy_match(self, key: str) -> Optional[str]:
+        best, best_ratio = None, self.fuzzy_threshold
+        for candidate in self._buckets.get(key[:1], ()):
+            if abs(len(candidate) - len(key)) > 3:
+                continue
+            ratio = difflib.SequenceMatcher(None, key, candidate).ratio()
+            if ratio >= best_ratio:
+                best, best_ratio = candidate, ratio
+        return best
+
+    def resolve(self, raw: str) -> str:
+        """Canonical display name for a raw competitor string."""
+        key = self._lookup.get(raw)
+        if key is not None:
+            record_cache("competitor_resolver", hits=1)
+            return self._display[key]
+
+        with self._lock:
+            self._load()
+            key = self._lookup.get(raw)
+            if key is None:
+                record_cache("competitor_resolver", misses=1)
+                key = normalize_name(raw)
+                if not key:
+                    return raw
+                is_domain = domain_to_name(raw) is not None
+                if key not in self._display:
+                    key = self._fuzzy_match(key) or key
+                if key not in self._display:
+                    self._display[key] = display_name(raw)
+                    self._buckets.setdefault(key[:1], []).append(key)
+                    if is_domain:
+                        self._from_domain.add(key)
+                elif key in self._from_domain and not is_domain:
+                    # Prefer a real name over a domain once one is seen
+                    self._display[key] = display_name(raw)
+                    self._from_domain.discard(key)
+                self._lookup[raw] = key
+                self._dirty = True
+            return self._display[key]
+
+    def flush(self):
+        """Persist the lookup table if it changed since the last flush."""
+        with self._lock:
+            if not self._dirty:
+                return
+            data = {"lookup": dict(self._lookup), "display": dict(self._display), "from_domain": sorted(self._from_domain)}
+            self._dirty = False
+        try:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            logger.warning("Could not persist competitor index", extra={"path": self.path, "error": str(e)})
+
+
+competitor_resolver = CompetitorResolver()
@@ -1,15 +1,32 @@
 # app/evaluator.py
 
-import json
+import time
 import asyncio
 import traceback
+from datetime import datetime
 from functools import partial
 from typing import List, Optional
-from app.schemas import CompanyUnderstanding, GeneratedPrompt, ModelResponse, EvaluationMetric, VisibilityReport, SearchSource
+from app.schemas import CompanyUnderstanding, GeneratedPrompt, ModelResponse, EvaluationMetric, VisibilityReport, SearchSource, JudgeOutput, ReportOutput
 from app.config import GEMINI_API_KEY, GEMINI_MODEL_NAME, CEREBRAS_API_KEY, CEREBRAS_MODEL_NAME, OPENROUTER_MODEL_NAME
-from app.ai_client import generate_ai_response, gemini_client, grounding_tool, cerebras_client
+from app.ai_client import generate_ai_response, has_provider
+from app.structured_output import generate_structured
+from app.executors import provider_executor, ExecutorSaturated
+from app.fair_queue import provider_slot
+from app.telemetry import stage
+from app.profiling import record_wait
+from app.structured_logging import get_logger, log_context, set_log_context, current_log_context, new_audit_id
+
+from app.aggregation import build_columns, score_responses, competitor_stats
+from app.entity_resolution import competitor_resolver
+from app.text_cleaner import compact_for_judge
 from app.site_metadata import enrich_sources_with_metadata, extract_urls_from_text, extract_domain
 
+logger = get_logger(__name__)
+
+def audit_log_context(provider: str):
+    """Log fields for one audit run; reuses an enclosing audit_id (e.g. set by the API) if there is one."""
+    return log_context(audit_id=current_log_context().get("audit_id") or new_audit_id(), provider=provider)
+
 async def evaluate_single_prompt(
     company: CompanyUnderstanding, 
     gen_prompt: GeneratedPrompt, 
@@ -19,20 +36,24 @@ async def evaluate_single_prompt(
     """
     Evaluates a single prompt asynchronously.
     """
-    print(f"[INFO] Testing prompt: {gen_prompt.prompt_text} (Google Search Grounding: {use_google_search})")
+    logger.debug("Testing prompt", extra={"prompt": gen_prompt.prompt_text, "search": use_google_search})
     
     response_text = ""
     sources = []
+    failure = None  # Marks fallback results so incremental audits never reuse them
     loop = asyncio.get_running_loop()
 
     # 1. Get raw AI response
     try:
         # We now use the unified ai_client for EVERY provider
         # Gemini will automatically include search grounding if tools are configured in ai_client
-        raw_ai_result = await loop.run_in_executor(
-            None, 
-            partial(generate_ai_response, gen_prompt.prompt_text, provider=provider, use_search=use_google_search, return_full_response=True)
-        )
+        # Fair share of provider capacity for the current tenant / priority (app.fair_queue)
+        with stage("answer", provider=provider, search=use_google_search):
+            async with provider_slot(provider):
+                raw_ai_result = await loop.run_in_executor(
+                    provider_executor,
+                    partial(generate_ai_response, gen_prompt.prompt_text, provider=provider, use_search=use_google_search, return_full_response=True)
+                )
 
         # Handle different return types (Gemini returns a response object, others return string)
         if hasattr(raw_ai_result, 'candidates') and raw_ai_result.candidates:
@@ -40,7 +61,7 @@ async def evaluate_single_prompt(
             response_text = raw_ai_result.text
             
             # 1. Add the "Search Result Reference" link (Generic Search URL)
-            sources.append(SearchSource(
+            sources.append(SearchSource.model_construct(
                 title="Google Search Grounding",
                 url="https://www.google.com/search?q=" + gen_prompt.prompt_text.replace(" ", "+"),
                 source_type="search_grounding",
@@ -55,7 +76,7 @@ async def evaluate_single_prompt(
                         if chunk.web:
                             # Verify if already added to avoid duplicates
                             if not any(s.url == chunk.web.uri for s in sources):
-                                sources.append(SearchSource(
+                                sources.append(SearchSource.model_construct(
                                     title=chunk.web.title or "Verified Web Source",
                                     url=chunk.web.uri,
                                     source_type="web",
@@ -78,24 +99,27 @@ async def evaluate_single_prompt(
                 elif "cerebras" in provider.lower():
                     title = f"Cerebras Source"
                 
-                sources.append(SearchSource(
+                sources.append(SearchSource.model_construct(
                     title=title, 
                     url=url, 
                     source_type="extracted_url",
                     is_grounded=True # If the AI puts a URL in the text, it's usually a specific site visit/reference
                 ))
 
-        print(f"[SUCCESS] Generated response for '{gen_prompt.prompt_text[:20]}...' with {len(sources)} initial reference(s)")
+        logger.debug("Generated response", extra={"initial_sources": len(sources)})
         
         # --- ENRICHMENT STEP ---
         # Fetch rich metadata (favicon, description, etc) for all identified sources
         if sources:
-            print(f"[INFO] Enriching {len(sources)} sources with metadata...")
-            sources = await enrich_sources_with_metadata(sources)
+            with stage("enrich_metadata", sources=len(sources)):
+                sources = await enrich_sources_with_metadata(sources)
 
+    except ExecutorSaturated:
+        raise  # Overloaded: fail the request fast instead of reporting an analysis error
     except Exception as e:
         error_msg = str(e)
-        print(f"[ERROR] Content generation failed: {error_msg}")
+        failure = f"generation: {error_msg}"
+        logger.error("Content generation failed", extra={"error": error_msg})
         
         if "google_search" in error_msg.lower() or "grounding" in error_msg.lower():
             response_text = "Google Search grounding is not available with your API key. Please use Gemini Standard mode or upgrade your API access."
@@ -112,7 +136,7 @@ async def evaluate_single_prompt(
         error_sources = []
         for url in unique_urls:
             if url not in [s.url for s in sources]:  # Avoid duplicates
-                error_sources.append(SearchSource(
+                error_sources.append(SearchSource.model_construct(
                     title=f"Reference from Error ({provider.capitalize()})",
                     url=url,
                     source_type="error_reference",
@@ -124,14 +148,17 @@ async def evaluate_single_prompt(
             sources.extend(enriched_error_sources)
 
     # 2. Use AI to EVALUATE the response
-    eval_provider = "cerebras" if cerebras_client else "gemini"
+    eval_provider = "cerebras" if has_provider("cerebras") else "gemini"
+
+    # Only list structure, entity sentences, URLs and brand context go to the judge
+    judge_text = compact_for_judge(response_text, [company.company_name, extract_domain(company.url) if company.url else ""])
     
     eval_prompt = f"""
 You are a Senior AI Search Visibility Auditor focusing on the {company.region} market. Analyze the "Model Response" provided below to see how "{company.company_name}" is positioned within this specific regional and industry context.
 
 Model Response:
 \"\"\"
-{response_text}
+{judge_text}
 \"\"\"
 
 Audit requirements for "{company.company_name}":
@@ -159,14 +186,12 @@ Return valid JSON:
 """
     try:
         # Run blocking evaluation in thread
-        eval_text = await loop.run_in_executor(
-            None,
-            partial(generate_ai_response, eval_prompt, provider=eval_provider, response_mime_type="application/json")
-        )
-        eval_data = json.loads(eval_text)
-        
-        if isinstance(eval_data, list) and len(eval_data) > 0:
-            eval_data = eval_data[0]
+        with stage("judge", provider=eval_provider):
+            async with provider_slot(eval_provider):
+                eval_data = await loop.run_in_executor(
+                    provider_executor,
+                    partial(generate_structured, eval_prompt, JudgeOutput, provider=eval_provider)
+                )
             
         if isinstance(eval_data, dict):
             if "competitor_ranks" in eval_data:
@@ -178,15 +203,18 @@ Return valid JSON:
         else:
             raise ValueError(f"Expected dict but got {type(eval_data)}")
             
+    except ExecutorSaturated:
+        raise
     except Exception as e:
-        print(f"[ERROR] Evaluation parsing failed: {e}")
+        logger.error("Evaluation parsing failed", extra={"error": str(e), "judge_provider": eval_provider})
+        failure = failure or f"judge: {e}"
         
         # Safe logic fallback
         brand_name = (company.company_name or "").lower()
         resp_lower = (response_text or "").lower()
         brand_present = brand_name in resp_lower if brand_name else False
         
-        metric = EvaluationMetric(
+        metric = EvaluationMetric.model_construct(
             brand_present=brand_present,
             url_cited=False,
             recommendation_rank=None,
@@ -201,118 +229,94 @@ Return valid JSON:
     elif provider == "cerebras": display_model_name = f"Cerebras ({CEREBRAS_MODEL_NAME})"
     elif provider == "openrouter": display_model_name = f"GPT-OSS ({OPENROUTER_MODEL_NAME})"
 
-    # Log sources captured (for debugging and confirmation)
-    print(f"[INFO] Captured {len(sources)} source(s) for {display_model_name} - Storing ALL regardless of success/failure")
+    # Sources are stored regardless of success/failure
+    logger.info("Prompt evaluated", extra={"model": display_model_name, "sources": len(sources), "brand_present": metric.brand_present})
 
-    return ModelResponse(
+    # Built from trusted, already-validated parts: skip re-validation
+    return ModelResponse.model_construct(
         model_name=display_model_name,
         response_text=response_text,
         evaluation=metric,
-        sources=sources  # ALWAYS return sources - both successful and failed responses
+        sources=sources,  # ALWAYS return sources - both successful and failed responses
+        evaluated_at=datetime.utcnow(),
+        error=failure
     )
 
 async def evaluate_visibility(company: CompanyUnderstanding, prompts: List[GeneratedPrompt], use_google_search: bool = False, provider: str = "gemini") -> VisibilityReport:
     """
     Executes all prompts in PARALLEL and evaluates how the company appears in AI responses.
     """
+    with audit_log_context(provider):
+        model_results = await evaluate_prompts(company, prompts, use_google_search, provider)
+        return await build_visibility_report(company, prompts, model_results)
+
+async def evaluate_prompts(company: CompanyUnderstanding, prompts: List[GeneratedPrompt], use_google_search: bool = False, provider: str = "gemini") -> List[ModelResponse]:
+    """
+    Runs evaluate_single_prompt for every prompt concurrently (bounded) and returns
+    the results in prompt order.
+    """
     # Create tasks for all prompts
     # We use a Semaphore to limit concurrency to 3 to avoid Rate Limits (HTTP 429)
     sem = asyncio.Semaphore(3) 
 
-    async def sem_task(p):
+    async def sem_task(index, p):
+        set_log_context(prompt_index=index)  # Each gathered task has its own context
+        queued = time.perf_counter()
         async with sem:
-            return await evaluate_single_prompt(company, p, use_google_search, provider)
+            record_wait("evaluate_semaphore", time.perf_counter() - queued)
+            with stage("evaluate_prompt", provider=provider, search=use_google_search):
+                return await evaluate_single_prompt(company, p, use_google_search, provider)
 
-    tasks = [sem_task(p) for p in prompts]
-    
-    # Run all tasks concurrently
-    print(f"[INFO] Starting parallel evaluation for {len(tasks)} prompts with provider={provider} (limit=3 concurrent)...")
-    model_results = await asyncio.gather(*tasks)
-    print(f"[INFO] Completed parallel evaluation.")
+    with audit_log_context(provider):
+        tasks = [sem_task(i, p) for i, p in enumerate(prompts)]
 
-    # 3. Calculate Overall Visibility Score and Competitor Insights
-    
-    # STRICT rank-based scoring system
-    total_score = 0
-    mentions = 0
-    
-    if model_results:
-        for r in model_results:
-            prompt_score = 0
-            if r.evaluation.brand_present:
-                mentions += 1
-                
-                rank = r.evaluation.recommendation_rank
-                if rank:
-                    if rank == 1: prompt_score = 100    # Perfect visibility
-                    elif rank == 2: prompt_score = 80   # Strong visibility
-                    elif rank == 3: prompt_score = 60   # Good visibility
-                    elif rank <= 5: prompt_score = 40   # Present in top half
-                    else: prompt_score = 25            # Mentioned but buried
-                else:
-                    # Mentioned in text but not in a recommendation list
-                    prompt_score = 15
-                
-                # Accuracy Penalty
-                prompt_score *= (0.5 + (r.evaluation.accuracy_score * 0.5))
-            
-            total_score += prompt_score
-            
-        overall_score = total_score / len(model_results)
-    else:
-        overall_score = 0
-    
-    avg_accuracy = sum(r.evaluation.accuracy_score for r in model_results) / len(model_results) if model_results else 0
+        # Run all tasks concurrently
+        logger.info("Starting parallel evaluation", extra={"prompts": len(tasks), "concurrency": 3})
+        with stage("evaluate_prompts", provider=provider, prompts=len(tasks)):
+            model_results = await asyncio.gather(*tasks)
+        logger.info("Completed parallel evaluation", extra={"prompts": len(tasks)})
+    return list(model_results)
 
-    # Aggregate competitor info
-    comp_stats = {} # name -> {mentions: int, ranks: [], prompts: [], sources: []}
-    for idx, r in enumerate(model_results):
-        orig_prompt_text = prompts[idx].prompt_text if idx < len(prompts) else "Unknown Query"
-        
-        for name in r.evaluation.competitors_mentioned:
-            if name not in comp_stats:
-                comp_stats[name] = {"mentions": 0, "ranks": [], "prompts": [], "sources": []}
-            comp_stats[name]["mentions"] += 1
-            if orig_prompt_text not in comp_stats[name]["prompts"]:
-                comp_stats[name]["prompts"].append(orig_prompt_text)
-            
-            # Associate sources from this response with the competitor
-            for src in r.sources:
-                # Avoid duplicates by checking URL
-                if not any(existing.url == src.url for existing in comp_stats[name]["sources"]):
-                    comp_stats[name]["sources"].append(src)
-            
-        for c in r.evaluation.competitor_ranks:
-            if c.name in comp_stats and c.rank is not None:
-                if c.rank not in comp_stats[c.name]["ranks"]:
-                    comp_stats[c.name]["ranks"].append(c.rank)
+async def build_visibility_report(company: CompanyUnderstanding, prompts: List[GeneratedPrompt], model_results: List[ModelResponse]) -> VisibilityReport:
+    """
+    Aggregates evaluated responses (fresh or reused) into a VisibilityReport:
+    scoring, competitor statistics and the AI-written findings/tips.
+    """
+    # 3. Calculate Overall Visibility Score and Competitor Insights (vectorized)
+    with stage("aggregate", responses=len(model_results)):
+        cols = build_columns(model_results, [p.prompt_text for p in prompts], resolve=competitor_resolver.resolve)
+
+        # STRICT rank-based scoring system
+        overall_score = float(score_responses(cols).mean()) if model_results else 0
+        mentions = int(cols.presence.sum())
+        avg_accuracy = float(cols.accuracy.mean()) if model_results else 0
+
+        # Aggregate competitor info (sorted by mentions)
+        sorted_comps = competitor_stats(cols, max_prompts=5, max_sources=10)
+    await asyncio.get_running_loop().run_in_executor(None, competitor_resolver.flush)
     
     competitor_summary = []
-    sorted_comps = sorted(comp_stats.items(), key=lambda x: x[1]["mentions"], reverse=True)
-    
-    for name, stats in sorted_comps:
-        avg_rank = sum(stats["ranks"]) / len(stats["ranks"]) if stats["ranks"] else "N/A"
-        if isinstance(avg_rank, float):
-            avg_rank = round(avg_rank, 1)
-        competitor_summary.append(f"{name}: Appearances={stats['mentions']}, Avg Rank={avg_rank}")
+    for stats in sorted_comps:
+        avg_rank = round(stats.avg_rank, 1) if stats.avg_rank is not None else "N/A"
+        competitor_summary.append(f"{stats.name}: Appearances={stats.mentions}, Avg Rank={avg_rank}")
 
     # 4. Generate AI-driven Summary & Tips
     key_findings = [
         f"Brand mention rate: {mentions}/{len(prompts)}",
         f"Average information accuracy: {round(avg_accuracy * 100, 1)}%",
-        f"Total competitors identified: {len(comp_stats)}"
+        f"Total competitors identified: {len(sorted_comps)}"
     ]
     optimizer_tips = []
     competitor_reasons = {}
 
     try:
-        report_provider = "cerebras" if cerebras_client else "gemini"
+        report_provider = "cerebras" if has_provider("cerebras") else "gemini"
         
         # Prepare context for competitor reasoning
         comp_context_list = []
-        for name, stats in sorted_comps[:10]:
-            avg_r = sum(stats["ranks"]) / len(stats["ranks"]) if stats["ranks"] else "N/A"
-            comp_context_list.append(f"- {name}: {stats['mentions']} mentions, Avg Rank: {avg_r}")
+        for stats in sorted_comps[:10]:
+            avg_r = stats.avg_rank if stats.avg_rank is not None else "N/A"
+            comp_context_list.append(f"- {stats.name}: {stats.mentions} mentions, Avg Rank: {avg_r}")
         comp_context = "\n".join(comp_context_list)
 
         report_prompt = f"""
@@ -328,49 +332,52 @@ Top Competitors Found:
 Instructions:
 1. Provide 3-4 specific 'key_findings' about their current AI visibility.
 2. Provide 3-4 'optimizer_tips' that are EXTREMELY SPECIFIC to this company's industry and offerings. 
-3. For each top competitor listed above, provides a 'competitor_reasons' entry (mapping name to string) explaining why they are frequently cited or ranking high (e.g. better local SEO, specific feature mentions, or stronger brand authority). Explain what they have that {company.company_name} might be missing in this context.
+3. For each top competitor listed above, provides a 'competitor_reasons' entry (name and reason) explaining why they are frequently cited or ranking high (e.g. better local SEO, specific feature mentions, or stronger brand authority). Explain what they have that {company.company_name} might be missing in this context.
 4. Return valid JSON only. DO NOT use any emojis in your response.
 
 Schema:
 {{
   "key_findings": ["insight 1", "insight 2"],
   "optimizer_tips": ["actionable tip 1", "actionable tip 2"],
-  "competitor_reasons": {{
-    "Competitor Name": "One sentence explanation of their GEO edge."
-  }}
+  "competitor_reasons": [
+    {{"name": "Competitor Name", "reason": "One sentence explanation of their GEO edge."}}
+  ]
 }}
 """
         loop = asyncio.get_running_loop()
-        report_text = await loop.run_in_executor(
-            None, 
-            partial(generate_ai_response, report_prompt, provider=report_provider, response_mime_type="application/json")
-        )
-        report_data = json.loads(report_text)
+        with stage("report", provider=report_provider):
+            async with provider_slot(report_provider):
+                report_data = await loop.run_in_executor(
+                    provider_executor,
+                    partial(generate_structured, report_prompt, ReportOutput, provider=report_provider)
+                )
         if isinstance(report_data, dict):
             if report_data.get("key_findings"):
                 key_findings = report_data["key_findings"]
             if report_data.get("optimizer_tips"):
                 optimizer_tips = report_data["optimizer_tips"]
-            if report_data.get("competitor_reasons"):
-                competitor_reasons = report_data["competitor_reasons"]
+            reasons = report_data.get("competitor_reasons")
+            if isinstance(reasons, list):
+                competitor_reasons = {r["name"]: r["reason"] for r in reasons if isinstance(r, dict) and "name" in r and "reason" in r}
+            elif isinstance(reasons, dict):
+                competitor_reasons = reasons
     except Exception as e:
-        print(f"[WARNING] AI summary generation failed: {e}")
+        logger.warning("AI summary generation failed", extra={"error": str(e)})
 
     # Build final CompetitorInsight list
     competitor_insights = []
     from app.schemas import CompetitorInsight
-    for name, stats in sorted_comps:
-        avg_rank = sum(stats["ranks"]) / len(stats["ranks"]) if stats["ranks"] else None
-        competitor_insights.append(CompetitorInsight(
-            name=name,
-            mentions=stats["mentions"],
-            avg_rank=avg_rank,
-            prompts_appeared=stats["prompts"][:5], # Limit to 5 for space
-            sources=stats["sources"][:10], # Limit to 10 sources per competitor
-            visibility_reason=competitor_reasons.get(name, "Commonly associated with this industry category in model training data.")
+    for stats in sorted_comps:
+        competitor_insights.append(CompetitorInsight.model_construct(
+            name=stats.name,
+            mentions=stats.mentions,
+            avg_rank=stats.avg_rank,
+            prompts_appeared=stats.prompts, # Limited to 5 for space
+            sources=stats.sources, # Limited to 10 sources per competitor
+            visibility_reason=competitor_reasons.get(stats.name, "Commonly associated with this industry category in model training data.")
         ))
 
-    return VisibilityReport(
+    return VisibilityReport.model_construct(
         company_name=company.company_name,
         overall_score=round(overall_score, 2),
         queries_tested=[p.prompt_text for p in prompts],
@@ -0,0 +1,118 @@
+# app/executors.py
+"""
+Named, bounded thread pools per workload class.
+
+Blocking work used to share the event loop's default executor (and an ad-hoc
+pool in the website loader), so a burst of audits could starve /login and vice
+versa. Each workload class now gets its own pool:
+
+- provider_executor: blocking LLM provider calls
+- crawl_executor:    blocking website fetches (requests)
+- parse_executor:    HTML parsing (readability / BeautifulSoup)
+- password_executor: bcrypt hashing and verification
+
+Every pool has a queue-depth limit. When it is full, submit() raises
+ExecutorSaturated immediately instead of queueing unboundedly; the API maps
+that to 503. Queue and active-worker gauges are exposed via executor_stats().
+Tasks run in a copy of the submitter's contextvars (tenant, trace span); for a
+profiled request the queue wait is recorded and the worker is sampled while it runs.
+"""
+
+import contextvars
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, List
+
+from app.config import (
+    PROVIDER_IO_WORKERS, PROVIDER_IO_QUEUE,
+    CRAWL_IO_WORKERS, CRAWL_IO_QUEUE,
+    HTML_PARSE_WORKERS, HTML_PARSE_QUEUE,
+    PASSWORD_HASH_WORKERS, PASSWORD_HASH_QUEUE,
+)
+from app.profiling import active_profile
+
+
+class ExecutorSaturated(RuntimeError):
+    """Raised when a bounded executor's queue is full."""
+
+    def __init__(self, name: str, max_queue: int):
+        super().__init__(f"Executor '{name}' is saturated (queue limit {max_queue})")
+        self.name = name
+
+
+class BoundedExecutor(ThreadPoolExecutor):
+    """
+    ThreadPoolExecutor with a queue-depth limit and live gauges.
+    `max_queue` counts tasks waiting for a worker; <= 0 means unbounded.
+    Usable anywhere an Executor is accepted, e.g. loop.run_in_executor(pool, fn).
+    """
+
+    def __init__(self, name: str, max_workers: int, max_queue: int):
+        super().__init__(max_workers=max_workers, thread_name_prefix=f"geo-{name}")
+        self.name = name
+        self.max_queue = max_queue
+        self._stats_lock = threading.Lock()
+        self._pending = 0  # Submitted and not yet finished (queued + active)
+        self._active = 0
+        self.completed = 0
+        self.rejected = 0
+
+    def submit(self, fn, /, *args, **kwargs) -> Future:
+        with self._stats_lock:
+            if self.max_queue > 0 and self._pending >= self._max_workers + self.max_queue:
+                self.rejected += 1
+                raise ExecutorSaturated(self.name, self.max_queue)
+            self._pending += 1
+
+        # Run in the submitter's context so tenant and trace context follow the work
+        context = contextvars.copy_context()
+        profile = context.get(active_profile)
+        submitted = time.perf_counter()
+
+        def run():
+            with self._stats_lock:
+                self._active += 1
+            if profile is not None:
+                profile.add_wait(f"executor_queue.{self.name}", time.perf_counter() - submitted)
+                profile.enter_worker()
+            try:
+                return context.run(fn, *args, **kwargs)
+            finally:
+                if profile is not None:
+                    profile.exit_worker()
+                with self._stats_lock:
+                    self._active -= 1
+                    self._pending -= 1
+                    self.completed += 1
+
+        try:
+            return super().submit(run)
+        except Exception:
+            with self._stats_lock:
+                self._pending -= 1
+            raise
+
+    def stats(self) -> Dict[str, int]:
+        with self._stats_lock:
+            return {
+                "workers": self._max_workers,
+                "active": self._active,
+                "queued": self._pending - self._active,
+                "max_queue": self.max_queue,
+                "completed": self.completed,
+                "rejected": self.rejected,
+            }
+
+
+provider_executor = BoundedExecutor("provider-io", PROVIDER_IO_WORKERS, PROVIDER_IO_QUEUE)
+crawl_executor = BoundedExecutor("crawl-io", CRAWL_IO_WORKERS, CRAWL_IO_QUEUE)
+parse_executor = BoundedExecutor("html-parse", HTML_PARSE_WORKERS, HTML_PARSE_QUEUE)
+password_executor = BoundedExecutor("password-hash", PASSWORD_HASH_WORKERS, PASSWORD_HASH_QUEUE)
+
+EXECUTORS: List[BoundedExecutor] = [provider_executor, crawl_executor, parse_executor, password_executor]
+
+
+def executor_stats() -> Dict[str, Dict[str, int]]:
+    """Queue-depth and active-worker gauges for every named executor."""
+    return {executor.name: executor.stats() for executor in EXECUTORS}
@@ -0,0 +1,173 @@
+# app/fair_queue.py
+"""
+Multi-tenant fair scheduler in front of the LLM provider layer.
+
+Each provider has a fixed number of concurrent call slots. Waiting calls are
+queued per tenant (user id / API key) and per priority class:
+
+- interactive: single-prompt requests (/evaluate-prompt) are always served first
+- bulk: audits; tenants share capacity by deficit round robin, optionally
+  weighted via FAIR_TENANT_WEIGHTS ("tenant=2,other=0.5")
+- background: catch-up monitoring runs; only served when nothing else waits
+
+so one user's 50-prompt audit can no longer monopolize Gemini/Cerebras while
+everyone else's clicks wait behind it. Tenant and priority travel with the
+request via contextvars (set once by the API middleware), so the evaluator
+doesn't need extra parameters.
+"""
+
+import asyncio
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import Deque, Dict, Optional
+
+from app.config import PROVIDER_CONCURRENCY, FAIR_TENANT_WEIGHTS
+from app.telemetry import span, record_queue_wait
+
+INTERACTIVE = "interactive"
+BULK = "bulk"
+BACKGROUND = "background"
+PRIORITIES = (INTERACTIVE, BULK, BACKGROUND)
+
+DEFAULT_TENANT = "anonymous"
+
+current_tenant: ContextVar[str] = ContextVar("current_tenant", default=DEFAULT_TENANT)
+current_priority: ContextVar[str] = ContextVar("current_priority", default=BULK)
+
+
+def parse_weights(spec: str) -> Dict[str, float]:
+    """Parse "tenant=2,other=0.5" into {tenant: weight}; invalid entries are ignored."""
+    weights = {}
+    for item in (spec or "").split(","):
+        tenant, _, value = item.partition("=")
+        try:
+            weight = float(value)
+        except ValueError:
+            continue
+        if tenant.strip() and weight > 0:
+            weights[tenant.strip()] = weight
+    return weights
+
+
+class FairScheduler:
+    """
+    Async slot limiter with strict priority between classes and deficit round
+    robin between tenants within a class (each call costs one unit).
+    """
+
+    def __init__(self, name: str, capacity: int, weights: Optional[Dict[str, float]] = None):
+        self.name = name
+        self.capacity = max(1, capacity)
+        self.weights = weights or {}
+        self._in_use = 0
+        self._queues: Dict[str, "OrderedDict[str, Deque[asyncio.Future]]"] = {p: OrderedDict() for p in PRIORITIES}
+        self._deficit: Dict[tuple, float] = {}
+
+    def _next_waiter(self) -> Optional[asyncio.Future]:
+        for priority in PRIORITIES:
+            queues = self._queues[priority]
+            while queues:
+                tenant, queue = next(iter(queues.items()))
+                while queue and queue[0].done():  # Cancelled while waiting
+                    queue.popleft()
+                key = (priority, tenant)
+                if not queue:
+                    del queues[tenant]
+                    self._deficit.pop(key, None)
+                    continue
+
+                if self._deficit.get(key, 0.0) < 1:
+                    # Tenant's turn: add its quantum; low-weight tenants may need several rounds
+                    self._deficit[key] = self._deficit.get(key, 0.0) + self.weights.get(tenant, 1.0)
+                    if self._deficit[key] < 1:
+                        queues.move_to_end(tenant)
+                    continue
+
+                self._deficit[key] -= 1
+                waiter = queue.popleft()
+                if not queue:
+                    del queues[tenant]
+                    self._deficit.pop(key, None)
+                elif self._deficit[key] < 1:
+                    queues.move_to_end(tenant)
+                return waiter
+        return None
+
+    def _dispatch(self):
+        while self._in_use < self.capacity:
+            waiter = self._next_waiter()
+            if waiter is None:
+                return
+            self._in_use += 1
+            waiter.set_result(None)
+
+    async def acquire(self, tenant: Optional[str] = None, priority: Optional[str] = None):
+        tenant = tenant or current_tenant.get()
+        priority = priority if priority in PRIORITIES else current_priority.get()
+        waiter = asyncio.get_running_loop().create_future()
+        self._queues[priority].setdefault(tenant, deque()).append(waiter)
+        self._dispatch()
+        started = time.perf_counter()
+        try:
+            with span("provider.queue", provider=self.name, tenant=tenant, priority=priority):
+                await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                self.release()  # Slot was granted just as we were cancelled
+            raise
+        record_queue_wait(self.name, time.perf_counter() - started)
+
+    def release(self):
+        self._in_use -= 1
+        self._dispatch()
+
+    @asynccontextmanager
+    async def slot(self, tenant: Optional[str] = None, priority: Optional[str] = None):
+        await self.acquire(tenant, priority)
+        try:
+            yield
+        finally:
+            self.release()
+
+    def stats(self) -> dict:
+        return {
+            "capacity": self.capacity,
+            "in_use": self._in_use,
+            "waiting": {
+                priority: {tenant: sum(1 for w in queue if not w.done()) for tenant, queue in queues.items()}
+                for priority, queues in self._queues.items()
+            },
+        }
+
+
+_schedulers: Dict[str, FairScheduler] = {}
+_weights = parse_weights(FAIR_TENANT_WEIGHTS)
+_capacity = PROVIDER_CONCURRENCY
+
+
+def get_scheduler(provider: str) -> FairScheduler:
+    """One scheduler per provider, since each has its own capacity."""
+    scheduler = _schedulers.get(provider)
+    if scheduler is None:
+        scheduler = _schedulers[provider] = FairScheduler(provider, _capacity, _weights)
+    return scheduler
+
+
+def set_provider_capacity(capacity: int):
+    """Change the per-provider slot count (existing and future schedulers), e.g. a batch run's global budget."""
+    global _capacity
+    _capacity = max(1, capacity)
+    for scheduler in _schedulers.values():
+        scheduler.capacity = _capacity
+        scheduler._dispatch()
+
+
+def provider_slot(provider: str):
+    """`async with provider_slot("gemini"):` around a provider call, for the current tenant/priority."""
+    return get_scheduler(provider).slot()
+
+
+def scheduler_stats() -> Dict[str, dict]:
+    return {name: scheduler.stats() for name, scheduler in _schedulers.items()}
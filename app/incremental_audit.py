@@ -0,0 +1,200 @@
+# app/incremental_audit.py
+"""
+Incremental audits for daily monitoring.
+
+For each (prompt, provider, search mode), a stored result younger than the
+freshness window is reused; only stale or new prompts are sent to the provider.
+The report carries a diff against the previous audit of the same
+(company, provider, search mode): rank changes, new competitors, lost mentions.
+"""
+
+import asyncio
+from datetime import datetime, timedelta
+from functools import partial
+from typing import Dict, List, Optional
+
+from sqlalchemy.orm import Session
+
+from app.database import SessionLocal
+from app.config import AUDIT_FRESHNESS_HOURS
+from app.entity_resolution import competitor_resolver
+from app.evaluator import evaluate_prompts, build_visibility_report
+from app.telemetry import record_cache
+from app.structured_logging import get_logger
+from app.models import Audit, AuditPrompt, AuditResponse, AuditSource
+from app.schemas import (
+    AuditDiff, CompanyUnderstanding, CompetitorRank, EvaluationMetric, GeneratedPrompt,
+    ModelResponse, PromptDiff, SearchSource, VisibilityReport
+)
+
+logger = get_logger(__name__)
+
+
+def _to_model_response(row: AuditResponse, sources: List[SearchSource]) -> ModelResponse:
+    ranks = [CompetitorRank(**c) for c in (row.competitor_ranks or [])]
+    return ModelResponse(
+        model_name=row.model_name,
+        response_text=row.response_text or "",
+        evaluation=EvaluationMetric(
+            brand_present=row.brand_present,
+            url_cited=row.url_cited,
+            recommendation_rank=row.recommendation_rank,
+            accuracy_score=row.accuracy_score or 0.0,
+            sentiment=row.sentiment or "Neutral",
+            competitors_mentioned=[c.name for c in ranks],
+            competitor_ranks=ranks
+        ),
+        sources=sources,
+        evaluated_at=row.evaluated_at
+    )
+
+
+def _load_sources(db: Session, keys: List[tuple]) -> Dict[tuple, List[SearchSource]]:
+    """Sources for (audit_id, response_position) keys, in stored order."""
+    by_key: Dict[tuple, List[SearchSource]] = {key: [] for key in keys}
+    audit_ids = {audit_id for audit_id, _ in keys}
+    if not audit_ids:
+        return by_key
+    rows = db.query(AuditSource).filter(AuditSource.audit_id.in_(audit_ids)).order_by(AuditSource.id).all()
+    for s in rows:
+        key = (s.audit_id, s.response_position)
+        if key in by_key:
+            by_key[key].append(SearchSource(
+                title=s.title or s.url, url=s.url, favicon=s.favicon, description=s.description,
+                domain=s.domain, is_grounded=s.is_grounded, source_type=s.source_type or "web"
+            ))
+    return by_key
+
+
+def load_fresh_results(db: Session, company: str, prompt_texts: List[str], provider: str, use_google_search: bool, max_age_hours: float) -> Dict[str, ModelResponse]:
+    """Newest stored result per prompt text that was evaluated within `max_age_hours`."""
+    if not prompt_texts or max_age_hours <= 0:
+        return {}
+    since = datetime.utcnow() - timedelta(hours=max_age_hours)
+    rows = (
+        db.query(AuditPrompt.prompt_text, AuditResponse)
+        .join(Audit, Audit.id == AuditPrompt.audit_id)
+        .join(AuditResponse, (AuditResponse.audit_id == AuditPrompt.audit_id) & (AuditResponse.position == AuditPrompt.position))
+        .filter(
+            Audit.company == company,
+            Audit.created_at >= since,  # Narrows via the (company, created_at) index
+            Audit.provider == provider,
+            Audit.use_google_search == use_google_search,
+            AuditResponse.evaluated_at >= since,
+            AuditResponse.error.is_(None),  # Failed evaluations are always re-run
+            AuditPrompt.prompt_text.in_(set(prompt_texts))
+        )
+        .order_by(AuditResponse.evaluated_at.desc())
+        .all()
+    )
+    newest: Dict[str, AuditResponse] = {}
+    for text, response in rows:
+        newest.setdefault(text, response)
+
+    sources = _load_sources(db, [(r.audit_id, r.position) for r in newest.values()])
+    return {text: _to_model_response(r, sources[(r.audit_id, r.position)]) for text, r in newest.items()}
+
+
+def load_previous_audit(db: Session, company: str, provider: str, use_google_search: bool) -> Optional[dict]:
+    """Latest audit of the same kind with its per-prompt outcomes."""
+    audit = (
+        db.query(Audit)
+        .filter(Audit.company == company, Audit.provider == provider, Audit.use_google_search == use_google_search)
+        .order_by(Audit.created_at.desc())
+        .first()
+    )
+    if not audit:
+        return None
+    rows = (
+        db.query(AuditPrompt.prompt_text, AuditResponse.brand_present, AuditResponse.recommendation_rank, AuditResponse.competitor_ranks)
+        .join(AuditResponse, (AuditResponse.audit_id == AuditPrompt.audit_id) & (AuditResponse.position == AuditPrompt.position))
+        .filter(AuditPrompt.audit_id == audit.id)
+        .all()
+    )
+    prompts = {
+        text: {
+            "present": present,
+            "rank": rank if present else None,
+            "competitors": {competitor_resolver.resolve(c["name"]) for c in (comps or []) if "name" in c}
+        }
+        for text, present, rank, comps in rows
+    }
+    return {"id": audit.id, "created_at": audit.created_at, "overall_score": audit.overall_score, "prompts": prompts}
+
+
+def compute_diff(previous: Optional[dict], prompts: List[GeneratedPrompt], results: List[ModelResponse], overall_score: float) -> AuditDiff:
+    diff = AuditDiff()
+    if not previous:
+        return diff
+    diff.previous_audit_id = previous["id"]
+    diff.previous_audit_at = previous["created_at"]
+    diff.score_change = round(overall_score - previous["overall_score"], 2)
+
+    previous_competitors = set()
+    for outcome in previous["prompts"].values():
+        previous_competitors |= outcome["competitors"]
+    current_competitors = set()
+
+    for prompt, result in zip(prompts, results):
+        ev = result.evaluation
+        competitors = {competitor_resolver.resolve(n) for n in ev.competitors_mentioned}
+        current_competitors |= competitors
+        before = previous["prompts"].get(prompt.prompt_text)
+        if before is None:
+            continue  # New prompt: nothing to compare against
+
+        rank = ev.recommendation_rank if ev.brand_present else None
+        change = PromptDiff(
+            prompt_text=prompt.prompt_text,
+            previous_rank=before["rank"],
+            current_rank=rank,
+            rank_change=(before["rank"] - rank) if before["rank"] and rank else None,
+            mention_lost=before["present"] and not ev.brand_present,
+            mention_gained=ev.brand_present and not before["present"],
+            new_competitors=sorted(competitors - before["competitors"])
+        )
+        if change.mention_lost:
+            diff.lost_mentions.append(prompt.prompt_text)
+        if change.rank_change or change.mention_lost or change.mention_gained or change.new_competitors:
+            diff.prompt_changes.append(change)
+
+    diff.new_competitors = sorted(current_competitors - previous_competitors)
+    return diff
+
+
+def _load_history(company: str, prompt_texts: List[str], provider: str, use_google_search: bool, max_age_hours: float):
+    db = SessionLocal()
+    try:
+        return (
+            load_fresh_results(db, company, prompt_texts, provider, use_google_search, max_age_hours),
+            load_previous_audit(db, company, provider, use_google_search)
+        )
+    finally:
+        db.close()
+
+
+async def evaluate_visibility_incremental(
+    company: CompanyUnderstanding,
+    prompts: List[GeneratedPrompt],
+    use_google_search: bool = False,
+    provider: str = "gemini",
+    freshness_hours: float = AUDIT_FRESHNESS_HOURS
+) -> VisibilityReport:
+    """evaluate_visibility that only re-runs stale or new prompts and attaches a diff."""
+    loop = asyncio.get_running_loop()
+    fresh, previous = await loop.run_in_executor(None, partial(
+        _load_history, company.company_name, [p.prompt_text for p in prompts], provider, use_google_search, freshness_hours
+    ))
+
+    stale = [p for p in prompts if p.prompt_text not in fresh]
+    record_cache("audit_results", hits=len(prompts) - len(stale), misses=len(stale))
+    logger.info("Incremental audit", extra={"reused": len(prompts) - len(stale), "evaluating": len(stale)})
+    evaluated = iter(await evaluate_prompts(company, stale, use_google_search, provider)) if stale else iter(())
+
+    results = [fresh[p.prompt_text] if p.prompt_text in fresh else next(evaluated) for p in prompts]
+    report = await build_visibility_report(company, prompts, results)
+
+    report.diff = compute_diff(previous, prompts, results, report.overall_score)
+    report.diff.reused_prompts = len(prompts) - len(stale)
+    report.diff.evaluated_prompts = len(stale)
+    return report
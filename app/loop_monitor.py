@@ -0,0 +1,65 @@
+# app/loop_monitor.py
+"""
+Event-loop lag monitor.
+
+A background task sleeps for a fixed interval and measures how late it wakes
+up. The overshoot is the time the loop was blocked by (or busy with) other
+work. Recent samples are kept for percentiles, served from /health/loop.
+"""
+
+import asyncio
+import time
+from collections import deque
+from typing import Optional
+
+from app.config import LOOP_LAG_INTERVAL_MS
+
+MAX_SAMPLES = 3000  # ~5 minutes at the default 100 ms interval
+
+
+class LoopLagMonitor:
+    def __init__(self, interval_ms: float = LOOP_LAG_INTERVAL_MS, max_samples: int = MAX_SAMPLES):
+        self.interval = interval_ms / 1000
+        self._samples = deque(maxlen=max_samples)
+        self._max_lag = 0.0
+        self._task: Optional[asyncio.Task] = None
+
+    async def _run(self):
+        while True:
+            expected = time.perf_counter() + self.interval
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, time.perf_counter() - expected)
+            self._samples.append(lag)
+            self._max_lag = max(self._max_lag, lag)
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def reset(self):
+        self._samples.clear()
+        self._max_lag = 0.0
+
+    def stats(self) -> dict:
+        samples = sorted(self._samples)
+
+        def pct(q):
+            return round(samples[min(len(samples) - 1, int(q * len(samples)))] * 1000, 2) if samples else 0.0
+
+        return {
+            "interval_ms": round(self.interval * 1000, 1),
+            "samples": len(samples),
+            "p50_ms": pct(0.50),
+            "p95_ms": pct(0.95),
+            "p99_ms": pct(0.99),
+            "max_recent_ms": round(samples[-1] * 1000, 2) if samples else 0.0,
+            "max_ms": round(self._max_lag * 1000, 2),
+        }
+
+
+loop_monitor = LoopLagMonitor()
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime
+from sqlalchemy import Column, Integer, String, Date, DateTime, Boolean, Float, Text, JSON, ForeignKey, Index, UniqueConstraint
 from datetime import datetime
 from .database import Base
 
@@ -10,3 +10,183 @@ class User(Base):
     hashed_password = Column(String, nullable=False)
     full_name = Column(String)
     created_at = Column(DateTime, default=datetime.utcnow)
+
+# --- Audit history ---
+# Child rows reference their response by (audit_id, position) so a whole audit
+# can be written with bulk inserts without fetching generated ids per row.
+
+class Audit(Base):
+    __tablename__ = "audits"
+
+    id = Column(Integer, primary_key=True)
+    company = Column(String, nullable=False)
+    company_url = Column(String)
+    region = Column(String)
+    provider = Column(String, nullable=False)
+    use_google_search = Column(Boolean, default=False, nullable=False)
+    overall_score = Column(Float, nullable=False)
+    prompt_count = Column(Integer, nullable=False)
+    mention_count = Column(Integer, nullable=False)
+    avg_rank = Column(Float)
+    avg_accuracy = Column(Float)
+    key_findings = Column(JSON)
+    optimizer_tips = Column(JSON)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+    __table_args__ = (
+        Index("ix_audits_company_created_at", "company", "created_at"),
+    )
+
+class AuditPrompt(Base):
+    __tablename__ = "audit_prompts"
+
+    id = Column(Integer, primary_key=True)
+    audit_id = Column(Integer, ForeignKey("audits.id", ondelete="CASCADE"), nullable=False, index=True)
+    position = Column(Integer, nullable=False)
+    prompt_text = Column(Text, nullable=False)
+    intent_category = Column(String)
+
+class AuditResponse(Base):
+    __tablename__ = "audit_responses"
+
+    id = Column(Integer, primary_key=True)
+    audit_id = Column(Integer, ForeignKey("audits.id", ondelete="CASCADE"), nullable=False)
+    position = Column(Integer, nullable=False)
+    model_name = Column(String)
+    response_text = Column(Text)
+    brand_present = Column(Boolean, nullable=False)
+    url_cited = Column(Boolean, default=False)
+    recommendation_rank = Column(Integer)
+    accuracy_score = Column(Float)
+    sentiment = Column(String)
+    competitor_ranks = Column(JSON)
+    # When the prompt actually ran; results reused by incremental audits keep the original time
+    evaluated_at = Column(DateTime, nullable=False)
+    # Provider/judge failure behind a fallback answer; such rows are never reused as fresh results
+    error = Column(Text)
+
+    __table_args__ = (
+        Index("ix_audit_responses_audit_position", "audit_id", "position"),
+    )
+
+class AuditSource(Base):
+    __tablename__ = "audit_sources"
+
+    id = Column(Integer, primary_key=True)
+    audit_id = Column(Integer, ForeignKey("audits.id", ondelete="CASCADE"), nullable=False, index=True)
+    response_position = Column(Integer, nullable=False)
+    url = Column(Text, nullable=False)
+    title = Column(String)
+    domain = Column(String)
+    favicon = Column(Text)
+    description = Column(Text)
+    is_grounded = Column(Boolean, default=False)
+    source_type = Column(String)
+
+class CompetitorMention(Base):
+    __tablename__ = "competitor_mentions"
+
+    id = Column(Integer, primary_key=True)
+    audit_id = Column(Integer, ForeignKey("audits.id", ondelete="CASCADE"), nullable=False, index=True)
+    response_position = Column(Integer, nullable=False)
+    # Denormalized from Audit so trend queries never need the join
+    company = Column(String, nullable=False)
+    competitor = Column(String, nullable=False)
+    rank = Column(Integer)
+    url_cited = Column(Boolean, default=False)
+    created_at = Column(DateTime, nullable=False)
+
+    __table_args__ = (
+        Index("ix_competitor_mentions_competitor_created_at", "competitor", "created_at"),
+        Index("ix_competitor_mentions_company_created_at", "company", "created_at"),
+    )
+
+# --- Pre-aggregated rollups for dashboard trends ---
+# Additive counters (sums/counts) so days can be re-bucketed into weeks/months
+# and incremented in place when each audit commits.
+
+class VisibilityRollup(Base):
+    __tablename__ = "visibility_rollups"
+
+    id = Column(Integer, primary_key=True)
+    company = Column(String, nullable=False)
+    day = Column(Date, nullable=False)
+    provider = Column(String, nullable=False)
+    use_google_search = Column(Boolean, nullable=False, default=False)
+    audits = Column(Integer, nullable=False, default=0)
+    score_sum = Column(Float, nullable=False, default=0.0)
+    response_count = Column(Integer, nullable=False, default=0)
+    mention_count = Column(Integer, nullable=False, default=0)
+    rank_sum = Column(Float, nullable=False, default=0.0)
+    rank_count = Column(Integer, nullable=False, default=0)
+    competitor_mentions = Column(Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        UniqueConstraint("company", "day", "provider", "use_google_search", name="uq_visibility_rollups_key"),
+    )
+
+class CompetitorRollup(Base):
+    __tablename__ = "competitor_rollups"
+
+    id = Column(Integer, primary_key=True)
+    company = Column(String, nullable=False)
+    day = Column(Date, nullable=False)
+    provider = Column(String, nullable=False)
+    use_google_search = Column(Boolean, nullable=False, default=False)
+    competitor = Column(String, nullable=False)
+    mentions = Column(Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        UniqueConstraint("company", "day", "provider", "use_google_search", "competitor", name="uq_competitor_rollups_key"),
+    )
+
+# --- Recurring monitoring audits (see app/monitoring.py) ---
+
+class MonitoringSchedule(Base):
+    __tablename__ = "monitoring_schedules"
+
+    id = Column(Integer, primary_key=True)
+    company = Column(String, nullable=False)
+    url = Column(String)
+    points = Column(Text)
+    region = Column(String, default="Global")
+    provider = Column(String, nullable=False, default="gemini")
+    use_google_search = Column(Boolean, default=False, nullable=False)
+    cron = Column(String, nullable=False)  # 5-field cron spec or @daily/@weekly/..., evaluated in UTC
+    jitter_seconds = Column(Integer, nullable=False, default=300)
+    window_minutes = Column(Integer, nullable=False, default=120)  # Runs are spread over this window after each cron time
+    # Profile and prompts from the first run, reused so results stay comparable over time
+    company_profile = Column(JSON)
+    prompts = Column(JSON)
+    enabled = Column(Boolean, default=True, nullable=False)
+    next_run_at = Column(DateTime)  # Next cron time not yet planned
+    last_run_at = Column(DateTime)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+    __table_args__ = (
+        Index("ix_monitoring_schedules_enabled_next_run_at", "enabled", "next_run_at"),
+    )
+
+class MonitoringRun(Base):
+    __tablename__ = "monitoring_runs"
+
+    id = Column(Integer, primary_key=True)
+    schedule_id = Column(Integer, ForeignKey("monitoring_schedules.id", ondelete="CASCADE"), nullable=False)
+    scheduled_for = Column(DateTime, nullable=False)  # Cron time this run belongs to
+    planned_at = Column(DateTime, nullable=False)  # When it starts, after load spreading and jitter
+    provider = Column(String, nullable=False)
+    estimated_calls = Column(Integer, nullable=False)
+    priority = Column(String, nullable=False)  # Fair-scheduler class: bulk, or background for catch-up runs
+    catch_up = Column(Boolean, default=False, nullable=False)
+    missed_count = Column(Integer, nullable=False, default=0)  # Older cron times folded into this catch-up run
+    status = Column(String, nullable=False, default="pending")  # pending, running, ok, error
+    started_at = Column(DateTime)
+    finished_at = Column(DateTime)
+    audit_id = Column(Integer, ForeignKey("audits.id", ondelete="SET NULL"))
+    overall_score = Column(Float)
+    error = Column(Text)
+
+    __table_args__ = (
+        UniqueConstraint("schedule_id", "scheduled_for", name="uq_monitoring_runs_schedule_time"),  # One planner wins across workers
+        Index("ix_monitoring_runs_status_planned_at", "status", "planned_at"),
+    )
@@ -0,0 +1,482 @@
+# app/monitoring.py
+"""
+In-process scheduler for recurring monitoring audits.
+
+A MonitoringSchedule is a company to re-audit on a cron spec (UTC), e.g.
+"0 6 * * *" or "@weekly". Its first run analyzes the site and stores the
+profile and prompts, and later runs evaluate the same prompts so trends stay
+comparable. Runs are persisted in monitoring_runs and recorded as normal audits.
+
+Load spreading: the many schedules that share a cron time (everyone picks
+midnight) don't all start at that time. Each run is planned into the
+least-loaded MONITOR_SLOT_MINUTES slot of its schedule's window, sized by its
+estimated provider calls against the provider's per-minute quota
+(MONITOR_PROVIDER_QUOTAS). If the whole window is over quota, the run spills
+into the next window. A random jitter spreads starts within the slot.
+
+Missed runs: a cron time that passed more than MONITOR_MISSED_GRACE_SECONDS ago
+without being planned (server down) is caught up. There is one catch-up run per
+schedule, for the latest missed time, and older ones are counted in
+missed_count. Catch-up runs are spread over MONITOR_CATCHUP_WINDOW_MINUTES and
+use the fair scheduler's background priority, so they only use provider
+capacity nobody else is waiting for. Runs left "running" by a crashed process
+are retried the same way.
+
+Every uvicorn worker can run the scheduler: the unique (schedule_id,
+scheduled_for) constraint lets one worker plan a run, and a conditional
+UPDATE lets one worker claim it.
+"""
+
+import asyncio
+import random
+from datetime import datetime, timedelta
+from functools import partial
+from typing import Dict, List, Optional, Set, Tuple
+
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.config import (
+    MONITOR_TICK_SECONDS, MONITOR_MAX_CONCURRENT_RUNS, MONITOR_SLOT_MINUTES,
+    MONITOR_PROVIDER_QUOTAS, MONITOR_DEFAULT_QUOTA_PER_MINUTE,
+    MONITOR_MISSED_GRACE_SECONDS, MONITOR_CATCHUP_WINDOW_MINUTES, MONITOR_RUN_TIMEOUT_MINUTES,
+)
+from app.database import SessionLocal
+from app.models import MonitoringSchedule, MonitoringRun
+from app.schemas import CompanyUnderstanding, GeneratedPrompt
+from app.fair_queue import current_tenant, current_priority, parse_weights, BULK, BACKGROUND
+from app.prompt_generator import DEFAULT_PROMPT_COUNT
+from app.telemetry import span
+from app.structured_logging import get_logger, log_context, new_audit_id
+
+logger = get_logger(__name__)
+
+MONITOR_TENANT = "monitoring"
+MAX_MISSED_COUNT = 10000  # Stop counting missed cron times beyond this (e.g. a minutely spec after a long outage)
+
+# --- Cron specs ---
+
+CRON_ALIASES = {
+    "@hourly": "0 * * * *",
+    "@daily": "0 0 * * *",
+    "@midnight": "0 0 * * *",
+    "@weekly": "0 0 * * 0",
+    "@monthly": "0 0 1 * *",
+}
+_NAMES = {
+    3: {name: i for i, name in enumerate(["jan", "feb", "mar", "apr", "may", "jun", "jul", "aug", "sep", "oct", "nov", "dec"], 1)},
+    4: {name: i for i, name in enumerate(["sun", "mon", "tue", "wed", "thu", "fri", "sat"])},
+}
+_BOUNDS = ((0, 59), (0, 23), (1, 31), (1, 12), (0, 7))  # minute hour day-of-month month day-of-week (0 and 7 = Sunday)
+
+
+class CronSpec:
+    """Standard 5-field cron spec (lists, ranges, steps, month/day names) or an @alias; raises ValueError when invalid."""
+
+    def __init__(self, spec: str):
+        self.spec = spec.strip()
+        fields = CRON_ALIASES.get(self.spec.lower(), self.spec).split()
+        if len(fields) != 5:
+            raise ValueError(f"Cron spec needs 5 fields (minute hour day month weekday), got {spec!r}")
+        values = [self._parse_field(field, index) for index, field in enumerate(fields)]
+        self.minutes, self.hours, self.days, self.months, weekdays = values
+        self.weekdays = {d % 7 for d in weekdays}
+        # Like cron: when both day fields are restricted, either may match
+        self.day_restricted = not fields[2].startswith("*")
+        self.weekday_restricted = not fields[4].startswith("*")
+
+    @staticmethod
+    def _parse_field(field: str, index: int) -> Set[int]:
+        low, high = _BOUNDS[index]
+        names = _NAMES.get(index, {})
+
+        def value(token: str) -> int:
+            number = names.get(token.lower()) if token.lower() in names else int(token)
+            if not low <= number <= high:
+                raise ValueError(f"{number} is out of range {low}-{high}")
+            return number
+
+        result = set()
+        for part in field.split(","):
+            base, _, step = part.partition("/")
+            try:
+                step_size = int(step) if step else 1
+                if base == "*":
+                    start, end = low, high
+                elif "-" in base:
+                    start, end = (value(x) for x in base.split("-", 1))
+                else:
+                    start = value(base)
+                    end = high if step else start
+            except ValueError as e:
+                raise ValueError(f"Invalid cron field {field!r}: {e}") from None
+            if step_size < 1 or start > end:
+                raise ValueError(f"Invalid cron field {field!r}")
+            result.update(range(start, end + 1, step_size))
+        return result
+
+    def _day_matches(self, t: datetime) -> bool:
+        day_ok = t.day in self.days
+        weekday_ok = (t.weekday() + 1) % 7 in self.weekdays
+        if self.day_restricted and self.weekday_restricted:
+            return day_ok or weekday_ok
+        return day_ok and weekday_ok
+
+    def next_after(self, after: datetime) -> datetime:
+        """First matching minute strictly after `after` (naive UTC)."""
+        t = after.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        limit = t.year + 5
+        while t.year <= limit:
+            if t.month not in self.months:
+                t = (t.replace(day=1, hour=0, minute=0) + timedelta(days=32)).replace(day=1)
+            elif not self._day_matches(t):
+                t = t.replace(hour=0, minute=0) + timedelta(days=1)
+            elif t.hour not in self.hours:
+                t = t.replace(minute=0) + timedelta(hours=1)
+            elif t.minute not in self.minutes:
+                t += timedelta(minutes=1)
+            else:
+                return t
+        raise ValueError(f"Cron spec {self.spec!r} never matches")
+
+
+# --- Load-spreading plan ---
+
+_quotas = parse_weights(MONITOR_PROVIDER_QUOTAS)  # Same "name=number,..." format as tenant weights
+
+
+def slot_capacity(provider: str) -> float:
+    """Provider calls one plan slot can hold without exceeding the provider's quota."""
+    return _quotas.get(provider, MONITOR_DEFAULT_QUOTA_PER_MINUTE) * MONITOR_SLOT_MINUTES
+
+
+def estimate_calls(schedule: MonitoringSchedule) -> int:
+    """One answer and one judge call per prompt plus the report; first runs also summarize and generate prompts."""
+    prompts = len(schedule.prompts) if schedule.prompts else DEFAULT_PROMPT_COUNT
+    return 2 * prompts + 1 + (0 if schedule.prompts else 2)
+
+
+def slot_start(t: datetime) -> datetime:
+    return t.replace(minute=t.minute - t.minute % MONITOR_SLOT_MINUTES, second=0, microsecond=0)
+
+
+def choose_slot(load: Dict[datetime, int], window_start: datetime, window_minutes: int, calls: int, capacity: float) -> datetime:
+    """Least-loaded slot of the window (earliest on ties); the next window's first fitting slot if none fits the quota."""
+    step = timedelta(minutes=MONITOR_SLOT_MINUTES)
+    first = slot_start(window_start)
+    count = max(1, window_minutes // MONITOR_SLOT_MINUTES)
+    slots = [first + i * step for i in range(count)]
+    best = min(slots, key=lambda s: (load.get(s, 0), s))
+    if load.get(best, 0) + calls > capacity:
+        for i in range(count, 2 * count):
+            candidate = first + i * step
+            if load.get(candidate, 0) + calls <= capacity:
+                return candidate
+    return best
+
+
+def planned_load(db: Session, since: datetime) -> Dict[Tuple[str, datetime], int]:
+    """Estimated calls of pending/running runs per (provider, slot)."""
+    rows = (
+        db.query(MonitoringRun.provider, MonitoringRun.planned_at, MonitoringRun.estimated_calls)
+        .filter(MonitoringRun.status.in_(("pending", "running")), MonitoringRun.planned_at >= since)
+        .all()
+    )
+    load: Dict[Tuple[str, datetime], int] = {}
+    for provider, planned_at, calls in rows:
+        key = (provider, slot_start(planned_at))
+        load[key] = load.get(key, 0) + calls
+    return load
+
+
+def plan_due_runs(now: datetime) -> int:
+    """Creates a run for every schedule whose cron time has come (on-time runs first, then catch-ups). Blocking."""
+    db = SessionLocal()
+    try:
+        due = (
+            db.query(MonitoringSchedule)
+            .filter(MonitoringSchedule.enabled.is_(True), MonitoringSchedule.next_run_at <= now)
+            .order_by(MonitoringSchedule.next_run_at)
+            .all()
+        )
+        if not due:
+            return 0
+        grace = timedelta(seconds=MONITOR_MISSED_GRACE_SECONDS)
+        due.sort(key=lambda s: now - s.next_run_at > grace)  # Stable: on-time runs claim the emptiest slots first
+        load = planned_load(db, slot_start(now) - timedelta(minutes=MONITOR_SLOT_MINUTES))
+
+        planned = 0
+        for schedule in due:
+            cron = CronSpec(schedule.cron)
+            scheduled_for, missed = schedule.next_run_at, 0
+            catch_up = now - scheduled_for > grace
+            if catch_up:
+                # Only the latest missed time is run; older ones are folded into it
+                following = cron.next_after(scheduled_for)
+                while following <= now and missed < MAX_MISSED_COUNT:
+                    scheduled_for, following, missed = following, cron.next_after(following), missed + 1
+                window_start, window_minutes = now, MONITOR_CATCHUP_WINDOW_MINUTES
+            else:
+                window_start, window_minutes = scheduled_for, schedule.window_minutes
+
+            calls = estimate_calls(schedule)
+            slot = choose_slot(
+                {s: n for (p, s), n in load.items() if p == schedule.provider},
+                window_start, window_minutes, calls, slot_capacity(schedule.provider),
+            )
+            planned_at = max(slot, window_start) + timedelta(seconds=random.uniform(0, schedule.jitter_seconds or 0))
+            run = MonitoringRun(
+                schedule_id=schedule.id,
+                scheduled_for=scheduled_for,
+                planned_at=planned_at,
+                provider=schedule.provider,
+                estimated_calls=calls,
+                priority=BACKGROUND if catch_up else BULK,
+                catch_up=catch_up,
+                missed_count=missed,
+            )
+            schedule.next_run_at = cron.next_after(max(scheduled_for, now) if catch_up else scheduled_for)
+            db.add(run)
+            try:
+                db.commit()
+            except IntegrityError:
+                db.rollback()  # Another worker planned this cron time
+                continue
+            load[(schedule.provider, slot)] = load.get((schedule.provider, slot), 0) + calls
+            planned += 1
+            logger.info("Monitoring run planned", extra={
+                "schedule_id": schedule.id, "company": schedule.company, "scheduled_for": scheduled_for.isoformat(),
+                "planned_at": planned_at.isoformat(), "estimated_calls": calls, "catch_up": catch_up, "missed": missed,
+            })
+        return planned
+    finally:
+        db.close()
+
+
+def claim_due_runs(now: datetime, limit: int) -> List[dict]:
+    """Marks up to `limit` due runs as running (catch-ups last) and returns what's needed to execute them. Blocking."""
+    db = SessionLocal()
+    try:
+        # Runs stuck in "running" belonged to a process that died: retry them as low-priority catch-ups
+        stale = now - timedelta(minutes=MONITOR_RUN_TIMEOUT_MINUTES)
+        db.query(MonitoringRun).filter(MonitoringRun.status == "running", MonitoringRun.started_at < stale).update(
+            {"status": "pending", "catch_up": True, "priority": BACKGROUND, "error": "interrupted"}, synchronize_session=False
+        )
+        db.commit()
+
+        candidates = (
+            db.query(MonitoringRun, MonitoringSchedule)
+            .join(MonitoringSchedule, MonitoringSchedule.id == MonitoringRun.schedule_id)
+            .filter(MonitoringRun.status == "pending", MonitoringRun.planned_at <= now)
+            .order_by(MonitoringRun.catch_up, MonitoringRun.planned_at)
+            .limit(limit)
+            .all()
+        )
+        jobs = []
+        for run, schedule in candidates:
+            job = {
+                "run_id": run.id,
+                "schedule_id": schedule.id,
+                "priority": run.priority,
+                "catch_up": run.catch_up,
+                "company": schedule.company,
+                "url": schedule.url or "",
+                "points": schedule.points or "",
+                "region": schedule.region or "Global",
+                "provider": schedule.provider,
+                "use_google_search": schedule.use_google_search,
+                "company_profile": schedule.company_profile,
+                "prompts": schedule.prompts,
+            }
+            claimed = db.query(MonitoringRun).filter(MonitoringRun.id == run.id, MonitoringRun.status == "pending").update(
+                {"status": "running", "started_at": now}, synchronize_session=False
+            )
+            db.commit()
+            if claimed:  # Otherwise another worker got it
+                jobs.append(job)
+        return jobs
+    finally:
+        db.close()
+
+
+def finish_run(run_id: int, status: str, audit_id: Optional[int] = None, overall_score: Optional[float] = None, error: Optional[str] = None):
+    db = SessionLocal()
+    try:
+        now = datetime.utcnow()
+        run = db.get(MonitoringRun, run_id)
+        run.status, run.finished_at = status, now
+        run.audit_id, run.overall_score, run.error = audit_id, overall_score, error
+        if status == "ok":
+            db.query(MonitoringSchedule).filter(MonitoringSchedule.id == run.schedule_id).update(
+                {"last_run_at": now}, synchronize_session=False
+            )
+        db.commit()
+    finally:
+        db.close()
+
+
+def store_analysis(schedule_id: int, company_profile: CompanyUnderstanding, prompts: List[GeneratedPrompt]):
+    db = SessionLocal()
+    try:
+        db.query(MonitoringSchedule).filter(MonitoringSchedule.id == schedule_id).update({
+            "company_profile": company_profile.model_dump(),
+            "prompts": [p.model_dump() for p in prompts],
+        }, synchronize_session=False)
+        db.commit()
+    finally:
+        db.close()
+
+
+# --- Schedule management (API) ---
+
+def create_schedule(db: Session, **fields) -> MonitoringSchedule:
+    """Validates the cron spec (ValueError) and sets the first cron time."""
+    cron = CronSpec(fields["cron"])
+    if len(cron.minutes) > 1:
+        # Every run is a full audit; more than one per hour would burn provider quota for no new signal
+        raise ValueError(f"Schedules run at most hourly: use a single minute value, e.g. '0 * * * *' (got {fields['cron']!r})")
+    schedule = MonitoringSchedule(**fields)
+    schedule.next_run_at = cron.next_after(datetime.utcnow())
+    db.add(schedule)
+    db.commit()
+    db.refresh(schedule)
+    return schedule
+
+
+def schedule_to_dict(schedule: MonitoringSchedule) -> dict:
+    return {
+        "id": schedule.id,
+        "company": schedule.company,
+        "url": schedule.url,
+        "region": schedule.region,
+        "provider": schedule.provider,
+        "use_google_search": schedule.use_google_search,
+        "cron": schedule.cron,
+        "jitter_seconds": schedule.jitter_seconds,
+        "window_minutes": schedule.window_minutes,
+        "enabled": schedule.enabled,
+        "prompt_count": len(schedule.prompts) if schedule.prompts else None,
+        "next_run_at": schedule.next_run_at.isoformat() if schedule.next_run_at else None,
+        "last_run_at": schedule.last_run_at.isoformat() if schedule.last_run_at else None,
+    }
+
+
+def list_runs(db: Session, schedule_id: int, limit: int = 50) -> List[dict]:
+    runs = (
+        db.query(MonitoringRun)
+        .filter(MonitoringRun.schedule_id == schedule_id)
+        .order_by(MonitoringRun.scheduled_for.desc())
+        .limit(limit)
+        .all()
+    )
+    return [
+        {
+            "id": run.id,
+            "scheduled_for": run.scheduled_for.isoformat(),
+            "planned_at": run.planned_at.isoformat(),
+            "started_at": run.started_at.isoformat() if run.started_at else None,
+            "finished_at": run.finished_at.isoformat() if run.finished_at else None,
+            "status": run.status,
+            "priority": run.priority,
+            "catch_up": run.catch_up,
+            "missed_count": run.missed_count,
+            "estimated_calls": run.estimated_calls,
+            "audit_id": run.audit_id,
+            "overall_score": run.overall_score,
+            "error": run.error,
+        }
+        for run in runs
+    ]
+
+
+def plan_summary(db: Session) -> dict:
+    """Planned calls per provider and slot vs. the slot's quota, for checking how runs are spread."""
+    now = datetime.utcnow()
+    load = planned_load(db, slot_start(now) - timedelta(minutes=MONITOR_SLOT_MINUTES))
+    providers: Dict[str, List[dict]] = {}
+    for (provider, slot), calls in sorted(load.items()):
+        providers.setdefault(provider, []).append({"slot": slot.isoformat(), "estimated_calls": calls})
+    return {
+        "slot_minutes": MONITOR_SLOT_MINUTES,
+        "providers": {
+            provider: {"slot_capacity": slot_capacity(provider), "slots": slots} for provider, slots in providers.items()
+        },
+        "pending_runs": db.query(func.count(MonitoringRun.id)).filter(MonitoringRun.status == "pending").scalar(),
+    }
+
+
+# --- Scheduler loop ---
+
+class MonitoringScheduler:
+    def __init__(self, tick_seconds: float = MONITOR_TICK_SECONDS, max_concurrent_runs: int = MONITOR_MAX_CONCURRENT_RUNS):
+        self.tick = tick_seconds
+        self.max_concurrent_runs = max(1, max_concurrent_runs)
+        self._task: Optional[asyncio.Task] = None
+        self._active: Set[asyncio.Task] = set()
+
+    async def tick_once(self):
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, plan_due_runs, datetime.utcnow())
+        free = self.max_concurrent_runs - len(self._active)
+        if free <= 0:
+            return
+        for job in await loop.run_in_executor(None, claim_due_runs, datetime.utcnow(), free):
+            task = loop.create_task(self._execute(job))
+            self._active.add(task)
+            task.add_done_callback(self._active.discard)
+
+    async def _run(self):
+        while True:
+            try:
+                await self.tick_once()
+            except Exception:
+                logger.exception("Monitoring scheduler tick failed")
+            await asyncio.sleep(self.tick)
+
+    async def _execute(self, job: dict):
+        # Imported here: the evaluator and pipeline pull in the provider layer
+        from app.pipeline import analyze_pipeline
+        from app.evaluator import evaluate_visibility
+        from app.audit_store import record_audit
+
+        loop = asyncio.get_running_loop()
+        current_tenant.set(MONITOR_TENANT)  # This task's own context
+        current_priority.set(job["priority"])
+        with log_context(audit_id=new_audit_id(), monitoring_run=job["run_id"], schedule_id=job["schedule_id"], provider=job["provider"]), \
+                span("monitoring.run", schedule_id=job["schedule_id"], catch_up=job["catch_up"]):
+            try:
+                if job["prompts"]:
+                    company_profile = CompanyUnderstanding.model_validate(job["company_profile"])
+                    prompts = [GeneratedPrompt.model_validate(p) for p in job["prompts"]]
+                else:
+                    company_profile, prompts, _ = await analyze_pipeline(job["url"], job["points"], job["region"])
+                    await loop.run_in_executor(None, store_analysis, job["schedule_id"], company_profile, prompts)
+
+                report = await evaluate_visibility(company_profile, prompts, use_google_search=job["use_google_search"], provider=job["provider"])
+                audit_id = await loop.run_in_executor(None, partial(
+                    record_audit, company_profile, prompts, report, job["provider"], job["use_google_search"]
+                ))
+                await loop.run_in_executor(None, partial(finish_run, job["run_id"], "ok", audit_id, report.overall_score))
+                logger.info("Monitoring run completed", extra={"company": job["company"], "stored_audit_id": audit_id, "overall_score": report.overall_score})
+            except Exception as e:
+                logger.exception("Monitoring run failed", extra={"company": job["company"]})
+                await loop.run_in_executor(None, partial(finish_run, job["run_id"], "error", error=str(e)))
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def stop(self):
+        # Interrupted runs stay "running" and are retried as catch-ups after MONITOR_RUN_TIMEOUT_MINUTES
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        for task in list(self._active):
+            task.cancel()
+
+    def stats(self) -> dict:
+        return {"running": self._task is not None and not self._task.done(), "active_runs": len(self._active)}
+
+
+monitoring_scheduler = MonitoringScheduler()
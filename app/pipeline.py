@@ -0,0 +1,96 @@
+# app/pipeline.py
+"""
+Non-blocking /analyze pipeline.
+
+Stages run without blocking the event loop and overlap where the data allows:
+crawl -> clean/chunk happens per page as pages arrive, summarization starts as
+soon as enough chunks are buffered (slow or missing pages are not awaited), and
+prompt generation starts as soon as the company profile exists.
+Blocking LLM calls run on the bounded provider executor (app.executors) and
+take a fair-scheduler slot first (app.fair_queue), like evaluation calls.
+"""
+
+import asyncio
+import time
+from contextlib import aclosing
+from functools import partial
+from typing import Dict, List, Tuple
+
+from app.schemas import CompanyUnderstanding, GeneratedPrompt
+from app.website_loader import stream_website_content
+from app.recorder import recorder
+from app.text_cleaner import clean_text, chunk_text
+from app.summarizer import summarize_company, MAX_SUMMARY_CHUNKS
+from app.prompt_generator import generate_user_prompts
+from app.ai_client import has_provider
+from app.executors import provider_executor
+from app.fair_queue import provider_slot
+from app.telemetry import stage
+from app.structured_logging import get_logger
+
+logger = get_logger(__name__)
+
+
+async def collect_chunks(url: str, max_chunks: int = MAX_SUMMARY_CHUNKS) -> List[str]:
+    """
+    Streams crawled pages through clean/chunk and stops once `max_chunks` are
+    buffered and the home page has settled. Chunks keep the IMPORTANT_PATHS
+    order (home page first).
+    """
+    pages: Dict[int, List[str]] = {}
+    buffered = 0
+    # Which pages arrive before the cutoff depends on timing: replay uses the recorded ones, in order
+    crawl_request = {"url": url, "max_chunks": max_chunks}
+    order = recorder.recall("crawl_pages", crawl_request)
+    async with aclosing(stream_website_content(url, order=order)) as stream:
+        async for path_idx, text in stream:
+            page_chunks = chunk_text(clean_text(text)) if text else []
+            pages[path_idx] = page_chunks
+            buffered += len(page_chunks)
+            # The home page leads the summary, so fast subpages alone never end the crawl
+            if buffered >= max_chunks and 0 in pages:
+                break  # Remaining fetches are cancelled; summarizer would ignore them anyway
+    recorder.note("crawl_pages", crawl_request, list(pages))
+
+    chunks = []
+    for idx in sorted(pages):
+        chunks.extend(pages[idx])
+    if not chunks:
+        logger.error("Could not extract any content", extra={"url": url})
+    return chunks
+
+
+async def analyze_pipeline(url: str = "", points: str = "", region: str = "Global") -> Tuple[CompanyUnderstanding, List[GeneratedPrompt], Dict[str, float]]:
+    """
+    Crawl -> summarize -> generate prompts without blocking the event loop.
+    Returns (company_profile, prompts, timings) where timings are seconds per stage.
+    """
+    loop = asyncio.get_running_loop()
+    timings: Dict[str, float] = {}
+    # Summarizer and prompt generator both prefer Cerebras
+    provider = "cerebras" if has_provider("cerebras") else "gemini"
+    started = time.perf_counter()
+
+    stage_start = time.perf_counter()
+    with stage("crawl", url=url):
+        chunks = await collect_chunks(url) if url else []
+    timings["crawl"] = round(time.perf_counter() - stage_start, 3)
+
+    stage_start = time.perf_counter()
+    with stage("summarize", chunks=len(chunks)):
+        async with provider_slot(provider):
+            company_profile = await loop.run_in_executor(
+                provider_executor,
+                partial(summarize_company, chunks, manual_points=points, region=region, url=url)
+            )
+    timings["summarize"] = round(time.perf_counter() - stage_start, 3)
+
+    stage_start = time.perf_counter()
+    with stage("generate_prompts"):
+        async with provider_slot(provider):
+            prompts = await loop.run_in_executor(provider_executor, generate_user_prompts, company_profile)
+    timings["generate_prompts"] = round(time.perf_counter() - stage_start, 3)
+
+    timings["total"] = round(time.perf_counter() - started, 3)
+    logger.info("Analysis pipeline finished", extra={"url": url, "timings": timings})
+    return company_profile, prompts, timings
@@ -0,0 +1,281 @@
+# app/profiling.py
+"""
+On-demand profiling of a single request.
+
+An admin sends `X-Profile: 1` (or `?profile=1`) together with `X-Admin-Token`.
+For that request only:
+
+- a sampling profiler records the stacks of every thread doing the request's
+  work: the event-loop thread while one of the request's tasks is running, and
+  executor workers while they run a task submitted on its behalf. Samples where
+  none of them is running are counted as "(waiting)", so the flamegraph's widths
+  are wall-clock time
+- waits are timed: evaluator concurrency limit, fair-scheduler provider slots
+  and executor queues
+- every telemetry stage (answer, judge, enrich_metadata, report, ...) and
+  provider call is timed into a per-stage breakdown
+
+The profile is stored under PROFILE_DIR as <id>.json (breakdown + stacks) and
+<id>.folded (flamegraph.pl / speedscope input), and its id is returned in the
+X-Profile-Id response header. Requests that aren't profiled pay one contextvar
+lookup per hook.
+"""
+
+import asyncio
+import json
+import os
+import re
+import sys
+import threading
+import time
+import uuid
+import weakref
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, List, Optional
+
+from app.config import PROFILE_DIR, PROFILE_SAMPLE_INTERVAL_MS, PROFILE_MAX_SECONDS
+
+PROFILE_ID_RE = re.compile(r"^[0-9]{8}-[0-9]{6}-[0-9a-f]{8}$")
+MAX_STACK_DEPTH = 64
+
+
+class RequestProfile:
+    def __init__(self, method: str, path: str, loop: asyncio.AbstractEventLoop):
+        self.id = f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}"
+        self.method = method
+        self.path = path
+        self.loop = loop
+        self.loop_thread = threading.get_ident()
+        self.started = time.perf_counter()
+        self.started_at = time.time()
+        self.elapsed = None
+        self._lock = threading.Lock()
+        self.stages: Dict[str, List[float]] = defaultdict(list)
+        self.waits: Dict[str, List[float]] = defaultdict(list)
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self.worker_threads: Counter = Counter()  # thread id -> nesting depth
+        self.tasks: "weakref.WeakSet[asyncio.Task]" = weakref.WeakSet()  # Filled by _task_factory
+
+    def add_stage(self, name: str, seconds: float):
+        with self._lock:
+            self.stages[name].append(seconds)
+
+    def add_wait(self, kind: str, seconds: float):
+        with self._lock:
+            self.waits[kind].append(seconds)
+
+    def enter_worker(self):
+        with self._lock:
+            self.worker_threads[threading.get_ident()] += 1
+
+    def exit_worker(self):
+        with self._lock:
+            ident = threading.get_ident()
+            self.worker_threads[ident] -= 1
+            if self.worker_threads[ident] <= 0:
+                del self.worker_threads[ident]
+
+    def _owns_running_task(self) -> bool:
+        task = asyncio.current_task(self.loop)  # Plain dict lookup; fine from the sampler thread
+        return task is not None and task in self.tasks
+
+    def sample(self, frames: Dict[int, object]):
+        with self._lock:
+            threads = [("worker", ident) for ident in self.worker_threads]
+        if self._owns_running_task():
+            threads.append(("event-loop", self.loop_thread))
+        stacks = [_fold(kind, frames[ident]) for kind, ident in threads if ident in frames]
+        with self._lock:
+            self.samples += 1
+            if not stacks:
+                self.stacks["(waiting)"] += 1
+            for stack in stacks:
+                self.stacks[stack] += 1
+
+    def summary(self) -> dict:
+        def breakdown(series: Dict[str, List[float]]) -> Dict[str, dict]:
+            result = {}
+            for name, values in sorted(series.items()):
+                ordered = sorted(values)
+                result[name] = {
+                    "count": len(ordered),
+                    "total_s": round(sum(ordered), 4),
+                    "mean_ms": round(sum(ordered) / len(ordered) * 1000, 2),
+                    "p95_ms": round(ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))] * 1000, 2),
+                    "max_ms": round(ordered[-1] * 1000, 2),
+                }
+            return result
+
+        with self._lock:
+            return {
+                "id": self.id,
+                "method": self.method,
+                "path": self.path,
+                "started_at": self.started_at,
+                "elapsed_s": round(self.elapsed or (time.perf_counter() - self.started), 4),
+                "sample_interval_ms": PROFILE_SAMPLE_INTERVAL_MS,
+                "samples": self.samples,
+                "stages": breakdown(self.stages),
+                "waits": breakdown(self.waits),
+                "top_stacks": [{"stack": s, "samples": n} for s, n in self.stacks.most_common(20)],
+            }
+
+    def folded(self) -> str:
+        with self._lock:
+            return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+def _fold(kind: str, frame) -> str:
+    """Root-first `kind;func (file:line);...` — one line of folded-stack output."""
+    names = []
+    while frame is not None and len(names) < MAX_STACK_DEPTH:
+        code = frame.f_code
+        names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+        frame = frame.f_back
+    names.append(kind)
+    return ";".join(reversed(names))
+
+
+active_profile: ContextVar[Optional[RequestProfile]] = ContextVar("active_profile", default=None)
+
+
+def _install_task_factory(loop: asyncio.AbstractEventLoop):
+    """
+    Registers tasks created under a profile with it, so the sampler can tell
+    whose task the loop is running (Task.get_context() only exists from 3.12).
+    Wraps any factory already set; installed once per loop.
+    """
+    previous = loop.get_task_factory()
+    if getattr(previous, "_geo_profiling", False):
+        return
+
+    def factory(loop, coro, **kwargs):
+        task = previous(loop, coro, **kwargs) if previous else asyncio.Task(coro, loop=loop, **kwargs)
+        context = kwargs.get("context")
+        profile = context.get(active_profile) if context is not None else active_profile.get()
+        if profile is not None:
+            profile.tasks.add(task)
+        return task
+
+    factory._geo_profiling = True
+    loop.set_task_factory(factory)
+
+
+class _Sampler:
+    """One background thread samples every active profile while at least one exists."""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._profiles: List[RequestProfile] = []
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def add(self, profile: RequestProfile):
+        with self._lock:
+            self._profiles.append(profile)
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="geo-profiler", daemon=True)
+                self._thread.start()
+
+    def remove(self, profile: RequestProfile):
+        with self._lock:
+            if profile in self._profiles:
+                self._profiles.remove(profile)
+
+    def _run(self):
+        me = threading.get_ident()
+        while True:
+            time.sleep(self.interval)
+            with self._lock:
+                profiles = list(self._profiles)
+                if not profiles:
+                    self._thread = None
+                    return
+            frames = sys._current_frames()
+            frames.pop(me, None)
+            now = time.perf_counter()
+            for profile in profiles:
+                if now - profile.started <= PROFILE_MAX_SECONDS:
+                    profile.sample(frames)
+
+
+_sampler = _Sampler(PROFILE_SAMPLE_INTERVAL_MS / 1000)
+
+
+@contextmanager
+def profile_request(method: str, path: str):
+    """Profile everything run (directly or via tasks/executors) inside the block; must be entered on the event loop."""
+    loop = asyncio.get_running_loop()
+    _install_task_factory(loop)
+    profile = RequestProfile(method, path, loop)
+    profile.tasks.add(asyncio.current_task())
+    token = active_profile.set(profile)
+    _sampler.add(profile)
+    try:
+        yield profile
+    finally:
+        profile.elapsed = time.perf_counter() - profile.started
+        _sampler.remove(profile)
+        active_profile.reset(token)
+
+
+# --- Hooks (no-ops unless the current request is being profiled) ---
+
+def record_stage(name: str, seconds: float):
+    profile = active_profile.get()
+    if profile is not None:
+        profile.add_stage(name, seconds)
+
+
+def record_wait(kind: str, seconds: float):
+    profile = active_profile.get()
+    if profile is not None:
+        profile.add_wait(kind, seconds)
+
+
+# --- Storage ---
+
+def save_profile(profile: RequestProfile) -> str:
+    """Writes <id>.json and <id>.folded under PROFILE_DIR; returns the JSON path. Blocking."""
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    path = os.path.join(PROFILE_DIR, f"{profile.id}.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(profile.summary(), f, indent=2)
+    with open(os.path.join(PROFILE_DIR, f"{profile.id}.folded"), "w", encoding="utf-8") as f:
+        f.write(profile.folded())
+    return path
+
+
+def list_profiles(limit: int = 50) -> List[dict]:
+    if not os.path.isdir(PROFILE_DIR):
+        return []
+    ids = sorted((name[:-5] for name in os.listdir(PROFILE_DIR) if name.endswith(".json")), reverse=True)[:limit]
+    profiles = []
+    for profile_id in ids:
+        data = load_profile(profile_id)
+        if data:
+            profiles.append({k: data[k] for k in ("id", "method", "path", "started_at", "elapsed_s", "samples")})
+    return profiles
+
+
+def load_profile(profile_id: str) -> Optional[dict]:
+    if not PROFILE_ID_RE.match(profile_id):
+        return None
+    try:
+        with open(os.path.join(PROFILE_DIR, f"{profile_id}.json"), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def load_folded(profile_id: str) -> Optional[str]:
+    if not PROFILE_ID_RE.match(profile_id):
+        return None
+    try:
+        with open(os.path.join(PROFILE_DIR, f"{profile_id}.folded"), "r", encoding="utf-8") as f:
+            return f.read()
+    except OSError:
+        return None
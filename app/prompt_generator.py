@@ -1,17 +1,134 @@
 # app/prompt_generator.py
 
-import json
-from typing import List
-from app.schemas import CompanyUnderstanding, GeneratedPrompt
+from typing import Dict, List, Optional
+from app.schemas import CompanyUnderstanding, GeneratedPrompt, PromptListOutput
 from app.config import GEMINI_API_KEY, GEMINI_MODEL_NAME, CEREBRAS_API_KEY
-from app.ai_client import generate_ai_response, cerebras_client
+from app.ai_client import has_provider
+from app.structured_output import generate_structured
+from app.telemetry import record_cache
+from app.structured_logging import get_logger
+from app.prompt_library import (
+    INTENT_CATEGORIES, REUSABLE_INTENTS, NearDuplicateIndex, prompt_library,
+    canonical_intent, is_brand_neutral
+)
 
-def generate_user_prompts(company: CompanyUnderstanding) -> List[GeneratedPrompt]:
+logger = get_logger(__name__)
+
+DEFAULT_PROMPT_COUNT = 20
+
+def _category_guidance(company: CompanyUnderstanding) -> dict:
+    return {
+        "discovery": "Unbiased Discovery: (Broad searches for top companies/tools in the sector)",
+        "solution": "Specific Solution-Seeking: (Focus on solving specific technical or business pain points)",
+        "comparison": "Competitive Comparison: (Comparing top players or asking for alternatives)",
+        "transactional": "Intent-Based / Transactional: (Ready to hire or looking for a specific project partner)",
+        "brand": f"Brand Awareness & Verification: (Direct questions about {company.company_name})",
+    }
+
+def _has_known_industry(company: CompanyUnderstanding) -> bool:
+    # Library keys are meaningless without a real industry (e.g. failed summarization)
+    return bool(company.industry) and company.industry not in ("Industry: Undefined", "N/A")
+
+def generate_user_prompts(company: CompanyUnderstanding, exclude: Optional[List[str]] = None, total: int = DEFAULT_PROMPT_COUNT) -> List[GeneratedPrompt]:
     """
     Generates 20 realistic user queries to test AI search visibility.
+    Generic discovery/comparison queries are drawn from the shared prompt library when
+    available, so the LLM only has to write the remaining (brand-specific) ones.
+    Nothing returned near-duplicates a prompt in `exclude` (e.g. the user's current set).
+    """
+    intents = list(INTENT_CATEGORIES)
+    counts = {intent: total // len(intents) for intent in intents}
+    for intent in intents[:total % len(intents)]:
+        counts[intent] += 1
+    return _generate_prompt_set(company, counts, exclude)[:total]
+
+def regenerate_prompts(
+    company: CompanyUnderstanding,
+    current_prompts: List[GeneratedPrompt],
+    replace_categories: Optional[List[str]] = None,
+    count: Optional[int] = None,
+    exclude: Optional[List[str]] = None
+) -> List[GeneratedPrompt]:
     """
+    Incremental refresh: replaces only part of the current prompt set.
+    - replace_categories: only prompts in these intent categories are replaced (default: all)
+    - count: replace at most this many of them (the last ones in the list)
+    New prompts take the replaced prompts' slots and never near-duplicate the current
+    set or `exclude`. Returns the full updated prompt list.
+    """
+    if not current_prompts:
+        return generate_user_prompts(company, exclude=exclude)
+
+    targets = {canonical_intent(c) for c in replace_categories} if replace_categories else None
+    slots = [i for i, p in enumerate(current_prompts) if targets is None or canonical_intent(p.intent_category) in targets]
+    if count is not None:
+        slots = slots[-count:] if count > 0 else []
+    if not slots:
+        return list(current_prompts)
+
+    # Ask for the same intent mix as the prompts being replaced
+    intents = list(INTENT_CATEGORIES)
+    counts = {}
+    slot_intents = []
+    for n, i in enumerate(slots):
+        intent = canonical_intent(current_prompts[i].intent_category)
+        if intent not in INTENT_CATEGORIES:
+            intent = intents[n % len(intents)]  # Imported/Fallback prompts: spread evenly
+        counts[intent] = counts.get(intent, 0) + 1
+        slot_intents.append(intent)
+
+    avoid = [p.prompt_text for p in current_prompts] + list(exclude or [])
+    new_prompts = _generate_prompt_set(company, counts, avoid)
+
+    # Each slot takes a new prompt of its own intent; slots left without one keep their current prompt
+    pools: Dict[str, List[GeneratedPrompt]] = {}
+    for p in new_prompts:
+        pools.setdefault(canonical_intent(p.intent_category), []).append(p)
+    updated = list(current_prompts)
+    replaced = 0
+    for i, intent in zip(slots, slot_intents):
+        if pools.get(intent):
+            updated[i] = pools[intent].pop(0)
+            replaced += 1
+    logger.info("Refreshed prompts", extra={"replaced": replaced, "requested": len(slots)})
+    return updated
+
+def _generate_prompt_set(company: CompanyUnderstanding, counts: Dict[str, int], exclude: Optional[List[str]] = None) -> List[GeneratedPrompt]:
+    """
+    Generates prompts for the requested intent counts (canonical intent -> number).
+    Library prompts are used first; the LLM is only asked for what is still missing.
+    """
+    seen = NearDuplicateIndex()
+    for text in exclude or []:
+        seen.add(text)
+
+    # 1. Reuse generic prompts from companies in the same industry and region
+    library_prompts = []
+    missing = {}
+    for intent, wanted in counts.items():
+        drawn = []
+        if intent in REUSABLE_INTENTS and _has_known_industry(company):
+            drawn = prompt_library.draw(company.industry, company.region, intent, wanted, seen)
+            library_prompts.extend(GeneratedPrompt(prompt_text=t, intent_category=INTENT_CATEGORIES[intent]) for t in drawn)
+            record_cache("prompt_library", hits=len(drawn), misses=wanted - len(drawn))
+        if len(drawn) < wanted:
+            missing[intent] = wanted - len(drawn)
+
+    remaining = sum(missing.values())
+    if library_prompts:
+        logger.info("Reused prompts from library", extra={"reused": len(library_prompts), "generating": remaining})
+    if remaining <= 0:
+        return library_prompts
+
+    guidance = _category_guidance(company)
+    category_lines = "\n".join(f"{i}. {guidance[c]} - {n} quer{'y' if n == 1 else 'ies'}" for i, (c, n) in enumerate(missing.items(), 1))
+    avoid_block = ""
+    if exclude:
+        avoid_lines = "\n".join(f"- {t}" for t in exclude[:40])
+        avoid_block = f"\nDo NOT repeat or closely paraphrase any of these existing queries:\n{avoid_lines}\n"
+
     prompt = f"""
-You are an expert in Generative Engine Optimization (GEO). Your task is to generate 20 realistic and highly diverse user queries that someone might ask an AI (like ChatGPT or Gemini) to find services or companies in the industry: {company.industry}.
+You are an expert in Generative Engine Optimization (GEO). Your task is to generate {remaining} realistic and highly diverse user queries that someone might ask an AI (like ChatGPT or Gemini) to find services or companies in the industry: {company.industry}.
 The user is located in or interested in the region: {company.region}. Ensure queries reflect local terminology and search intent for this specific market.
 
 Company Context:
@@ -20,34 +137,20 @@ Company Context:
 - Problems Solved: {", ".join(company.core_problems_solved)}
 - Focus Region: {company.region}
 
-Generate a total of 20 queries distributed across these categories:
-1. Unbiased Discovery: (Broad searches for top companies/tools in the sector)
-2. Specific Solution-Seeking: (Focus on solving specific technical or business pain points)
-3. Competitive Comparison: (Comparing top players or asking for alternatives)
-4. Intent-Based / Transactional: (Ready to hire or looking for a specific project partner)
-5. Brand Awareness & Verification: (Direct questions about {company.company_name})
-
+Generate a total of {remaining} queries distributed across these categories:
+{category_lines}
+{avoid_block}
 Requirements:
 - Ensure the queries sound like real humans asking an AI.
 - Mix high-level and granular queries.
-- Return exactly 20 queries.
-- Return a JSON list of objects with "prompt_text" and "intent_category". 
+- Return exactly {remaining} queries.
+- Return a JSON object with a "queries" list of objects with "prompt_text" and "intent_category".
 """
 
     try:
         # Use Cerebras for prompt generation if available
-        provider = "cerebras" if cerebras_client else "gemini"
-        res_text = generate_ai_response(prompt, provider=provider, response_mime_type="application/json")
-        if res_text.startswith("```"):
-            import re
-            # Try to extract content between first [ and last ] or first { and last }
-            json_match = re.search(r"(\[.*\]|{.*})", res_text, re.DOTALL)
-            if json_match:
-                res_text = json_match.group(1)
-            else:
-                res_text = res_text.replace("```json", "", 1).replace("```", "", 1).strip()
-        
-        data = json.loads(res_text)
+        provider = "cerebras" if has_provider("cerebras") else "gemini"
+        data = generate_structured(prompt, PromptListOutput, provider=provider)
         
         # Robust handling for list formats
         if isinstance(data, dict):
@@ -70,15 +173,16 @@ Requirements:
                             break
             
             if not isinstance(data, list):
-                print(f"[DEBUG] Raw AI response for prompts: {res_text[:500]}...")
+                logger.debug("Unexpected AI response for prompts", extra={"raw": str(data)[:500]})
                 raise ValueError(f"AI did not return a list of prompts. Got type: {type(data)}")
 
-        return [GeneratedPrompt(**item) for item in data[:20] if isinstance(item, dict) and "prompt_text" in item]
+        generated = [GeneratedPrompt(**item) for item in data if isinstance(item, dict) and "prompt_text" in item]
+        fresh = [p for p in generated if seen.add_if_new(p.prompt_text)][:remaining]
+        _store_reusable_prompts(company, fresh)
+        return library_prompts + fresh
     
-    except Exception as e:
-        print(f"[ERROR] Prompt generation failed: {e}")
-        import traceback
-        traceback.print_exc()
+    except Exception:
+        logger.exception("Prompt generation failed")
         # Return a smaller fallback list if fails
         fallback_queries = [
             f"Top companies in {company.industry}",
@@ -92,4 +196,17 @@ Requirements:
             f"Reviews of {company.company_name}",
             f"What does {company.company_name} offer?"
         ]
-        return [GeneratedPrompt(prompt_text=q, intent_category="Fallback") for q in fallback_queries[:20]]
+        fallback = [GeneratedPrompt(prompt_text=q, intent_category="Fallback") for q in fallback_queries if seen.add_if_new(q)]
+        return (library_prompts + fallback)[:sum(counts.values())]
+
+def _store_reusable_prompts(company: CompanyUnderstanding, prompts: List[GeneratedPrompt]):
+    """Save brand-neutral discovery/comparison prompts to the shared library."""
+    if not _has_known_industry(company):
+        return
+    by_intent = {}
+    for p in prompts:
+        intent = canonical_intent(p.intent_category)
+        if intent in REUSABLE_INTENTS and is_brand_neutral(p.prompt_text, company.company_name, company.url):
+            by_intent.setdefault(intent, []).append(p.prompt_text)
+    for intent, texts in by_intent.items():
+        prompt_library.add(company.industry, company.region, intent, texts)
@@ -0,0 +1,241 @@
+# app/prompt_library.py
+"""
+Persistent prompt library shared across companies, plus a MinHash index for
+near-duplicate prompt detection.
+
+Generic discovery and comparison prompts ("Top CRM vendors in India") are
+interchangeable between companies in the same industry and region, so they are
+stored keyed by (industry, region, intent_category) and reused instead of being
+generated from scratch by the LLM on every /analyze or /refresh-prompts call.
+"""
+
+import json
+import os
+import random
+import re
+import threading
+import zlib
+from typing import Dict, Iterable, List, Optional
+
+from app.config import PROMPT_LIBRARY_PATH, PROMPT_LIBRARY_MAX_PER_KEY, PROMPT_DUPLICATE_THRESHOLD
+from app.structured_logging import get_logger
+
+logger = get_logger(__name__)
+
+# MinHash / LSH parameters: 16 bands of 4 rows gives ~99% recall at 0.7 similarity
+NUM_PERM = 64
+BANDS = 16
+ROWS_PER_BAND = NUM_PERM // BANDS
+SHINGLE_SIZE = 4
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_rng = random.Random(1337)  # Fixed seed so signatures are stable across processes
+_PERMUTATIONS = [(_rng.randrange(1, _MERSENNE_PRIME), _rng.randrange(0, _MERSENNE_PRIME)) for _ in range(NUM_PERM)]
+
+# Canonical intent keys -> display names used in GeneratedPrompt.intent_category
+INTENT_CATEGORIES = {
+    "discovery": "Unbiased Discovery",
+    "solution": "Specific Solution-Seeking",
+    "comparison": "Competitive Comparison",
+    "transactional": "Intent-Based / Transactional",
+    "brand": "Brand Awareness & Verification",
+}
+
+# Only these intents are generic enough to be shared between companies
+REUSABLE_INTENTS = ("discovery", "comparison")
+
+
+def normalize_prompt(text: str) -> str:
+    """Lowercase, strip punctuation and collapse whitespace."""
+    text = re.sub(r"[^\w\s]", " ", (text or "").lower())
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def canonical_intent(category: str) -> str:
+    """Map a free-form intent category returned by the LLM to a canonical key."""
+    c = (category or "").lower()
+    if "discover" in c:
+        return "discovery"
+    if "compar" in c or "alternative" in c:
+        return "comparison"
+    if "solution" in c:
+        return "solution"
+    if "transaction" in c or "intent" in c:
+        return "transactional"
+    if "brand" in c or "verif" in c or "awareness" in c:
+        return "brand"
+    return "other"
+
+
+def shingles(text: str, k: int = SHINGLE_SIZE) -> set:
+    """Hashed character k-grams of the normalized text."""
+    norm = normalize_prompt(text)
+    if len(norm) <= k:
+        return {zlib.crc32(norm.encode("utf-8"))}
+    return {zlib.crc32(norm[i:i + k].encode("utf-8")) for i in range(len(norm) - k + 1)}
+
+
+def minhash_signature(shingle_set: set) -> tuple:
+    """MinHash signature of a shingle set using universal hashing."""
+    return tuple(
+        min((a * h + b) % _MERSENNE_PRIME for h in shingle_set)
+        for a, b in _PERMUTATIONS
+    )
+
+
+def estimated_similarity(sig_a: tuple, sig_b: tuple) -> float:
+    """Estimated Jaccard similarity between two MinHash signatures."""
+    return sum(1 for x, y in zip(sig_a, sig_b) if x == y) / NUM_PERM
+
+
+class NearDuplicateIndex:
+    """
+    In-memory LSH index over MinHash signatures.
+    Lookups only compare against candidates sharing at least one band bucket.
+    """
+
+    def __init__(self, threshold: float = PROMPT_DUPLICATE_THRESHOLD):
+        self.threshold = threshold
+        self._texts: List[str] = []
+        self._signatures: List[tuple] = []
+        self._buckets: Dict[tuple, List[int]] = {}
+        self._exact: Dict[str, int] = {}
+
+    def __len__(self):
+        return len(self._texts)
+
+    @staticmethod
+    def _band_keys(signature: tuple):
+        for band in range(BANDS):
+            yield (band, signature[band * ROWS_PER_BAND:(band + 1) * ROWS_PER_BAND])
+
+    def find_duplicate(self, text: str) -> Optional[str]:
+        """Return the indexed text that `text` near-duplicates, or None."""
+        norm = normalize_prompt(text)
+        if norm in self._exact:
+            return self._texts[self._exact[norm]]
+
+        signature = minhash_signature(shingles(text))
+        checked = set()
+        for key in self._band_keys(signature):
+            for idx in self._buckets.get(key, ()):
+                if idx in checked:
+                    continue
+                checked.add(idx)
+                if estimated_similarity(signature, self._signatures[idx]) >= self.threshold:
+                    return self._texts[idx]
+        return None
+
+    def is_duplicate(self, text: str) -> bool:
+        return self.find_duplicate(text) is not None
+
+    def add(self, text: str):
+        idx = len(self._texts)
+        signature = minhash_signature(shingles(text))
+        self._texts.append(text)
+        self._signatures.append(signature)
+        self._exact.setdefault(normalize_prompt(text), idx)
+        for key in self._band_keys(signature):
+            self._buckets.setdefault(key, []).append(idx)
+
+    def add_if_new(self, text: str) -> bool:
+        """Index `text` unless it near-duplicates an indexed entry. Returns True if added."""
+        if not normalize_prompt(text) or self.is_duplicate(text):
+            return False
+        self.add(text)
+        return True
+
+
+def is_brand_neutral(prompt_text: str, company_name: str, url: str = "") -> bool:
+    """True if the prompt doesn't name the company (by name or domain) and can be shared."""
+    norm = f" {normalize_prompt(prompt_text)} "
+    name = normalize_prompt(company_name)
+    if name and f" {name} " in norm:
+        return False
+    if url:
+        domain = re.sub(r"^(https?://)?(www\.)?", "", url.lower()).split("/")[0]
+        if domain and domain in prompt_text.lower():
+            return False
+    return True
+
+
+class PromptLibrary:
+    """
+    JSON-backed prompt store keyed by (industry, region, intent_category).
+    Loaded lazily on first use; writes are atomic (temp file + rename).
+    """
+
+    def __init__(self, path: str = PROMPT_LIBRARY_PATH, max_per_key: int = PROMPT_LIBRARY_MAX_PER_KEY):
+        self.path = path
+        self.max_per_key = max_per_key
+        self._lock = threading.Lock()
+        self._entries: Optional[Dict[str, List[str]]] = None
+
+    @staticmethod
+    def make_key(industry: str, region: str, intent: str) -> str:
+        return "|".join([normalize_prompt(industry), normalize_prompt(region or "Global"), intent])
+
+    def _load(self) -> Dict[str, List[str]]:
+        if self._entries is None:
+            self._entries = {}
+            if os.path.exists(self.path):
+                try:
+                    with open(self.path, "r", encoding="utf-8") as f:
+                        self._entries = json.load(f)
+                except Exception as e:
+                    logger.warning("Could not read prompt library", extra={"path": self.path, "error": str(e)})
+        return self._entries
+
+    def _save(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._entries, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+    def draw(self, industry: str, region: str, intent: str, count: int, seen: Optional[NearDuplicateIndex] = None) -> List[str]:
+        """
+        Pick up to `count` stored prompts for the key, skipping near-duplicates of
+        anything already in `seen`. Picked prompts are added to `seen`.
+        """
+        if count <= 0:
+            return []
+        with self._lock:
+            candidates = list(self._load().get(self.make_key(industry, region, intent), []))
+
+        random.shuffle(candidates)
+        seen = seen if seen is not None else NearDuplicateIndex()
+        picked = []
+        for text in candidates:
+            if seen.add_if_new(text):
+                picked.append(text)
+                if len(picked) >= count:
+                    break
+        return picked
+
+    def add(self, industry: str, region: str, intent: str, prompts: Iterable[str]) -> int:
+        """Store new prompts under the key, ignoring near-duplicates. Returns the number added."""
+        key = self.make_key(industry, region, intent)
+        with self._lock:
+            entries = self._load()
+            existing = entries.get(key, [])
+            index = NearDuplicateIndex()
+            for text in existing:
+                index.add(text)
+
+            added = [text for text in prompts if index.add_if_new(text)]
+            if not added:
+                return 0
+
+            # Keep the newest entries when the key is full
+            entries[key] = (existing + added)[-self.max_per_key:]
+            try:
+                self._save()
+            except Exception as e:
+                logger.warning("Could not persist prompt library", extra={"path": self.path, "error": str(e)})
+            return len(added)
+
+
+prompt_library = PromptLibrary()
@@ -0,0 +1,336 @@
+# app/provider_health.py
+"""
+Provider health shared by every worker process on the host.
+
+Quota disables, the circuit breaker and observed rate-limit headers live in a
+small SQLite database in WAL mode (DATA_DIR/provider_health.db) instead of
+process memory. When one uvicorn worker hits Cerebras' token quota, every other
+worker stops routing to it on its next check, and a restart doesn't forget it.
+
+Reads go through a short in-process TTL cache so the hot path doesn't touch
+SQLite on every call. Failures and state changes are written straight to the
+database (and refresh the cache); a success only writes when it changes state
+(closes the circuit, resets the failure count, lifts a rate-limit block).
+Otherwise its call count is batched and flushed every PROVIDER_HEALTH_FLUSH_SECONDS.
+
+Circuit breaker per provider:
+- closed:    calls flow; PROVIDER_CIRCUIT_FAILURES consecutive failures open it
+- open:      calls are skipped for PROVIDER_CIRCUIT_COOLDOWN seconds
+- half-open: past the cooldown, exactly one caller (across all workers) is let
+             through as a probe; its success closes the circuit, its failure
+             re-opens it. A probe that never reports back is replaced after
+             another cooldown.
+"""
+
+import atexit
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Mapping, Optional
+
+from app.config import (
+    PROVIDER_HEALTH_PATH, PROVIDER_HEALTH_CACHE_SECONDS, PROVIDER_HEALTH_FLUSH_SECONDS,
+    PROVIDER_CIRCUIT_FAILURES, PROVIDER_CIRCUIT_COOLDOWN,
+)
+from app.structured_logging import get_logger
+
+logger = get_logger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"  # A probe is in flight (circuit_opened_at = probe start)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS provider_health (
+    provider TEXT PRIMARY KEY,
+    disabled_until REAL NOT NULL DEFAULT 0,
+    disabled_reason TEXT,
+    circuit_state TEXT NOT NULL DEFAULT 'closed',
+    circuit_opened_at REAL NOT NULL DEFAULT 0,
+    consecutive_failures INTEGER NOT NULL DEFAULT 0,
+    total_calls INTEGER NOT NULL DEFAULT 0,
+    total_errors INTEGER NOT NULL DEFAULT 0,
+    last_error TEXT,
+    ratelimit_remaining_requests INTEGER,
+    ratelimit_remaining_tokens INTEGER,
+    ratelimit_reset_at REAL,
+    updated_at REAL NOT NULL DEFAULT 0
+)
+"""
+
+# Header names used by OpenAI-compatible APIs (Cerebras, OpenRouter) for rate-limit state
+_REMAINING_REQUESTS = ("x-ratelimit-remaining-requests", "x-ratelimit-remaining-requests-day")
+_REMAINING_TOKENS = ("x-ratelimit-remaining-tokens", "x-ratelimit-remaining-tokens-minute")
+_RESET = ("retry-after", "x-ratelimit-reset-requests", "x-ratelimit-reset-tokens", "x-ratelimit-reset-tokens-minute")
+
+
+def _parse_seconds(value: str) -> Optional[float]:
+    """'12', '12.5', '12s', '1m30s' or '250ms' -> seconds."""
+    value = (value or "").strip().lower()
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    total, number = 0.0, ""
+    i = 0
+    while i < len(value):
+        ch = value[i]
+        if ch.isdigit() or ch == ".":
+            number += ch
+        elif value.startswith("ms", i):
+            total += float(number or 0) / 1000
+            number = ""
+            i += 1
+        elif ch in "hms":
+            total += float(number or 0) * {"h": 3600, "m": 60, "s": 1}[ch]
+            number = ""
+        else:
+            return None
+        i += 1
+    return total
+
+
+def _first_header(headers: Mapping[str, str], names) -> Optional[str]:
+    for name in names:
+        value = headers.get(name)
+        if value is not None:
+            return value
+    return None
+
+
+class ProviderHealth:
+    """Shared provider health store (see module docstring)."""
+
+    def __init__(self, path: str = PROVIDER_HEALTH_PATH, cache_seconds: float = PROVIDER_HEALTH_CACHE_SECONDS,
+                 failure_threshold: int = PROVIDER_CIRCUIT_FAILURES, cooldown_seconds: float = PROVIDER_CIRCUIT_COOLDOWN,
+                 flush_seconds: float = PROVIDER_HEALTH_FLUSH_SECONDS):
+        self.path = path
+        self.cache_seconds = cache_seconds
+        self.failure_threshold = failure_threshold
+        self.cooldown_seconds = cooldown_seconds
+        self.flush_seconds = flush_seconds
+        self._local = threading.local()
+        self._cache: Dict[str, tuple] = {}  # provider -> (fetched_at, row)
+        self._lock = threading.Lock()
+        self._pending_calls: Dict[str, int] = {}  # Successes not yet added to total_calls
+        self._flushed_at: Dict[str, float] = {}
+        # Static, per-process switches (e.g. a provider whose credentials aren't verified yet)
+        self.temp_disabled = {
+            "openrouter": True  # TEMP DISABLED until auth verified
+        }
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(_SCHEMA)
+            self._local.conn = conn
+        return conn
+
+    def _read(self, provider: str) -> Optional[Dict[str, Any]]:
+        row = self._conn().execute("SELECT * FROM provider_health WHERE provider = ?", (provider,)).fetchone()
+        return dict(row) if row else None
+
+    def _get(self, provider: str) -> Optional[Dict[str, Any]]:
+        cached = self._cache.get(provider)
+        now = time.monotonic()
+        if cached and now - cached[0] < self.cache_seconds:
+            return cached[1]
+        try:
+            row = self._read(provider)
+        except sqlite3.Error as e:
+            logger.warning("Provider health store unavailable", extra={"error": str(e)})
+            return cached[1] if cached else None
+        self._cache[provider] = (now, row)
+        return row
+
+    def _take_pending(self, provider: str) -> int:
+        with self._lock:
+            self._flushed_at[provider] = time.monotonic()
+            return self._pending_calls.pop(provider, 0)
+
+    def _restore_pending(self, provider: str, count: int):
+        if count:
+            with self._lock:
+                self._pending_calls[provider] = self._pending_calls.get(provider, 0) + count
+
+    def _update(self, provider: str, apply) -> Optional[Dict[str, Any]]:
+        """
+        Read-modify-write under a write lock shared by all processes. Batched
+        success counts are flushed along with it. `apply` may return None to
+        leave the row unchanged (e.g. a lost probe claim).
+        """
+        pending = self._take_pending(provider)
+        try:
+            conn = self._conn()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.execute("INSERT OR IGNORE INTO provider_health (provider) VALUES (?)", (provider,))
+                row = self._read(provider)
+                changes = apply(row)
+                if changes is None and not pending:
+                    conn.execute("COMMIT")
+                    self._cache[provider] = (time.monotonic(), row)
+                    return row
+                changes = changes or {}
+                changes["total_calls"] = changes.get("total_calls", row["total_calls"]) + pending
+                changes["updated_at"] = time.time()
+                assignments = ", ".join(f"{column} = ?" for column in changes)
+                conn.execute(f"UPDATE provider_health SET {assignments} WHERE provider = ?", (*changes.values(), provider))
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            row.update(changes)
+        except sqlite3.Error as e:
+            self._restore_pending(provider, pending)
+            logger.warning("Could not update provider health", extra={"provider": provider, "error": str(e)})
+            return None
+        self._cache[provider] = (time.monotonic(), row)
+        return row
+
+    def is_enabled(self, name: str) -> bool:
+        """False while the provider is disabled, rate-limited to zero, or its circuit is open."""
+        if self.temp_disabled.get(name):
+            return False
+        row = self._get(name)
+        if not row:
+            return True
+        now = time.time()
+        if row["disabled_until"] > now:
+            return False
+        if row["ratelimit_remaining_requests"] == 0 and (row["ratelimit_reset_at"] or 0) > now:
+            return False
+        if row["circuit_state"] != CLOSED:
+            # Open or probing: nobody until the cooldown (or the probe) expires, then one caller probes
+            if now - row["circuit_opened_at"] < self.cooldown_seconds:
+                return False
+            return self._claim_probe(name)
+        return True
+
+    def _claim_probe(self, name: str) -> bool:
+        """Atomically makes this caller the half-open probe; False if another caller got there first."""
+        claimed = False
+
+        def apply(row):
+            nonlocal claimed
+            now = time.time()
+            if row["circuit_state"] == CLOSED or now - row["circuit_opened_at"] < self.cooldown_seconds:
+                return None  # Closed by another worker's success, or a fresh probe is already out
+            claimed = True
+            return {"circuit_state": HALF_OPEN, "circuit_opened_at": now}
+
+        self._update(name, apply)
+        if claimed:
+            logger.info("Circuit half-open; probing provider", extra={"provider": name})
+        return claimed
+
+    def disable(self, name: str, hours: float = 24, reason: str = "quota"):
+        logger.critical("Disabling provider", extra={"provider": name, "hours": hours, "reason": reason})
+        until = time.time() + hours * 3600
+        self._update(name, lambda row: {"disabled_until": until, "disabled_reason": reason})
+
+    def record_success(self, name: str, headers: Optional[Mapping[str, str]] = None):
+        rate_limits = self._rate_limit_changes(headers)
+        with self._lock:
+            self._pending_calls[name] = self._pending_calls.get(name, 0) + 1
+            flush_due = time.monotonic() - self._flushed_at.get(name, 0) >= self.flush_seconds
+        # Decided on the cached row: the hot path only takes the write lock when something changes
+        row = self._get(name)
+        state_change = bool(row) and (row["circuit_state"] != CLOSED or row["consecutive_failures"] > 0)
+        if not (state_change or flush_due or self._rate_limit_block_changes(row, rate_limits)):
+            return
+
+        def apply(row):
+            changes = {"consecutive_failures": 0}
+            if row["circuit_state"] != CLOSED:
+                logger.info("Provider recovered; closing circuit", extra={"provider": name})
+                changes["circuit_state"] = CLOSED
+            changes.update(rate_limits)
+            return changes
+
+        self._update(name, apply)
+
+    def record_failure(self, name: str, error: Exception, headers: Optional[Mapping[str, str]] = None):
+        def apply(row):
+            failures = row["consecutive_failures"] + 1
+            changes = {
+                "total_calls": row["total_calls"] + 1,
+                "total_errors": row["total_errors"] + 1,
+                "consecutive_failures": failures,
+                "last_error": str(error)[:500],
+            }
+            # A failed probe (or any call once the cooldown is over) re-opens; stragglers don't extend an open circuit
+            half_open = row["circuit_state"] == HALF_OPEN or (
+                row["circuit_state"] == OPEN and time.time() - row["circuit_opened_at"] >= self.cooldown_seconds
+            )
+            if half_open or (row["circuit_state"] == CLOSED and failures >= self.failure_threshold):
+                logger.warning("Opening circuit for provider", extra={"provider": name, "consecutive_failures": failures})
+                changes["circuit_state"] = OPEN
+                changes["circuit_opened_at"] = time.time()
+            changes.update(self._rate_limit_changes(headers))
+            return changes
+
+        self._update(name, apply)
+
+    @staticmethod
+    def _rate_limit_block_changes(row: Optional[Dict[str, Any]], changes: Dict[str, Any]) -> bool:
+        """True when these headers start or lift the remaining-requests == 0 block that is_enabled checks."""
+        if "ratelimit_remaining_requests" not in changes:
+            return False
+        was_blocked = bool(row) and row["ratelimit_remaining_requests"] == 0
+        return (changes["ratelimit_remaining_requests"] == 0) != was_blocked
+
+    def flush(self):
+        """Writes batched success counts (also run at interpreter exit)."""
+        with self._lock:
+            providers = [name for name, count in self._pending_calls.items() if count]
+        for name in providers:
+            self._update(name, lambda row: {})
+
+    def _rate_limit_changes(self, headers: Optional[Mapping[str, str]]) -> Dict[str, Any]:
+        if not headers:
+            return {}
+        headers = {k.lower(): v for k, v in headers.items()}
+        changes = {}
+        remaining_requests = _first_header(headers, _REMAINING_REQUESTS)
+        remaining_tokens = _first_header(headers, _REMAINING_TOKENS)
+        reset = _parse_seconds(_first_header(headers, _RESET) or "")
+        if remaining_requests is not None and remaining_requests.isdigit():
+            changes["ratelimit_remaining_requests"] = int(remaining_requests)
+        if remaining_tokens is not None and remaining_tokens.isdigit():
+            changes["ratelimit_remaining_tokens"] = int(remaining_tokens)
+        if reset is not None:
+            changes["ratelimit_reset_at"] = time.time() + reset
+        return changes
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """Current health of every known provider (uncached), for diagnostics."""
+        try:
+            rows = self._conn().execute("SELECT * FROM provider_health").fetchall()
+        except sqlite3.Error as e:
+            return {"error": str(e)}
+        now = time.time()
+        result = {}
+        for row in rows:
+            entry = dict(row)
+            if entry["circuit_state"] == OPEN and now - entry["circuit_opened_at"] >= self.cooldown_seconds:
+                entry["circuit_state"] = HALF_OPEN  # Cooled down; the next caller probes
+            result[entry["provider"]] = entry
+        for name, disabled in self.temp_disabled.items():
+            if disabled:
+                result.setdefault(name, {})["temp_disabled"] = True
+        return result
+
+
+provider_health = ProviderHealth()
+atexit.register(provider_health.flush)
@@ -0,0 +1,214 @@
+# app/recorder.py
+"""
+Record/replay of external traffic: LLM provider calls, crawl fetches and
+metadata fetches.
+
+- GEO_RECORD=path/run.jsonl.gz   every call is executed normally and appended
+                                 (request, response or error, latency) to a
+                                 gzip-compressed JSONL archive
+- GEO_REPLAY=path/run.jsonl.gz   calls are answered from the archive instead of
+                                 the network; identical requests are served in
+                                 recorded order (the last one repeats), so a
+                                 replayed audit sees exactly what the recorded run saw
+- GEO_REPLAY_PACING=1.0          also sleep the recorded latency (x factor);
+                                 0 (default) replays as fast as possible
+
+Crawl and metadata fetches are recorded as raw HTML, so replay still exercises
+parsing. A crawl also records which pages it consumed, in order (crawls stop
+early and cancel the slower fetches), and replay consumes the same pages in
+the same order. A replayed request that isn't in the archive raises ReplayMiss.
+Requests depend on local state too (prompt library, competitor index), so
+record and replay with the same (e.g. fresh) GEO_DATA_DIR.
+"""
+
+import asyncio
+import atexit
+import gzip
+import hashlib
+import json
+import threading
+import time
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, List, Optional
+
+from app.config import RECORD_PATH, REPLAY_PATH, REPLAY_PACING
+from app.structured_logging import get_logger
+
+logger = get_logger(__name__)
+
+
+class ReplayMiss(LookupError):
+    """The replay archive has no response for this request."""
+
+
+class RecordedError(Exception):
+    """An error that was raised by the original call, re-raised on replay with the same message."""
+
+
+def encode_provider_result(result: Any) -> Dict[str, Any]:
+    """Strings as-is; Gemini response objects reduced to text + grounding chunks."""
+    if isinstance(result, str) or result is None:
+        return {"text": result}
+    grounding = None
+    candidates = getattr(result, "candidates", None) or []
+    metadata = candidates[0].grounding_metadata if candidates else None
+    if metadata is not None:
+        grounding = [[chunk.web.uri, chunk.web.title] for chunk in (metadata.grounding_chunks or []) if chunk.web]
+    return {"text": result.text, "full": True, "grounding": grounding}
+
+
+def decode_provider_result(data: Dict[str, Any]) -> Any:
+    """Inverse of encode_provider_result; full responses come back as duck-typed Gemini responses."""
+    if not data.get("full"):
+        return data["text"]
+    metadata = None
+    if data.get("grounding") is not None:
+        chunks = [SimpleNamespace(web=SimpleNamespace(uri=uri, title=title)) for uri, title in data["grounding"]]
+        metadata = SimpleNamespace(grounding_chunks=chunks)
+    return SimpleNamespace(text=data["text"], candidates=[SimpleNamespace(grounding_metadata=metadata)])
+
+
+class TrafficRecorder:
+    """See module docstring. `call` / `call_async` wrap one external request each."""
+
+    def __init__(self, record_path: Optional[str] = RECORD_PATH, replay_path: Optional[str] = REPLAY_PATH, pacing: float = REPLAY_PACING):
+        if record_path and replay_path:
+            logger.warning("Both GEO_RECORD and GEO_REPLAY are set; replaying only")
+            record_path = None
+        self.record_path = record_path
+        self.replay_path = replay_path
+        self.pacing = pacing
+        self._lock = threading.Lock()
+        self._writer = None
+        self._entries: Optional[Dict[str, List[dict]]] = None
+        self._served: Dict[str, int] = {}
+
+    @property
+    def active(self) -> bool:
+        return bool(self.record_path or self.replay_path)
+
+    @staticmethod
+    def make_key(kind: str, request: Dict[str, Any]) -> str:
+        payload = json.dumps([kind, request], sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+    # --- Recording ---
+
+    def _write(self, entry: Dict[str, Any]):
+        line = json.dumps(entry, ensure_ascii=False, default=str) + "\n"
+        with self._lock:
+            if self._writer is None:
+                self._writer = gzip.open(self.record_path, "at", encoding="utf-8")
+                atexit.register(self.close)
+            self._writer.write(line)
+            self._writer.flush()  # Survive a crash mid-run
+
+    def close(self):
+        with self._lock:
+            if self._writer is not None:
+                self._writer.close()
+                self._writer = None
+
+    def _record(self, kind: str, request: Dict[str, Any], started: float, response: Any = None, error: Optional[Exception] = None):
+        self._write({
+            "kind": kind,
+            "key": self.make_key(kind, request),
+            "request": request,
+            "response": response,
+            "error": str(error) if error is not None else None,
+            "latency": round(time.perf_counter() - started, 4),
+            "ts": time.time(),
+        })
+
+    # --- Replay ---
+
+    def _load(self) -> Dict[str, List[dict]]:
+        if self._entries is None:
+            entries: Dict[str, List[dict]] = {}
+            try:
+                with gzip.open(self.replay_path, "rt", encoding="utf-8") as f:
+                    for line in f:
+                        entry = json.loads(line)
+                        entries.setdefault(entry["key"], []).append(entry)
+            except EOFError:
+                logger.warning("Replay archive is truncated; using the complete records only", extra={"path": self.replay_path})
+            logger.info("Loaded replay archive", extra={"path": self.replay_path, "calls": sum(len(v) for v in entries.values())})
+            self._entries = entries
+        return self._entries
+
+    def _next_entry(self, kind: str, request: Dict[str, Any]) -> dict:
+        key = self.make_key(kind, request)
+        with self._lock:
+            recorded = self._load().get(key)
+            if not recorded:
+                raise ReplayMiss(f"No recorded {kind} response for {json.dumps(request, default=str)[:200]}")
+            served = self._served.get(key, 0)
+            self._served[key] = served + 1
+            return recorded[min(served, len(recorded) - 1)]
+
+    @staticmethod
+    def _result(entry: dict, decode: Optional[Callable]) -> Any:
+        if entry["error"] is not None:
+            raise RecordedError(entry["error"])
+        return decode(entry["response"]) if decode else entry["response"]
+
+    # --- Decisions (no external call, but replay must take the same path) ---
+
+    def note(self, kind: str, request: Dict[str, Any], value: Any):
+        """Records a value derived from live traffic (e.g. which crawled pages were used)."""
+        if self.record_path:
+            self._record(kind, request, time.perf_counter(), response=value)
+
+    def recall(self, kind: str, request: Dict[str, Any], default: Any = None) -> Any:
+        """The value noted for this request on replay; `default` when not replaying or not archived."""
+        if not self.replay_path:
+            return default
+        try:
+            return self._result(self._next_entry(kind, request), None)
+        except ReplayMiss:
+            return default  # Archive recorded before this value was noted
+
+    # --- Wrappers ---
+
+    def call(self, kind: str, request: Dict[str, Any], fn: Callable[[], Any],
+             encode: Optional[Callable] = None, decode: Optional[Callable] = None) -> Any:
+        """Run (or replay) a blocking external call."""
+        if self.replay_path:
+            entry = self._next_entry(kind, request)
+            if self.pacing > 0:
+                time.sleep(entry["latency"] * self.pacing)
+            return self._result(entry, decode)
+        if not self.record_path:
+            return fn()
+
+        started = time.perf_counter()
+        try:
+            result = fn()
+        except Exception as e:
+            self._record(kind, request, started, error=e)
+            raise
+        self._record(kind, request, started, response=encode(result) if encode else result)
+        return result
+
+    async def call_async(self, kind: str, request: Dict[str, Any], fn: Callable[[], Any],
+                         encode: Optional[Callable] = None, decode: Optional[Callable] = None) -> Any:
+        """Run (or replay) an async external call; `fn` returns an awaitable."""
+        if self.replay_path:
+            entry = self._next_entry(kind, request)
+            if self.pacing > 0:
+                await asyncio.sleep(entry["latency"] * self.pacing)
+            return self._result(entry, decode)
+        if not self.record_path:
+            return await fn()
+
+        started = time.perf_counter()
+        try:
+            result = await fn()
+        except Exception as e:
+            self._record(kind, request, started, error=e)
+            raise
+        self._record(kind, request, started, response=encode(result) if encode else result)
+        return result
+
+
+recorder = TrafficRecorder()
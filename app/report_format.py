@@ -0,0 +1,76 @@
+# app/report_format.py
+"""
+Compact VisibilityReport format with an interned source table.
+
+The same SearchSource is otherwise embedded in every ModelResponse that cited
+it and again in every CompetitorInsight; the compact format serializes each
+distinct source once and references it by index.
+"""
+
+from typing import Dict, List
+
+from app.schemas import (
+    CompactCompetitorInsight, CompactModelResponse, CompactVisibilityReport,
+    SearchSource, VisibilityReport
+)
+
+
+class SourceTable:
+    """Interns SearchSource objects; identical sources share one index."""
+
+    def __init__(self):
+        self.sources: List[SearchSource] = []
+        self._by_object: Dict[int, int] = {}  # Fast path: the same instance cited again
+        self._by_value: Dict[tuple, int] = {}
+
+    def intern(self, source: SearchSource) -> int:
+        idx = self._by_object.get(id(source))
+        if idx is not None:
+            return idx
+        key = (source.url, source.title, source.favicon, source.description, source.domain, source.is_grounded, source.source_type)
+        idx = self._by_value.get(key)
+        if idx is None:
+            idx = self._by_value[key] = len(self.sources)
+            self.sources.append(source)
+        self._by_object[id(source)] = idx
+        return idx
+
+
+def to_compact_report(report: VisibilityReport) -> CompactVisibilityReport:
+    table = SourceTable()
+    model_results = [
+        CompactModelResponse.model_construct(
+            model_name=r.model_name,
+            response_text=r.response_text,
+            evaluation=r.evaluation,
+            source_ids=[table.intern(s) for s in r.sources],
+            evaluated_at=r.evaluated_at,
+            error=r.error
+        )
+        for r in report.model_results
+    ]
+    insights = [
+        CompactCompetitorInsight.model_construct(
+            name=c.name,
+            mentions=c.mentions,
+            avg_rank=c.avg_rank,
+            prompts_appeared=c.prompts_appeared,
+            source_ids=[table.intern(s) for s in c.sources],
+            visibility_reason=c.visibility_reason
+        )
+        for c in report.competitor_insights
+    ]
+    return CompactVisibilityReport.model_construct(
+        format="compact",
+        company_name=report.company_name,
+        overall_score=report.overall_score,
+        queries_tested=report.queries_tested,
+        sources=table.sources,
+        model_results=model_results,
+        key_findings=report.key_findings,
+        optimizer_tips=report.optimizer_tips,
+        competitor_insights=insights,
+        competitor_summary=report.competitor_summary,
+        audit_id=report.audit_id,
+        diff=report.diff
+    )
@@ -0,0 +1,44 @@
+# app/responses.py
+"""
+High-throughput JSON responses.
+
+Endpoints returning large reports hand the pydantic object straight to
+ORJSONModelResponse, which bypasses FastAPI's response_model re-validation and
+serializes with orjson. Compression (brotli, falling back to gzip) is applied
+by middleware configured in add_compression().
+"""
+
+from typing import Any
+
+import orjson
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+from starlette.middleware.gzip import GZipMiddleware
+
+try:
+    from brotli_asgi import BrotliMiddleware
+except ImportError:  # Optional: gzip only
+    BrotliMiddleware = None
+
+COMPRESSION_MIN_SIZE = 1024
+
+
+def _default(obj: Any):
+    if isinstance(obj, BaseModel):
+        return obj.model_dump()
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+
+
+class ORJSONModelResponse(JSONResponse):
+    """JSON response rendered by orjson; accepts pydantic models, dicts and lists."""
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
+
+
+def add_compression(app, minimum_size: int = COMPRESSION_MIN_SIZE):
+    """Brotli when the client accepts it (gzip fallback), plain gzip if brotli-asgi is missing."""
+    if BrotliMiddleware is not None:
+        app.add_middleware(BrotliMiddleware, minimum_size=minimum_size, gzip_fallback=True)
+    else:
+        app.add_middleware(GZipMiddleware, minimum_size=minimum_size)
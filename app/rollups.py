@@ -0,0 +1,143 @@
+# app/rollups.py
+"""
+Incrementally maintained visibility rollups (per company / day / provider).
+
+update_rollups() runs inside the audit's transaction and adds that audit's
+counters to the day's rows with an upsert, so trend and share-of-voice charts
+read a bounded number of rollup rows regardless of how many audits exist.
+"""
+
+from collections import Counter
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional
+
+from sqlalchemy.orm import Session
+
+from app.models import VisibilityRollup, CompetitorRollup
+
+VISIBILITY_KEY = ["company", "day", "provider", "use_google_search"]
+COMPETITOR_KEY = VISIBILITY_KEY + ["competitor"]
+GRANULARITIES = ("day", "week", "month")
+
+
+def _upsert_increment(db: Session, model, key_columns: List[str], rows: List[dict]):
+    """Insert rows or add their non-key values to the existing row with the same key."""
+    if not rows:
+        return
+    value_columns = [c for c in rows[0] if c not in key_columns]
+    dialect = db.get_bind().dialect.name
+
+    if dialect in ("postgresql", "sqlite"):
+        if dialect == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        stmt = dialect_insert(model).values(rows)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=key_columns,
+            set_={c: getattr(model.__table__.c, c) + getattr(stmt.excluded, c) for c in value_columns}
+        )
+        db.execute(stmt)
+        return
+
+    # Portable fallback: lock-and-increment per row
+    for row in rows:
+        existing = db.query(model).filter_by(**{k: row[k] for k in key_columns}).with_for_update().first()
+        if existing:
+            for c in value_columns:
+                setattr(existing, c, getattr(existing, c) + row[c])
+        else:
+            db.add(model(**row))
+
+
+def update_rollups(db: Session, company: str, created_at: datetime, provider: str, use_google_search: bool,
+                   overall_score: float, response_count: int, mention_count: int, brand_ranks: List[int],
+                   competitors: List[str]):
+    """
+    Adds one audit to the rollups. `competitors` holds one entry per
+    (response, competitor) mention. Must be called before the audit commits.
+    """
+    key = {"company": company, "day": created_at.date(), "provider": provider, "use_google_search": use_google_search}
+
+    _upsert_increment(db, VisibilityRollup, VISIBILITY_KEY, [{
+        **key,
+        "audits": 1,
+        "score_sum": overall_score,
+        "response_count": response_count,
+        "mention_count": mention_count,
+        "rank_sum": float(sum(brand_ranks)),
+        "rank_count": len(brand_ranks),
+        "competitor_mentions": len(competitors),
+    }])
+    # Pre-aggregated so a statement never touches the same key twice
+    _upsert_increment(db, CompetitorRollup, COMPETITOR_KEY, [
+        {**key, "competitor": name, "mentions": count} for name, count in Counter(competitors).items()
+    ])
+
+
+def _bucket(day: date, granularity: str) -> date:
+    if granularity == "week":
+        return day - timedelta(days=day.weekday())
+    if granularity == "month":
+        return day.replace(day=1)
+    return day
+
+
+def get_trends(db: Session, company: str, days: int = 90, granularity: str = "day",
+               provider: Optional[str] = None, top_competitors: int = 5) -> dict:
+    """
+    Score / mention-rate / rank series and competitor share of voice per period.
+    Reads at most one rollup row per (day, provider[, competitor]) in the range.
+    """
+    if granularity not in GRANULARITIES:
+        raise ValueError(f"granularity must be one of {GRANULARITIES}")
+    since = date.today() - timedelta(days=days)
+
+    query = db.query(VisibilityRollup).filter(VisibilityRollup.company == company, VisibilityRollup.day >= since)
+    comp_query = db.query(CompetitorRollup).filter(CompetitorRollup.company == company, CompetitorRollup.day >= since)
+    if provider:
+        query = query.filter(VisibilityRollup.provider == provider)
+        comp_query = comp_query.filter(CompetitorRollup.provider == provider)
+
+    # Score series per (period, provider)
+    series: Dict[tuple, Dict[str, float]] = {}
+    own_mentions: Counter = Counter()
+    all_mentions: Counter = Counter()
+    for row in query.all():
+        period = _bucket(row.day, granularity)
+        label = f"{row.provider}+search" if row.use_google_search else row.provider
+        acc = series.setdefault((period, label), Counter())
+        for col in ("audits", "score_sum", "response_count", "mention_count", "rank_sum", "rank_count"):
+            acc[col] += getattr(row, col)
+        own_mentions[period] += row.mention_count
+        all_mentions[period] += row.mention_count + row.competitor_mentions
+
+    points = []
+    for (period, label), acc in sorted(series.items()):
+        points.append({
+            "period": period.isoformat(),
+            "provider": label,
+            "audits": int(acc["audits"]),
+            "score": round(acc["score_sum"] / acc["audits"], 2) if acc["audits"] else 0.0,
+            "mention_rate": round(acc["mention_count"] / acc["response_count"], 4) if acc["response_count"] else 0.0,
+            "avg_rank": round(acc["rank_sum"] / acc["rank_count"], 2) if acc["rank_count"] else None,
+        })
+
+    # Share of voice per period: company + top competitors over all mentions
+    comp_mentions: Dict[date, Counter] = {}
+    for row in comp_query.all():
+        comp_mentions.setdefault(_bucket(row.day, granularity), Counter())[row.competitor] += row.mentions
+
+    share = []
+    for period in sorted(all_mentions):
+        total = all_mentions[period]
+        entries = [{"name": company, "mentions": own_mentions[period], "is_company": True}]
+        entries += [
+            {"name": name, "mentions": count, "is_company": False}
+            for name, count in comp_mentions.get(period, Counter()).most_common(top_competitors)
+        ]
+        for e in entries:
+            e["share"] = round(e["mentions"] / total, 4) if total else 0.0
+        share.append({"period": period.isoformat(), "entries": entries})
+
+    return {"company": company, "days": days, "granularity": granularity, "series": points, "share_of_voice": share}
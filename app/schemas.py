@@ -2,6 +2,7 @@
 
 from pydantic import BaseModel, Field
 from typing import List, Optional
+from datetime import datetime
 
 class CompanyUnderstanding(BaseModel):
     company_name: str = Field("Pending Analysis...", description="Name of the company extracted")
@@ -46,6 +47,8 @@ class ModelResponse(BaseModel):
     response_text: str
     evaluation: EvaluationMetric
     sources: List[SearchSource] = Field(default_factory=list)
+    evaluated_at: Optional[datetime] = None  # When the prompt was actually run (reused results keep the original time)
+    error: Optional[str] = None  # Set when the answer or judge call failed and a fallback was reported instead
 
 
 class CompetitorInsight(BaseModel):
@@ -56,6 +59,25 @@ class CompetitorInsight(BaseModel):
     sources: List[SearchSource] = Field(default_factory=list, description="Sources/websites where this competitor was mentioned")
     visibility_reason: str = Field("", description="AI-generated reason for why this competitor is ranking/visible")
 
+class PromptDiff(BaseModel):
+    prompt_text: str
+    previous_rank: Optional[int] = None
+    current_rank: Optional[int] = None
+    rank_change: Optional[int] = None  # Positive = moved up the list
+    mention_lost: bool = False
+    mention_gained: bool = False
+    new_competitors: List[str] = Field(default_factory=list)
+
+class AuditDiff(BaseModel):
+    previous_audit_id: Optional[int] = None
+    previous_audit_at: Optional[datetime] = None
+    reused_prompts: int = 0
+    evaluated_prompts: int = 0
+    score_change: Optional[float] = None
+    prompt_changes: List[PromptDiff] = Field(default_factory=list)
+    new_competitors: List[str] = Field(default_factory=list)
+    lost_mentions: List[str] = Field(default_factory=list)  # Prompts where the brand is no longer mentioned
+
 class VisibilityReport(BaseModel):
     company_name: str
     overall_score: float  # 0 to 100
@@ -65,6 +87,72 @@ class VisibilityReport(BaseModel):
     optimizer_tips: List[str]
     competitor_insights: List[CompetitorInsight] = Field(default_factory=list)
     competitor_summary: List[str] = Field(default_factory=list) # Keep for backward compatibility if needed
+    audit_id: Optional[int] = None  # Set once the audit has been persisted
+    diff: Optional[AuditDiff] = None  # Incremental audits: changes vs. the previous audit
+
+# --- Compact report format ---
+# Each distinct SearchSource is serialized once in a top-level table; responses and
+# competitor insights reference it by index instead of embedding a copy.
+
+class CompactModelResponse(BaseModel):
+    model_name: str
+    response_text: str
+    evaluation: EvaluationMetric
+    source_ids: List[int] = Field(default_factory=list)
+    evaluated_at: Optional[datetime] = None
+    error: Optional[str] = None
+
+class CompactCompetitorInsight(BaseModel):
+    name: str
+    mentions: int
+    avg_rank: Optional[float] = None
+    prompts_appeared: List[str] = Field(default_factory=list)
+    source_ids: List[int] = Field(default_factory=list)
+    visibility_reason: str = ""
+
+class CompactVisibilityReport(BaseModel):
+    format: str = "compact"
+    company_name: str
+    overall_score: float
+    queries_tested: List[str]
+    sources: List[SearchSource]
+    model_results: List[CompactModelResponse]
+    key_findings: List[str]
+    optimizer_tips: List[str]
+    competitor_insights: List[CompactCompetitorInsight] = Field(default_factory=list)
+    competitor_summary: List[str] = Field(default_factory=list)
+    audit_id: Optional[int] = None
+    diff: Optional[AuditDiff] = None
+
+# --- Structured LLM output schemas (passed to providers as response schemas) ---
+
+class CompanyProfileOutput(BaseModel):
+    company_name: str
+    company_summary: str
+    industry: str
+    offerings: List[str]
+    target_users: List[str]
+    core_problems_solved: List[str]
+
+class PromptListOutput(BaseModel):
+    queries: List[GeneratedPrompt]
+
+class JudgeOutput(BaseModel):
+    brand_present: bool
+    url_cited: bool
+    recommendation_rank: Optional[int]
+    accuracy_score: float
+    sentiment: str
+    competitor_ranks: List[CompetitorRank]
+
+class CompetitorReason(BaseModel):
+    name: str
+    reason: str
+
+class ReportOutput(BaseModel):
+    key_findings: List[str]
+    optimizer_tips: List[str]
+    competitor_reasons: List[CompetitorReason]
 
 class UserBase(BaseModel):
     email: str
@@ -0,0 +1,302 @@
+# app/simulated_provider.py
+"""
+Offline stand-in for the LLM providers, for load tests and benchmarks.
+
+`generate_ai_response(..., provider="simulated")` (or every call when
+GEO_OFFLINE_MODE is on) is answered here instead of by Gemini/Cerebras/OpenRouter:
+
+- latency follows a log-normal distribution around SIMULATED_LATENCY_MS, plus
+  output tokens / SIMULATED_TOKENS_PER_SECOND
+- 429 and quota errors are raised at SIMULATED_RATE_LIMIT_RATE / SIMULATED_QUOTA_ERROR_RATE
+  with the same wording as the real providers, so retry/circuit-breaker paths run
+- outputs are shaped like the real ones: company profile JSON, prompt lists,
+  answers with ranked company lists and URLs, judge JSON, report JSON, and a
+  Gemini-like response object with grounding_metadata for search-grounded calls
+
+Content is derived from a hash of the prompt, so the same prompt always gets
+the same answer; latency and errors come from a separate (optionally seeded) RNG.
+"""
+
+import json
+import math
+import random
+import re
+import time
+import zlib
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional
+
+from app.config import (
+    SIMULATED_LATENCY_MS, SIMULATED_LATENCY_SIGMA, SIMULATED_TOKENS_PER_SECOND,
+    SIMULATED_RATE_LIMIT_RATE, SIMULATED_QUOTA_ERROR_RATE, SIMULATED_BRAND_MENTION_RATE, SIMULATED_SEED,
+)
+from app.entity_resolution import domain_to_name
+from app.prompt_library import INTENT_CATEGORIES, canonical_intent
+from app.text_cleaner import estimate_tokens
+
+VENDORS = [
+    "Northwind Systems", "Contoso Analytics", "Fabrikam Cloud", "Tailspin Software", "Litware Labs",
+    "Adventure Works Digital", "Proseware", "Lucerne Technologies", "Woodgrove Solutions", "Coho Data",
+    "Trey Research", "Blue Yonder Partners", "Fourth Coffee Digital", "Margie's Consulting", "Wingtip Toys Tech",
+    "Graphic Design Institute", "Humongous Insurance Tech", "Relecloud", "VanArsdel Group", "Wide World Services",
+]
+INDUSTRIES = ["B2B SaaS", "Digital Marketing", "Cloud Infrastructure", "IT Consulting", "Fintech", "E-commerce Software"]
+SEGMENTS = ["small businesses", "enterprises", "startups", "healthcare teams", "retailers", "agencies",
+            "nonprofits", "manufacturers", "remote teams", "fintech companies", "schools", "law firms"]
+QUALIFIERS = ["in 2025", "on a budget", "with good support", "that integrate with Salesforce", "with transparent pricing",
+              "for fast onboarding", "with strong security", "that scale well", "with local presence", "for beginners"]
+SENTIMENTS = ["Positive", "Positive", "Neutral", "Neutral", "Negative"]
+
+QUERY_TEMPLATES = {
+    "discovery": ["Which {industry} providers are best for {segment} {qualifier}?",
+                  "Top {industry} companies in {region} for {segment}",
+                  "Who are the leading {industry} vendors {qualifier}?"],
+    "solution": ["How can {segment} reduce costs with {industry} tools {qualifier}?",
+                 "What {industry} solution fixes slow onboarding for {segment}?",
+                 "Best way for {segment} to automate reporting {qualifier}"],
+    "comparison": ["{name} alternatives for {segment} {qualifier}",
+                   "Compare the top {industry} platforms for {segment} in {region}",
+                   "Which is better for {segment}: {name} or its competitors?"],
+    "transactional": ["Hire a {industry} partner in {region} for {segment}",
+                      "Get a quote from {industry} agencies {qualifier}",
+                      "Book a demo with a {industry} vendor for {segment}"],
+    "brand": ["Is {name} a good choice for {segment}?",
+              "What do customers say about {name} {qualifier}?",
+              "Does {name} work well for {segment} in {region}?"],
+}
+
+# Capitalized words that start questions rather than name companies
+_NOT_NAMES = {"What", "Which", "Who", "How", "Is", "Are", "Does", "Do", "Best", "Top", "Compare", "Hire", "Get",
+              "Book", "Find", "Can", "Should", "The", "A", "An", "I", "AI", "CRM", "SaaS", "B2B", "IT", "In", "For"}
+
+_rng = random.Random(SIMULATED_SEED) if SIMULATED_SEED is not None else random.Random()
+
+
+class SimulatedProviderError(Exception):
+    """Raised for simulated rate-limit / quota failures."""
+
+
+def _content_rng(prompt: str) -> random.Random:
+    return random.Random(zlib.crc32(prompt.encode("utf-8")))
+
+
+def _domain(name: str) -> str:
+    return re.sub(r"[^a-z0-9]+", "", name.lower()) + ".com"
+
+
+def _search(pattern: str, text: str, default: str = "", flags: int = 0) -> str:
+    match = re.search(pattern, text, flags)
+    return match.group(1).strip() if match else default
+
+
+def _names_in_query(query: str) -> List[str]:
+    """Capitalized phrases in a user query that look like company names."""
+    names = []
+    for match in re.finditer(r"\b[A-Z][\w&'.-]*(?:\s+[A-Z][\w&'.-]*)*", query):
+        words = [w for w in match.group(0).split() if w not in _NOT_NAMES]
+        if words:
+            names.append(" ".join(words).rstrip(".?"))
+    return names
+
+
+def simulated_page_text(url: str) -> str:
+    """Synthetic crawled page text for offline /analyze runs."""
+    domain = domain_to_name(url) or "example"
+    name = domain.replace("-", " ").title()
+    rng = _content_rng(domain)  # Same company facts on every page of the site
+    industry = rng.choice(INDUSTRIES)
+    segments = rng.sample(SEGMENTS, 3)
+    return (
+        f"Welcome to {name}. {name} is a {industry} company helping {', '.join(segments)} grow. "
+        f"Our platform offers analytics dashboards, workflow automation and integrations. "
+        f"Customers choose {name} to cut manual work, improve reporting and scale operations. "
+        f"Path: {url}"
+    )
+
+
+def _answer(query: str, rng: random.Random, url_base: Optional[str] = None) -> tuple:
+    """
+    Ranked list of companies with URLs, like a chat assistant answer. Returns (text, [(name, url)]).
+    `url_base` points company URLs at a stand-in site instead of https://www.<company>.com.
+    """
+    picks = rng.sample(VENDORS, rng.randint(4, 7))
+    for name in _names_in_query(query):
+        if rng.random() < SIMULATED_BRAND_MENTION_RATE:
+            picks.insert(rng.randint(0, len(picks)), name)
+    entries = [(name, f"{url_base}/{_domain(name)}" if url_base else f"https://www.{_domain(name)}") for name in picks]
+    lines = [f"Here are some strong options for {rng.choice(SEGMENTS)} and similar buyers:", ""]
+    for rank, (name, url) in enumerate(entries, 1):
+        blurb = rng.choice(["known for reliable support", "popular with growing teams", "strong integrations",
+                            "competitive pricing", "enterprise-grade security", "fast implementation"])
+        lines.append(f"{rank}. **{name}** ({url}) - {blurb}, especially for {rng.choice(SEGMENTS)}.")
+    lines += ["", "Compare pricing, support and integrations against your requirements before deciding."]
+    return "\n".join(lines), entries
+
+
+def _profile(prompt: str, rng: random.Random) -> Dict[str, Any]:
+    name = _search(r"Welcome to ([^.\n]+)\.", prompt, "Simulated Company")
+    industry = _search(r"is an? ([^.\n]+?) company", prompt) or rng.choice(INDUSTRIES)
+    return {
+        "company_name": name,
+        "company_summary": f"{name} is a {industry} provider focused on automation and analytics. It serves {rng.choice(SEGMENTS)} and {rng.choice(SEGMENTS)}.",
+        "industry": industry,
+        "offerings": ["Analytics dashboards", "Workflow automation", "Integrations"],
+        "target_users": rng.sample(SEGMENTS, 3),
+        "core_problems_solved": ["Manual reporting", "Disconnected tools", "Slow onboarding"],
+    }
+
+
+def _prompt_list(prompt: str, rng: random.Random) -> Dict[str, Any]:
+    industry = _search(r"in the industry: ([^\n]+?)\.?\n", prompt, "software")
+    region = _search(r"interested in the region: ([^.\n]+)", prompt, "Global")
+    name = _search(r"- Name: ([^\n]+)", prompt, "the vendor")
+    requested = re.findall(r"^\d+\.\s+(.+?) - (\d+) quer", prompt, re.MULTILINE)
+    if not requested:
+        total = int(_search(r"generate (\d+) realistic", prompt, "10"))
+        requested = [(INTENT_CATEGORIES[c], str(total // 5 + (i < total % 5))) for i, c in enumerate(INTENT_CATEGORIES)]
+
+    queries = []
+    for category_text, count in requested:
+        intent = canonical_intent(category_text)
+        templates = QUERY_TEMPLATES.get(intent, QUERY_TEMPLATES["discovery"])
+        for _ in range(int(count)):
+            text = rng.choice(templates).format(industry=industry, region=region, name=name,
+                                                segment=rng.choice(SEGMENTS), qualifier=rng.choice(QUALIFIERS))
+            queries.append({"prompt_text": text, "intent_category": INTENT_CATEGORIES.get(intent, category_text)})
+    return {"queries": queries}
+
+
+def _judge(prompt: str, rng: random.Random) -> Dict[str, Any]:
+    brand = _search(r'Audit requirements for "([^"]+)"', prompt)
+    response = _search(r'Model Response:\s*"""(.*?)"""', prompt, flags=re.DOTALL)
+    items = re.findall(r"^\s*(\d+)\.\s+\**([^*(\n]+?)\**\s*(?:\((https?://[^)\s]+)\))?\s*(?:-|$)", response, re.MULTILINE)
+
+    rank, url_cited, competitors = None, False, []
+    for position, name, url in items:
+        if brand and name.strip().lower() == brand.lower():
+            rank, url_cited = int(position), bool(url)
+        else:
+            competitors.append({"name": name.strip(), "rank": int(position), "url_cited": bool(url)})
+    present = rank is not None or (bool(brand) and brand.lower() in response.lower())
+    return {
+        "brand_present": present,
+        "url_cited": url_cited,
+        "recommendation_rank": rank,
+        "accuracy_score": round(rng.uniform(0.5, 0.95), 2) if present else 0.0,
+        "sentiment": rng.choice(SENTIMENTS) if present else "Neutral",
+        "competitor_ranks": competitors,
+    }
+
+
+def _report(prompt: str, rng: random.Random) -> Dict[str, Any]:
+    competitors = re.findall(r"^- ([^:\n]+): \d+ mentions", prompt, re.MULTILINE)
+    return {
+        "key_findings": [
+            "The brand appears in fewer discovery answers than its main competitors.",
+            "Answers that cite the brand usually link its website.",
+        ],
+        "optimizer_tips": [
+            "Publish comparison pages that answer 'alternatives' queries directly.",
+            "Add structured FAQ content covering pricing and integrations.",
+        ],
+        "competitor_reasons": [
+            {"name": name, "reason": rng.choice([
+                "Frequently cited review-site coverage.",
+                "Clear category positioning on its homepage.",
+                "Strong presence in industry comparison lists.",
+            ])}
+            for name in competitors[:10]
+        ],
+    }
+
+
+_BUILDERS = {
+    "CompanyProfileOutput": _profile,
+    "PromptListOutput": _prompt_list,
+    "JudgeOutput": _judge,
+    "ReportOutput": _report,
+}
+
+
+def _fill_schema(schema) -> Dict[str, Any]:
+    """Placeholder values for an unknown schema, by field type."""
+    values = {}
+    for name, field in schema.model_fields.items():
+        annotation = str(field.annotation)
+        if "List" in annotation or "list" in annotation:
+            values[name] = []
+        elif "bool" in annotation:
+            values[name] = False
+        elif "int" in annotation:
+            values[name] = 1
+        elif "float" in annotation:
+            values[name] = 0.5
+        else:
+            values[name] = "Simulated value"
+    return values
+
+
+def _structured(prompt: str, response_schema, rng: random.Random) -> Dict[str, Any]:
+    if response_schema is not None:
+        name = response_schema.__name__
+        builder = _BUILDERS.get(name[:-len("Missing")] if name.endswith("Missing") else name)
+        if builder is None:
+            return _fill_schema(response_schema)
+        data = builder(prompt, rng)
+        return {k: v for k, v in data.items() if k in response_schema.model_fields}
+
+    # Plain JSON mode: infer the task from the prompt
+    if "Audit requirements for" in prompt:
+        return _judge(prompt, rng)
+    if "key_findings" in prompt:
+        return _report(prompt, rng)
+    if '"queries"' in prompt or "user queries" in prompt:
+        return _prompt_list(prompt, rng)
+    if "company_name" in prompt:
+        return _profile(prompt, rng)
+    return {}
+
+
+def _grounded_response(text: str, entries: List[tuple]) -> SimpleNamespace:
+    """Object shaped like a google-genai response with grounding metadata."""
+    chunks = [SimpleNamespace(web=SimpleNamespace(uri=url, title=name)) for name, url in entries]
+    candidate = SimpleNamespace(grounding_metadata=SimpleNamespace(grounding_chunks=chunks))
+    return SimpleNamespace(text=text, candidates=[candidate])
+
+
+def _sleep(tokens: int):
+    mean = max(SIMULATED_LATENCY_MS, 1.0)
+    sigma = SIMULATED_LATENCY_SIGMA
+    latency_ms = _rng.lognormvariate(math.log(mean) - sigma ** 2 / 2, sigma) if sigma > 0 else mean
+    if SIMULATED_TOKENS_PER_SECOND > 0:
+        latency_ms += tokens / SIMULATED_TOKENS_PER_SECOND * 1000
+    time.sleep(latency_ms / 1000)
+
+
+def simulated_output(prompt: str, json_mode: bool = False, response_schema=None, url_base: Optional[str] = None) -> tuple:
+    """
+    Response content without latency or error injection: (text, grounding entries).
+    Also used by the HTTP stand-in upstreams in benchmarks/load_test.py.
+    """
+    rng = _content_rng(prompt)
+    if json_mode:
+        return json.dumps(_structured(prompt, response_schema, rng)), []
+    return _answer(prompt, rng, url_base)
+
+
+def generate_simulated_response(prompt: str, response_mime_type: str = "text/plain", use_search: bool = False,
+                                return_full_response: bool = False, response_schema=None) -> Any:
+    """Same contract as generate_ai_response for a single provider call (no retries here)."""
+    roll = _rng.random()
+    if roll < SIMULATED_RATE_LIMIT_RATE:
+        time.sleep(0.05)
+        raise SimulatedProviderError("429 RESOURCE_EXHAUSTED: simulated rate limit, please retry")
+    if roll < SIMULATED_RATE_LIMIT_RATE + SIMULATED_QUOTA_ERROR_RATE:
+        time.sleep(0.05)
+        raise SimulatedProviderError("token_quota_exceeded: simulated daily quota exhausted")
+
+    text, entries = simulated_output(prompt, response_mime_type == "application/json", response_schema)
+    _sleep(estimate_tokens(text))
+    if return_full_response and use_search:
+        return _grounded_response(text, entries)
+    return text
@@ -0,0 +1,195 @@
+# app/structured_logging.py
+"""
+Non-blocking structured logging for the request hot paths.
+
+Modules log through `get_logger(__name__)`. Records are enqueued by a
+QueueHandler (no I/O on the calling thread or event loop) and written by a
+background QueueListener thread, as JSON lines by default:
+
+    {"ts": "...", "level": "INFO", "logger": "app.evaluator", "msg": "Prompt evaluated",
+     "audit_id": "3f9c...", "prompt_index": 4, "provider": "gemini", "sources": 6}
+
+Context fields (audit_id, prompt_index, provider, ...) are set once with
+`log_context(...)` and attached to every record logged inside it, including
+from executor threads (contextvars travel with the work). Per-call fields go
+in `extra={...}`; the OpenTelemetry trace id is added when a span is active.
+
+- LOG_FORMAT=json|text            output format
+- LOG_LEVEL=INFO                  level for app.* loggers
+- LOG_LEVELS="app.site_metadata=DEBUG,app.ai_client=WARNING"   per-module overrides
+- LOG_DEBUG_SAMPLE_RATE=0.1       fraction of DEBUG records kept (per-source lines);
+                                  kept records carry "sample_rate" so counts can be scaled
+- LOG_QUEUE_SIZE=10000            records beyond this are dropped (and counted), never waited on
+"""
+
+import atexit
+import copy
+import json
+import logging
+import logging.handlers
+import queue
+import random
+import sys
+import threading
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Any, Dict
+
+from app.config import LOG_FORMAT, LOG_LEVEL, LOG_LEVELS, LOG_DEBUG_SAMPLE_RATE, LOG_QUEUE_SIZE
+
+try:
+    from opentelemetry import trace
+except ImportError:  # Optional: no trace ids in log records
+    trace = None
+
+ROOT_LOGGER = "app"
+
+_context: ContextVar[Dict[str, Any]] = ContextVar("log_context", default={})
+
+_EXC_FORMATTER = logging.Formatter()
+
+# Attributes every LogRecord has; anything else on a record came from `extra`
+_RESERVED = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "context", "sample_rate"}
+
+
+@contextmanager
+def log_context(**fields):
+    """Attach fields to every record logged within the block (and tasks/threads it starts)."""
+    token = _context.set({**_context.get(), **fields})
+    try:
+        yield
+    finally:
+        _context.reset(token)
+
+
+def current_log_context() -> Dict[str, Any]:
+    return _context.get()
+
+
+def new_audit_id() -> str:
+    """Short random id correlating the log records of one audit run."""
+    return uuid.uuid4().hex[:12]
+
+
+def set_log_context(**fields):
+    """Add fields for the rest of the current task (e.g. per-prompt fields inside a gathered task)."""
+    _context.set({**_context.get(), **fields})
+
+
+class ContextFilter(logging.Filter):
+    """Runs on the calling thread: samples DEBUG records and captures context before enqueueing."""
+
+    def __init__(self, debug_sample_rate: float = LOG_DEBUG_SAMPLE_RATE):
+        super().__init__()
+        self.debug_sample_rate = debug_sample_rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno <= logging.DEBUG and self.debug_sample_rate < 1:
+            if random.random() >= self.debug_sample_rate:
+                return False
+            record.sample_rate = self.debug_sample_rate
+        context = dict(_context.get())
+        if trace is not None:
+            span_context = trace.get_current_span().get_span_context()
+            if span_context.is_valid:
+                context["trace_id"] = format(span_context.trace_id, "032x")
+        record.context = context
+        return True
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that drops records when the queue is full instead of blocking."""
+
+    dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Merge args and render the traceback now (they may not survive the queue); keep fields separate
+        record = copy.copy(record)
+        record.msg = record.message = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = _EXC_FORMATTER.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            DroppingQueueHandler.dropped += 1
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        entry.update(getattr(record, "context", {}))
+        entry.update({k: v for k, v in vars(record).items() if k not in _RESERVED})
+        if getattr(record, "sample_rate", None) is not None:
+            entry["sample_rate"] = record.sample_rate
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    """`[LEVEL] message key=value ...` — the repo's console style, with the structured fields appended."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        fields = {**getattr(record, "context", {}), **{k: v for k, v in vars(record).items() if k not in _RESERVED}}
+        line = f"[{record.levelname}] {record.getMessage()}"
+        if fields:
+            line += " " + " ".join(f"{k}={v}" for k, v in fields.items())
+        if record.exc_text:
+            line += "\n" + record.exc_text
+        return line
+
+
+def parse_levels(spec: str) -> Dict[str, str]:
+    """"app.site_metadata=DEBUG,app.ai_client=WARNING" -> {logger: level}; malformed entries are skipped."""
+    levels = {}
+    for item in spec.split(","):
+        name, _, level = item.partition("=")
+        if name.strip() and level.strip():
+            levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+_listener = None
+_configure_lock = threading.Lock()
+
+
+def configure_logging():
+    """Idempotent: queue handler on the app.* logger tree plus its background writer thread."""
+    global _listener
+    with _configure_lock:
+        if _listener is not None:
+            return
+        stream = logging.StreamHandler(sys.stderr)  # stdout stays free for CLI output
+        stream.setFormatter(TextFormatter() if LOG_FORMAT == "text" else JsonFormatter())
+        log_queue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+        handler = DroppingQueueHandler(log_queue)
+        handler.addFilter(ContextFilter())
+
+        root = logging.getLogger(ROOT_LOGGER)
+        root.addHandler(handler)
+        root.setLevel(LOG_LEVEL.upper())
+        root.propagate = False  # Keep app records out of uvicorn's / the CLI's root handlers
+        for name, level in parse_levels(LOG_LEVELS).items():
+            logging.getLogger(name).setLevel(level)
+
+        _listener = logging.handlers.QueueListener(log_queue, stream, respect_handler_level=True)
+        _listener.start()
+        atexit.register(_listener.stop)  # Flush what's queued on exit
+
+
+def get_logger(name: str) -> logging.Logger:
+    """`logger = get_logger(__name__)` in app modules."""
+    configure_logging()
+    return logging.getLogger(name)
@@ -0,0 +1,179 @@
+# app/structured_output.py
+"""
+Shared structured-output layer for every LLM call that expects JSON.
+
+- Passes a pydantic-derived schema to providers that support constrained output
+  (Gemini `response_schema`, OpenAI-style `json_schema` response formats).
+- Parses responses with a single-pass tolerant extractor that strips code fences
+  and chatter, drops trailing commas and repairs truncated arrays/objects.
+- Re-asks only for the required fields that are still missing, instead of
+  discarding the whole (already paid for) response.
+"""
+
+import json
+from typing import Any, List, Optional, Type
+
+from pydantic import BaseModel, create_model
+
+from app.ai_client import generate_ai_response
+from app.structured_logging import get_logger
+
+logger = get_logger(__name__)
+
+_CLOSERS = {"{": "}", "[": "]"}
+
+
+def _close(text: str, stack: List[str]) -> str:
+    """Strip dangling separators and append closers for every open container."""
+    text = text.rstrip()
+    while text and text[-1] in ",:":
+        text = text[:-1].rstrip()
+        # A dangling object key ("key": <truncated>) must go as well
+        if text.endswith('"') and stack and stack[-1] == "{":
+            key_start = text.rfind('"', 0, len(text) - 1)
+            if key_start != -1 and text[:key_start].rstrip().endswith(("{", ",")):
+                text = text[:key_start].rstrip()
+    return text + "".join(_CLOSERS[c] for c in reversed(stack))
+
+
+def extract_json(text: str) -> Any:
+    """
+    Extracts the first JSON value from an LLM response in a single pass.
+    Handles ```json fences, leading/trailing prose, trailing commas and
+    truncated output (unterminated strings, arrays and objects are closed,
+    incomplete trailing elements are dropped).
+    Raises ValueError if nothing usable is found.
+    """
+    if not text:
+        raise ValueError("Empty response")
+
+    start = -1
+    for i, ch in enumerate(text):
+        if ch in "{[":
+            start = i
+            break
+    if start == -1:
+        raise ValueError("No JSON object or array found in response")
+
+    out = []
+    stack = []
+    in_string = False
+    escaped = False
+    # Output length + open containers after the last complete element, for truncation repair
+    last_cut = None
+
+    for ch in text[start:]:
+        if in_string:
+            out.append(ch)
+            if escaped:
+                escaped = False
+            elif ch == "\\":
+                escaped = True
+            elif ch == '"':
+                in_string = False
+            continue
+
+        if ch == '"':
+            in_string = True
+            out.append(ch)
+        elif ch in "{[":
+            stack.append(ch)
+            out.append(ch)
+        elif ch in "}]":
+            if not stack:
+                break
+            # Drop a trailing comma before the closer
+            while out and out[-1] in " \t\r\n":
+                out.pop()
+            if out and out[-1] == ",":
+                out.pop()
+            stack.pop()
+            out.append(ch)
+            if not stack:
+                return json.loads("".join(out))
+        elif ch == ",":
+            last_cut = (len(out), list(stack))
+            out.append(ch)
+        else:
+            out.append(ch)
+
+    # Truncated: close what is open, or fall back to the last complete element
+    partial = "".join(out)
+    if in_string:
+        partial += '"'
+    try:
+        return json.loads(_close(partial, stack))
+    except json.JSONDecodeError:
+        if last_cut is None:
+            raise ValueError("Could not repair truncated JSON response")
+        cut, cut_stack = last_cut
+        return json.loads(_close("".join(out[:cut]), cut_stack))
+
+
+def _list_field(schema: Type[BaseModel]) -> Optional[str]:
+    """Name of the single list field for wrapper schemas like {"queries": [...]}."""
+    fields = list(schema.model_fields.items())
+    if len(fields) == 1 and getattr(fields[0][1].annotation, "__origin__", None) in (list, List):
+        return fields[0][0]
+    return None
+
+
+def _missing_fields(schema: Type[BaseModel], data: dict) -> List[str]:
+    return [name for name, field in schema.model_fields.items() if field.is_required() and name not in data]
+
+
+def _call(prompt: str, schema: Type[BaseModel], provider: str) -> str:
+    try:
+        return generate_ai_response(prompt, provider=provider, response_mime_type="application/json", response_schema=schema)
+    except Exception as e:
+        # Some models reject constrained decoding; plain JSON mode + tolerant parsing still works
+        if "schema" not in str(e).lower() and "response_format" not in str(e).lower():
+            raise
+        logger.warning("Provider rejected response schema; retrying in JSON mode", extra={"provider": provider, "error": str(e)})
+        return generate_ai_response(prompt, provider=provider, response_mime_type="application/json")
+
+
+def generate_structured(prompt: str, schema: Type[BaseModel], provider: str = "gemini", max_reasks: int = 1) -> Any:
+    """
+    Generates JSON shaped like `schema` and returns the parsed data (dict).
+    Wrapper schemas with a single list field also accept a bare list from the model.
+    Missing required fields are requested again (only those fields), up to `max_reasks` times.
+    Callers keep their own normalization; this layer only guarantees parsed JSON.
+    """
+    data = extract_json(_call(prompt, schema, provider))
+
+    list_field = _list_field(schema)
+    if isinstance(data, list):
+        if list_field:
+            data = {list_field: data}
+        elif data and isinstance(data[0], dict):
+            data = data[0]
+    if not isinstance(data, dict):
+        raise ValueError(f"Expected a JSON object but got {type(data).__name__}")
+
+    for _ in range(max_reasks):
+        missing = _missing_fields(schema, data)
+        if not missing:
+            break
+        logger.info("Structured output incomplete; re-asking for missing fields only", extra={"schema": schema.__name__, "missing": missing})
+        missing_schema = create_model(
+            f"{schema.__name__}Missing",
+            **{name: (schema.model_fields[name].annotation, ...) for name in missing}
+        )
+        reask_prompt = f"""
+Your previous JSON answer to the request below was missing these fields: {", ".join(missing)}.
+Return ONLY a JSON object with exactly these keys, following this schema:
+{json.dumps(missing_schema.model_json_schema())}
+
+Original request:
+{prompt}
+"""
+        try:
+            extra = extract_json(_call(reask_prompt, missing_schema, provider))
+        except Exception as e:
+            logger.warning("Re-ask for missing fields failed", extra={"schema": schema.__name__, "error": str(e)})
+            break
+        if isinstance(extra, dict):
+            data.update({k: v for k, v in extra.items() if k in missing})
+
+    return data
@@ -1,15 +1,21 @@
 # app/summarizer.py
 
-import json
-from app.schemas import CompanyUnderstanding
+from app.schemas import CompanyUnderstanding, CompanyProfileOutput
 from app.config import GEMINI_API_KEY, GEMINI_MODEL_NAME, CEREBRAS_API_KEY
-from app.ai_client import generate_ai_response, cerebras_client
+from app.ai_client import has_provider
+from app.structured_output import generate_structured
+from app.structured_logging import get_logger
+
+logger = get_logger(__name__)
+
+# Only the first chunks of crawled content are sent to the summarizer
+MAX_SUMMARY_CHUNKS = 8
 
 def summarize_company(chunks: list[str], manual_points: str = "", region: str = "Global", url: str = "") -> CompanyUnderstanding:
     """
     Summarizes company information by combining website content and manual user points.
     """
-    combined_site_text = "\n".join(chunks[:8]) if chunks else "No website content available."
+    combined_site_text = "\n".join(chunks[:MAX_SUMMARY_CHUNKS]) if chunks else "No website content available."
     
     prompt = f"""
 You are a professional business analyst focusing on the {region} market. Your task is to extract key information about a company.
@@ -46,22 +52,8 @@ JSON Schema:
 """
     try:
         # Use Cerebras for summarization if available (it's faster for text processing)
-        provider = "cerebras" if cerebras_client else "gemini"
-        res_text = generate_ai_response(prompt, provider=provider, response_mime_type="application/json")
-        if res_text.startswith("```"):
-            # Find the first and last backticks to extract content
-            import re
-            json_match = re.search(r"({.*})", res_text, re.DOTALL)
-            if json_match:
-                res_text = json_match.group(1)
-            else:
-                res_text = res_text.replace("```json", "", 1).replace("```", "", 1).strip()
-            
-        data = json.loads(res_text)
-        
-        # Handle list response if AI wraps it
-        if isinstance(data, list) and len(data) > 0:
-            data = data[0]
+        provider = "cerebras" if has_provider("cerebras") else "gemini"
+        data = generate_structured(prompt, CompanyProfileOutput, provider=provider)
         
         # Ensure lists are actually lists to avoid Pydantic errors
         for field in ["offerings", "target_users", "core_problems_solved"]:
@@ -90,10 +82,8 @@ JSON Schema:
             region=region
         )
     
-    except Exception as e:
-        print(f"[ERROR] Summarization failed: {e}")
-        import traceback
-        traceback.print_exc()
+    except Exception:
+        logger.exception("Summarization failed")
         return CompanyUnderstanding(
             company_name="Analysis Pending" if manual_points else "Unknown",
             company_summary="Could not automatically summarize company data.",
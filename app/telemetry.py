@@ -0,0 +1,267 @@
+# app/telemetry.py
+"""
+Tracing and metrics for the analysis and evaluation pipeline.
+
+Tracing: OpenTelemetry spans around every HTTP request, pipeline stage
+(crawl, summarize, generate_prompts, answer, enrich_metadata, judge, report),
+fair-scheduler wait and provider call. Spans are exported when
+opentelemetry-sdk is installed and an exporter is configured:
+
+- GEO_TRACE_FILE=traces.jsonl              one JSON span per line
+- OTEL_EXPORTER_OTLP_ENDPOINT=http://...   a local collector (needs opentelemetry-exporter-otlp)
+
+Otherwise (or without opentelemetry at all) spans are no-ops. Blocking work on
+the bounded executors inherits the caller's context, so provider calls nest
+under the stage that made them.
+
+Metrics: Prometheus series served from GET /metrics (needs prometheus_client):
+
+    geo_http_request_seconds{method,route,status}   histogram
+    geo_http_requests_in_flight                     gauge
+    geo_stage_seconds{stage}                        histogram
+    geo_provider_request_seconds{provider,outcome}  histogram (outcome: ok, rate_limited, error)
+    geo_provider_requests_in_flight{provider}       gauge
+    geo_provider_tokens_total{provider,direction}   counter (direction: prompt, completion)
+    geo_provider_retries_total{provider,reason}     counter
+    geo_provider_rate_limited_total{provider}       counter (429 / quota responses)
+    geo_provider_queue_seconds{provider}            histogram (fair-scheduler wait)
+    geo_cache_requests_total{cache,result}          counter (result: hit, miss)
+    geo_executor_* / geo_scheduler_*                gauges read at scrape time
+
+With several uvicorn workers set PROMETHEUS_MULTIPROC_DIR to an empty directory
+so /metrics aggregates every worker (executor and scheduler gauges then describe
+the worker that served the scrape).
+"""
+
+import os
+import time
+from contextlib import contextmanager
+from typing import Optional
+
+from app.config import TRACE_FILE, TRACE_OTLP_ENDPOINT, TRACE_SERVICE_NAME
+from app.profiling import record_stage, record_wait
+from app.structured_logging import get_logger
+
+try:
+    from opentelemetry import trace
+except ImportError:  # Optional: spans are no-ops
+    trace = None
+
+try:
+    import prometheus_client
+    from prometheus_client import CollectorRegistry, Counter, Gauge, Histogram
+    from prometheus_client.core import GaugeMetricFamily
+except ImportError:  # Optional: metrics are no-ops and /metrics is unavailable
+    prometheus_client = None
+
+logger = get_logger(__name__)
+
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2, 4, 8, 15, 30, 60, 120, 300)
+RATE_LIMIT_MARKERS = ("429", "quota", "resource_exhausted", "rate limit")
+
+
+# --- Tracing ---
+
+def _setup_tracer():
+    if trace is None:
+        return None
+    if TRACE_FILE or TRACE_OTLP_ENDPOINT:
+        try:
+            from opentelemetry.sdk.resources import Resource
+            from opentelemetry.sdk.trace import TracerProvider
+            from opentelemetry.sdk.trace.export import BatchSpanProcessor, ConsoleSpanExporter
+        except ImportError:
+            logger.warning("opentelemetry-sdk is not installed; traces will not be exported")
+        else:
+            tracer_provider = TracerProvider(resource=Resource.create({"service.name": TRACE_SERVICE_NAME}))
+            if TRACE_FILE:
+                out = open(TRACE_FILE, "a", encoding="utf-8", buffering=1)  # Line-buffered: workers can share the file
+                exporter = ConsoleSpanExporter(out=out, formatter=lambda s: s.to_json(indent=None) + "\n")
+                tracer_provider.add_span_processor(BatchSpanProcessor(exporter))
+            if TRACE_OTLP_ENDPOINT:
+                try:
+                    from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+                    tracer_provider.add_span_processor(BatchSpanProcessor(OTLPSpanExporter()))
+                except ImportError:
+                    logger.warning("opentelemetry-exporter-otlp is not installed; OTLP trace export disabled")
+            trace.set_tracer_provider(tracer_provider)
+            logger.info("Tracing enabled", extra={"file": TRACE_FILE, "otlp": TRACE_OTLP_ENDPOINT})
+    return trace.get_tracer("geo")
+
+
+_tracer = _setup_tracer()
+
+
+@contextmanager
+def span(name: str, **attributes):
+    """`with span("name", key=value):` — an OpenTelemetry span, or nothing when tracing is unavailable."""
+    if _tracer is None:
+        yield None
+        return
+    attributes = {k: v for k, v in attributes.items() if isinstance(v, (str, bool, int, float))}
+    with _tracer.start_as_current_span(name, attributes=attributes) as current:
+        yield current
+
+
+# --- Metrics ---
+
+class _NoopMetric:
+    def labels(self, *args, **kwargs):
+        return self
+
+    def inc(self, amount: float = 1):
+        pass
+
+    dec = observe = set = inc
+
+
+class _RuntimeCollector:
+    """Executor and fair-scheduler gauges, read from the live objects at scrape time."""
+
+    def describe(self):
+        return []  # Registered at import time, before the executors and schedulers exist
+
+    def collect(self):
+        from app.executors import executor_stats
+        from app.fair_queue import scheduler_stats
+
+        families = {
+            key: GaugeMetricFamily(f"geo_executor_{key}", f"Bounded executor {key} tasks/workers", labels=["executor"])
+            for key in ("workers", "active", "queued", "rejected")
+        }
+        for name, stats in executor_stats().items():
+            for key, family in families.items():
+                family.add_metric([name], stats[key])
+        yield from families.values()
+
+        in_use = GaugeMetricFamily("geo_scheduler_in_use", "Provider slots in use", labels=["provider"])
+        waiting = GaugeMetricFamily("geo_scheduler_waiting", "Provider calls waiting for a slot", labels=["provider", "priority"])
+        for name, stats in scheduler_stats().items():
+            in_use.add_metric([name], stats["in_use"])
+            for priority, tenants in stats["waiting"].items():
+                waiting.add_metric([name, priority], sum(tenants.values()))
+        yield in_use
+        yield waiting
+
+
+if prometheus_client is not None:
+    HTTP_SECONDS = Histogram("geo_http_request_seconds", "HTTP request latency", ["method", "route", "status"], buckets=LATENCY_BUCKETS)
+    HTTP_IN_FLIGHT = Gauge("geo_http_requests_in_flight", "HTTP requests being served", multiprocess_mode="livesum")
+    STAGE_SECONDS = Histogram("geo_stage_seconds", "Pipeline stage latency", ["stage"], buckets=LATENCY_BUCKETS)
+    PROVIDER_SECONDS = Histogram("geo_provider_request_seconds", "Provider call latency", ["provider", "outcome"], buckets=LATENCY_BUCKETS)
+    PROVIDER_IN_FLIGHT = Gauge("geo_provider_requests_in_flight", "Provider calls in flight", ["provider"], multiprocess_mode="livesum")
+    PROVIDER_TOKENS = Counter("geo_provider_tokens", "Tokens reported by providers", ["provider", "direction"])
+    PROVIDER_RETRIES = Counter("geo_provider_retries", "Provider call retries", ["provider", "reason"])
+    PROVIDER_RATE_LIMITED = Counter("geo_provider_rate_limited", "Provider calls rejected with 429 / quota errors", ["provider"])
+    PROVIDER_QUEUE_SECONDS = Histogram("geo_provider_queue_seconds", "Wait for a fair-scheduler provider slot", ["provider"], buckets=LATENCY_BUCKETS)
+    CACHE_REQUESTS = Counter("geo_cache_requests", "Cache lookups", ["cache", "result"])
+    prometheus_client.REGISTRY.register(_RuntimeCollector())
+else:
+    HTTP_SECONDS = HTTP_IN_FLIGHT = STAGE_SECONDS = PROVIDER_SECONDS = PROVIDER_IN_FLIGHT = _NoopMetric()
+    PROVIDER_TOKENS = PROVIDER_RETRIES = PROVIDER_RATE_LIMITED = PROVIDER_QUEUE_SECONDS = CACHE_REQUESTS = _NoopMetric()
+
+
+def is_rate_limit_error(error: Exception) -> bool:
+    err_str = str(error).lower()
+    return any(marker in err_str for marker in RATE_LIMIT_MARKERS)
+
+
+@contextmanager
+def stage(name: str, **attributes):
+    """Span + geo_stage_seconds observation (and profile breakdown entry) around one pipeline stage."""
+    started = time.perf_counter()
+    try:
+        with span(f"stage.{name}", **attributes) as current:
+            yield current
+    finally:
+        elapsed = time.perf_counter() - started
+        STAGE_SECONDS.labels(name).observe(elapsed)
+        record_stage(name, elapsed)
+
+
+class ProviderCall:
+    """Handle yielded by provider_call(); report token usage once the response is in."""
+
+    def __init__(self, provider: str, current_span):
+        self.provider = provider
+        self.span = current_span
+
+    def usage(self, prompt_tokens: Optional[int], completion_tokens: Optional[int]):
+        if prompt_tokens:
+            PROVIDER_TOKENS.labels(self.provider, "prompt").inc(prompt_tokens)
+        if completion_tokens:
+            PROVIDER_TOKENS.labels(self.provider, "completion").inc(completion_tokens)
+        if self.span is not None:
+            self.span.set_attribute("llm.prompt_tokens", prompt_tokens or 0)
+            self.span.set_attribute("llm.completion_tokens", completion_tokens or 0)
+
+
+@contextmanager
+def provider_call(provider: str, **attributes):
+    """Span, latency by outcome, in-flight gauge and 429 count around one provider API call."""
+    in_flight = PROVIDER_IN_FLIGHT.labels(provider)
+    in_flight.inc()
+    started = time.perf_counter()
+    outcome = "ok"
+    try:
+        with span("provider.call", provider=provider, **attributes) as current:
+            yield ProviderCall(provider, current)
+    except Exception as e:
+        outcome = "rate_limited" if is_rate_limit_error(e) else "error"
+        if outcome == "rate_limited":
+            PROVIDER_RATE_LIMITED.labels(provider).inc()
+        raise
+    finally:
+        in_flight.dec()
+        elapsed = time.perf_counter() - started
+        PROVIDER_SECONDS.labels(provider, outcome).observe(elapsed)
+        record_stage(f"provider.{provider}", elapsed)
+
+
+def record_retry(provider: str, reason: str = "rate_limit"):
+    PROVIDER_RETRIES.labels(provider, reason).inc()
+
+
+def record_queue_wait(provider: str, seconds: float):
+    PROVIDER_QUEUE_SECONDS.labels(provider).observe(seconds)
+    record_wait(f"provider_queue.{provider}", seconds)
+
+
+def record_cache(cache: str, hits: int = 0, misses: int = 0):
+    if hits:
+        CACHE_REQUESTS.labels(cache, "hit").inc(hits)
+    if misses:
+        CACHE_REQUESTS.labels(cache, "miss").inc(misses)
+
+
+@contextmanager
+def http_request(method: str, path: str):
+    """
+    Request span + in-flight gauge; yields a callback taking (route, status) that
+    records the latency once the route is resolved (bounded label cardinality).
+    """
+    HTTP_IN_FLIGHT.inc()
+    started = time.perf_counter()
+    try:
+        with span("http.request", **{"http.method": method, "http.target": path}) as current:
+            def finish(route: str, status: int):
+                HTTP_SECONDS.labels(method, route, str(status)).observe(time.perf_counter() - started)
+                if current is not None:
+                    current.set_attribute("http.route", route)
+                    current.set_attribute("http.status_code", status)
+            yield finish
+    finally:
+        HTTP_IN_FLIGHT.dec()
+
+
+def metrics_payload():
+    """(body, content_type) for GET /metrics; None when prometheus_client is not installed."""
+    if prometheus_client is None:
+        return None
+    registry = prometheus_client.REGISTRY
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        registry.register(_RuntimeCollector())
+    return prometheus_client.generate_latest(registry), prometheus_client.CONTENT_TYPE_LATEST
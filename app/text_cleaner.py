@@ -4,6 +4,7 @@
 # footer links, and excessive white space.
 
 import re
+from app.config import JUDGE_MAX_TOKENS, JUDGE_BRAND_CONTEXT_SENTENCES
 
 def clean_text(text: str) -> str:
     """Cleans text by removing excessive whitespace and non-standard characters."""
@@ -40,3 +41,78 @@ def chunk_text(text: str, chunk_size: int = 1000, overlap: int = 100) -> list[st
             
     return chunks
 
+
+# --- Judge input compaction ---
+# The judge only needs list structure, sentences naming companies, and URLs.
+# Everything else in long (grounded) answers is dropped before the judge call.
+
+_LIST_ITEM_RE = re.compile(r"^\s*(?:[-*•]|\d+[.)])\s+")
+_HEADING_RE = re.compile(r"^\s*(?:#{1,6}\s+|\*\*[^*]+\*\*:?\s*$)|:\s*$")
+_URL_RE = re.compile(r"https?://\S+|\b[\w-]+\.(?:com|io|ai|co|net|org|in)\b")
+_ENTITY_RE = re.compile(r"\s[A-Z][\w&.-]*[A-Za-z0-9]")  # Capitalized word after the first one
+_SENTENCE_SPLIT_RE = re.compile(r"(?<=[.!?])\s+")
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token)."""
+    return (len(text) + 3) // 4
+
+def compact_for_judge(text: str, brand_names: list[str], max_tokens: int = None, context_sentences: int = None) -> str:
+    """
+    Shrinks a model response for the judge prompt while keeping what it scores:
+    headings and list items (rank order), sentences naming the brand plus a short
+    window around them, sentences with URLs, and sentences with capitalized entity
+    candidates. Segments are picked by that priority until `max_tokens` is reached
+    and emitted in original order, with "..." marking dropped text.
+    """
+    max_tokens = JUDGE_MAX_TOKENS if max_tokens is None else max_tokens
+    context_sentences = JUDGE_BRAND_CONTEXT_SENTENCES if context_sentences is None else context_sentences
+
+    if not text or estimate_tokens(text) <= max_tokens:
+        return text
+
+    brands = [b.lower() for b in brand_names if b and len(b) > 1]
+
+    # 1. Segment: structural lines stay whole, prose lines are split into sentences
+    segments = []  # (text, is_structural)
+    for line in text.splitlines():
+        if not line.strip():
+            continue
+        if _LIST_ITEM_RE.match(line) or _HEADING_RE.search(line):
+            segments.append((line.strip(), True))
+        else:
+            segments.extend((s.strip(), False) for s in _SENTENCE_SPLIT_RE.split(line) if s.strip())
+
+    # 2. Priority per segment (lower is more important)
+    priority = {}
+    for i, (seg, structural) in enumerate(segments):
+        lower = seg.lower()
+        if any(b in lower for b in brands):
+            for j in range(max(0, i - context_sentences), min(len(segments), i + context_sentences + 1)):
+                priority[j] = min(priority.get(j, 9), 0 if j == i else 1)
+        elif structural:
+            priority[i] = min(priority.get(i, 9), 2)
+        elif _URL_RE.search(seg):
+            priority[i] = min(priority.get(i, 9), 3)
+        elif _ENTITY_RE.search(seg):
+            priority[i] = min(priority.get(i, 9), 4)
+
+    # 3. Select within the budget, then restore original order
+    budget = max_tokens
+    selected = set()
+    for i in sorted(priority, key=lambda k: (priority[k], k)):
+        cost = estimate_tokens(segments[i][0]) + 1
+        if cost > budget:
+            continue
+        selected.add(i)
+        budget -= cost
+
+    lines = []
+    previous = -1
+    for i in sorted(selected):
+        if i != previous + 1:
+            lines.append("...")
+        lines.append(segments[i][0])
+        previous = i
+    if previous != len(segments) - 1:
+        lines.append("...")
+    return "\n".join(lines)
@@ -1,54 +1,121 @@
 # The website_loader immediately branches out. Instead of just looking at the home page, 
 # it uses Concurrency to look at multiple pages at once: /about, /products, /services, and /solutions.
 
+import asyncio
 import requests
+import aiohttp
 from bs4 import BeautifulSoup
 from readability import Document
 from urllib.parse import urljoin
-from concurrent.futures import ThreadPoolExecutor
-from app.config import IMPORTANT_PATHS, DEFAULT_TIMEOUT, MAX_CONCURRENT_REQUESTS
+from typing import AsyncIterator, List, Optional, Tuple
+from app.config import IMPORTANT_PATHS, DEFAULT_TIMEOUT, MAX_CONCURRENT_REQUESTS, OFFLINE_MODE
+from app.executors import crawl_executor, parse_executor
+from app.simulated_provider import simulated_page_text
+from app.recorder import recorder
+from app.structured_logging import get_logger
 
-def fetch_page(session: requests.Session, url: str) -> str:
-    headers = {
-        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
-        "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,*/*;q=0.8"
-    }
-    try:
-        response = session.get(url, timeout=DEFAULT_TIMEOUT, headers=headers)
-        response.raise_for_status()
+logger = get_logger(__name__)
+
+HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,*/*;q=0.8"
+}
+
+def extract_page_text(html: str) -> str:
+    """Readability main-content extraction + text flattening (CPU-bound)."""
+    doc = Document(html)
+    soup = BeautifulSoup(doc.summary(), "html.parser")
+    return soup.get_text(separator=" ", strip=True)
+
+def get_crawl_urls(base_url: str) -> list[str]:
+    return [urljoin(base_url.rstrip("/") + "/", path) for path in IMPORTANT_PATHS]
 
-        doc = Document(response.text)
-        html = doc.summary()
-        soup = BeautifulSoup(html, "html.parser")
+def _get_html(session: requests.Session, url: str) -> str:
+    response = session.get(url, timeout=DEFAULT_TIMEOUT, headers=HEADERS)
+    response.raise_for_status()
+    return response.text
 
-        text = soup.get_text(separator=" ", strip=True)
-        return text
+def fetch_page(session: requests.Session, url: str) -> str:
+    try:
+        # Raw HTML goes through the recorder (GEO_RECORD / GEO_REPLAY); parsing always runs
+        html = recorder.call("crawl", {"url": url}, lambda: _get_html(session, url))
+        return extract_page_text(html)
     except Exception as e:
         # It is normal for some sub-pages explicitly checked to not exist.
         if "404" in str(e):
-            print(f"[INFO] Skipped {url} (Not Found)")
+            logger.info("Skipped page (Not Found)", extra={"url": url})
         else:
-            print(f"[WARNING] Failed to fetch {url}: {e}")
+            logger.warning("Failed to fetch page", extra={"url": url, "error": str(e)})
         return ""
 
 def load_website_content(base_url: str) -> str:
     """Fetches content from multiple important paths of a website concurrently."""
     collected_text = []
-    urls = [urljoin(base_url.rstrip("/") + "/", path) for path in IMPORTANT_PATHS]
+    urls = get_crawl_urls(base_url)
+
+    if OFFLINE_MODE:
+        return "\n".join(simulated_page_text(url) for url in urls)
 
     with requests.Session() as session:
-        # Use ThreadPoolExecutor for concurrent requests
-        with ThreadPoolExecutor(max_workers=MAX_CONCURRENT_REQUESTS) as executor:
-            # Map fetch_page across all URLs
-            results = executor.map(lambda url: fetch_page(session, url), urls)
-            
-            for text in results:
-                if text:
-                    collected_text.append(text)
+        # Fetch concurrently on the shared, bounded crawl pool
+        results = crawl_executor.map(lambda url: fetch_page(session, url), urls)
+
+        for text in results:
+            if text:
+                collected_text.append(text)
 
     if not collected_text:
-        print(f"[ERROR] Could not extract any content from {base_url}")
+        logger.error("Could not extract any content", extra={"url": base_url})
         return ""
 
     return "\n".join(collected_text)
 
+
+async def _get_html_async(session: aiohttp.ClientSession, url: str) -> str:
+    async with session.get(url, headers=HEADERS, ssl=False) as response:
+        response.raise_for_status()
+        return await response.text()
+
+async def fetch_page_async(session: aiohttp.ClientSession, url: str) -> str:
+    """Non-blocking fetch; HTML parsing runs on the parse executor so the event loop stays free."""
+    try:
+        html = await recorder.call_async("crawl", {"url": url}, lambda: _get_html_async(session, url))
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(parse_executor, extract_page_text, html)
+    except Exception as e:
+        if "404" in str(e):
+            logger.info("Skipped page (Not Found)", extra={"url": url})
+        else:
+            logger.warning("Failed to fetch page", extra={"url": url, "error": str(e)})
+        return ""
+
+async def stream_website_content(base_url: str, order: Optional[List[int]] = None) -> AsyncIterator[Tuple[int, str]]:
+    """
+    Async counterpart of load_website_content: yields (path_index, text) for each
+    important path as soon as it has been fetched and parsed, fastest first.
+    Failed or empty pages are yielded with text "" so the consumer knows they are settled.
+    `order` fetches only those path indices and yields them in that order (crawl replay).
+    Pending fetches are cancelled if the consumer stops iterating early.
+    """
+    urls = get_crawl_urls(base_url)
+    indices = list(range(len(urls))) if order is None else [i for i in order if 0 <= i < len(urls)]
+    if OFFLINE_MODE:
+        for idx in indices:
+            yield idx, simulated_page_text(urls[idx])
+        return
+
+    timeout = aiohttp.ClientTimeout(total=DEFAULT_TIMEOUT)
+    connector = aiohttp.TCPConnector(limit=MAX_CONCURRENT_REQUESTS)
+    async with aiohttp.ClientSession(timeout=timeout, connector=connector) as session:
+
+        async def indexed_fetch(idx: int, url: str):
+            return idx, await fetch_page_async(session, url)
+
+        tasks = [asyncio.create_task(indexed_fetch(i, urls[i])) for i in indices]
+        try:
+            for next_done in (asyncio.as_completed(tasks) if order is None else tasks):
+                idx, text = await next_done
+                yield idx, text or ""
+        finally:
+            for task in tasks:
+                task.cancel()
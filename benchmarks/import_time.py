@@ -0,0 +1,73 @@
+# benchmarks/import_time.py
+"""
+Cold-start import cost of the entry points.
+
+Each module is imported in a fresh interpreter (with DATABASE_URL and provider
+keys left as they are in the environment) using `python -X importtime`; the
+report shows the median wall time over several runs and the heaviest imports
+by cumulative time.
+
+Usage:
+    python benchmarks/import_time.py
+    python benchmarks/import_time.py --modules main app.evaluator --top 15
+    python benchmarks/import_time.py --budget 1.5     # exit 1 if any module is slower
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_MODULES = ["main", "server", "app.pipeline", "app.evaluator"]
+
+
+def import_once(module: str):
+    """(wall seconds, [(cumulative_us, self_us, name)]) for one cold import."""
+    started = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT, capture_output=True, text=True,
+    )
+    elapsed = time.perf_counter() - started
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr[-2000:]}")
+
+    entries = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        entries.append((int(cumulative_us), int(self_us), name.rstrip()))
+    return elapsed, entries
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure cold-start import time of the entry points.")
+    parser.add_argument("--modules", nargs="+", default=DEFAULT_MODULES)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--top", type=int, default=10, help="Heaviest imports to list per module")
+    parser.add_argument("--budget", type=float, help="Fail when a module's median import exceeds this many seconds")
+    args = parser.parse_args()
+
+    over_budget = []
+    for module in args.modules:
+        runs = [import_once(module) for _ in range(args.runs)]
+        median = statistics.median(elapsed for elapsed, _ in runs)
+        _, entries = runs[-1]
+        print(f"\n{module}: {median:.3f}s median wall time over {args.runs} run(s)")
+        print(f"  {'cumulative ms':>14}{'self ms':>10}  module")
+        for cumulative_us, self_us, name in sorted(entries, reverse=True)[:args.top]:
+            print(f"  {cumulative_us / 1000:>14.1f}{self_us / 1000:>10.1f}  {name.strip()}")
+        if args.budget is not None and median > args.budget:
+            over_budget.append(f"{module}: {median:.3f}s > {args.budget}s")
+
+    if over_budget:
+        print("\nOver budget:\n  - " + "\n  - ".join(over_budget))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,378 @@
+# benchmarks/load_test.py
+"""
+HTTP load-test harness for server.py with local stand-in upstreams.
+
+Starts three stand-in HTTP servers in this process:
+
+    gemini    POST /{version}/models/{model}:generateContent  (google-genai wire format,
+              grounding metadata for search-grounded calls)
+    openai    POST /v1/chat/completions, /chat/completions     (Cerebras / OpenRouter format,
+              x-ratelimit-* headers)
+    site      GET  /*                                          (company and vendor pages for
+              crawling and metadata enrichment)
+
+each with tunable latency (log-normal), a token-bucket rate limit answered
+with 429s, and an error rate. Then it launches the real API (uvicorn
+server:app) pointed at them via GEMINI_BASE_URL / CEREBRAS_BASE_URL /
+OPENROUTER_BASE_URL, and runs N virtual users through the dashboard's flow:
+
+    /analyze -> 3 x /evaluate-all in parallel (standard, OSS, Google-grounded)
+             -> a few /evaluate-prompt clicks with think time
+
+Reports request latency percentiles and errors per endpoint, event-loop lag
+(from /health/loop), peak executor queue depth and upstream traffic.
+
+Usage:
+    python benchmarks/load_test.py --users 50
+    python benchmarks/load_test.py --users 20 --upstream-latency-ms 1500 --gemini-rps 30
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+
+from aiohttp import ClientSession, ClientTimeout, web
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from app.simulated_provider import simulated_output  # noqa: E402  (content generator shared with the simulated provider)
+
+
+def _percentile(values, q):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+# --- Stand-in upstreams --------------------------------------------------------------
+
+class StandIn:
+    """Latency, rate limiting and error injection shared by the stand-in handlers."""
+
+    def __init__(self, name: str, latency_ms: float, sigma: float, rps: float, error_rate: float):
+        self.name = name
+        self.latency_ms = latency_ms
+        self.sigma = sigma
+        self.rps = rps
+        self.error_rate = error_rate
+        self._tokens = rps
+        self._refilled = time.monotonic()
+        self.counts = defaultdict(int)
+
+    def _take_token(self) -> bool:
+        if self.rps <= 0:
+            return True
+        now = time.monotonic()
+        self._tokens = min(self.rps, self._tokens + (now - self._refilled) * self.rps)
+        self._refilled = now
+        if self._tokens < 1:
+            return False
+        self._tokens -= 1
+        return True
+
+    @property
+    def remaining(self) -> int:
+        return int(self._tokens) if self.rps > 0 else 1000
+
+    async def admit(self):
+        """None to proceed, or the status code to fail with."""
+        self.counts["requests"] += 1
+        if not self._take_token():
+            self.counts["429"] += 1
+            return 429
+        if random.random() < self.error_rate:
+            self.counts["500"] += 1
+            return 500
+        mean = max(self.latency_ms, 1.0)
+        delay = random.lognormvariate(math.log(mean) - self.sigma ** 2 / 2, self.sigma) if self.sigma > 0 else mean
+        await asyncio.sleep(delay / 1000)
+        self.counts["200"] += 1
+        return None
+
+
+def gemini_app(stand_in: StandIn, site_base: str) -> web.Application:
+    async def generate(request):
+        model, _, action = request.match_info["model_action"].partition(":")
+        body = await request.json()
+        status = await stand_in.admit()
+        if status == 429:
+            return web.json_response({"error": {"code": 429, "message": "Resource has been exhausted (e.g. check quota).", "status": "RESOURCE_EXHAUSTED"}}, status=429)
+        if status:
+            return web.json_response({"error": {"code": 500, "message": "Internal error encountered.", "status": "INTERNAL"}}, status=500)
+
+        prompt = "\n".join(part.get("text", "") for content in body.get("contents", []) for part in content.get("parts", []))
+        config = body.get("generationConfig") or {}
+        json_mode = config.get("responseMimeType") == "application/json"
+        search = any("googleSearch" in tool or "google_search" in tool for tool in body.get("tools") or [])
+        text, entries = simulated_output(prompt, json_mode=json_mode, url_base=site_base)
+        candidate = {"content": {"parts": [{"text": text}], "role": "model"}, "finishReason": "STOP", "index": 0}
+        if search:
+            candidate["groundingMetadata"] = {"groundingChunks": [{"web": {"uri": url, "title": name}} for name, url in entries]}
+        return web.json_response({
+            "candidates": [candidate],
+            "usageMetadata": {"promptTokenCount": len(prompt) // 4, "candidatesTokenCount": len(text) // 4},
+            "modelVersion": model,
+        })
+
+    app = web.Application(client_max_size=16 * 1024 * 1024)
+    app.router.add_post("/{version}/models/{model_action}", generate)
+    return app
+
+
+def openai_app(stand_in: StandIn, site_base: str) -> web.Application:
+    async def completions(request):
+        body = await request.json()
+        status = await stand_in.admit()
+        headers = {
+            "x-ratelimit-remaining-requests": str(stand_in.remaining),
+            "x-ratelimit-reset-requests": "1s",
+        }
+        if status == 429:
+            return web.json_response({"error": {"message": "Rate limit exceeded", "type": "rate_limit_exceeded", "code": "429"}}, status=429, headers={**headers, "retry-after": "1"})
+        if status:
+            return web.json_response({"error": {"message": "Internal server error", "type": "server_error"}}, status=500, headers=headers)
+
+        prompt = body["messages"][-1]["content"]
+        json_mode = (body.get("response_format") or {}).get("type") in ("json_object", "json_schema")
+        text, _ = simulated_output(prompt, json_mode=json_mode, url_base=site_base)
+        return web.json_response({
+            "id": f"chatcmpl-{random.getrandbits(48):x}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "stand-in"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": len(prompt) // 4, "completion_tokens": len(text) // 4, "total_tokens": (len(prompt) + len(text)) // 4},
+        }, headers=headers)
+
+    app = web.Application(client_max_size=16 * 1024 * 1024)
+    app.router.add_post("/v1/chat/completions", completions)
+    app.router.add_post("/chat/completions", completions)
+    return app
+
+
+def site_app(stand_in: StandIn) -> web.Application:
+    async def page(request):
+        status = await stand_in.admit()
+        if status:
+            return web.Response(status=status)
+        slug = request.match_info["tail"].split("/")[0] or "home"
+        name = slug.replace("-", " ").title()
+        body = " ".join([f"{name} provides analytics dashboards, workflow automation and integrations for growing teams."] * 20)
+        html = (f"<html><head><title>{name}</title><meta name=\"description\" content=\"{name} - B2B SaaS platform.\">"
+                f"<link rel=\"icon\" href=\"/favicon.ico\"></head><body><article><h1>Welcome to {name}.</h1>"
+                f"<p>Welcome to {name}. {name} is a B2B SaaS company helping startups and enterprises grow.</p><p>{body}</p>"
+                f"</article></body></html>")
+        return web.Response(text=html, content_type="text/html")
+
+    app = web.Application()
+    app.router.add_get("/{tail:.*}", page)
+    return app
+
+
+async def start_app(app: web.Application):
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, f"http://127.0.0.1:{port}"
+
+
+# --- API under test ------------------------------------------------------------------
+
+def launch_api(port: int, env: dict, workers: int) -> subprocess.Popen:
+    subprocess.run([sys.executable, "init_db.py"], cwd=ROOT, env=env, check=True, capture_output=True)
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "server:app", "--host", "127.0.0.1", "--port", str(port),
+         "--workers", str(workers), "--log-level", "warning"],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+    )
+
+
+async def wait_ready(session: ClientSession, base: str, proc: subprocess.Popen, timeout: float = 60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"API exited early:\n{proc.stderr.read().decode()[-2000:]}")
+        try:
+            async with session.get(f"{base}/") as response:
+                if response.status == 200:
+                    return
+        except Exception:
+            pass
+        await asyncio.sleep(0.25)
+    raise RuntimeError("API did not become ready in time")
+
+
+# --- Virtual users -------------------------------------------------------------------
+
+class Stats:
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(lambda: defaultdict(int))
+
+    async def request(self, session: ClientSession, endpoint: str, url: str, payload: dict, headers: dict):
+        started = time.perf_counter()
+        try:
+            async with session.post(url, json=payload, headers=headers) as response:
+                body = await response.read()
+                self.latencies[endpoint].append(time.perf_counter() - started)
+                if response.status != 200:
+                    self.errors[endpoint][str(response.status)] += 1
+                    return None
+                return json.loads(body)
+        except Exception as e:
+            self.latencies[endpoint].append(time.perf_counter() - started)
+            self.errors[endpoint][type(e).__name__] += 1
+            return None
+
+
+async def login(user: int, session: ClientSession, api: str) -> dict:
+    """Signs the virtual user up and logs in; the session token makes it its own fair-scheduling tenant."""
+    credentials = {"email": f"load-user-{user}-{os.getpid()}@example.com", "password": "load-test"}
+    async with session.post(f"{api}/signup", json=credentials) as response:
+        await response.read()
+    async with session.post(f"{api}/login", json=credentials) as response:
+        token = (await response.json()).get("token")
+    return {"Authorization": f"Bearer {token}"} if token else {}
+
+
+async def virtual_user(user: int, session: ClientSession, api: str, site_base: str, stats: Stats, args):
+    await asyncio.sleep(random.uniform(0, args.ramp_seconds))
+    headers = await login(user, session, api)
+
+    analysis = await stats.request(session, "/analyze", f"{api}/analyze",
+                                   {"url": f"{site_base}/company-{user}", "points": "", "region": "India"}, headers)
+    if not analysis:
+        return
+    prompts = analysis["prompts"][:args.prompts]
+    profile = analysis["company_profile"]
+
+    # Dashboard fan-out: standard, OSS and Google-grounded batches in parallel
+    batches = [("gemini", False), ("openrouter", False), ("gemini", True)]
+    await asyncio.gather(*[
+        stats.request(session, "/evaluate-all", f"{api}/evaluate-all",
+                      {"company_profile": profile, "prompts": prompts, "use_google_search": search, "provider": provider}, headers)
+        for provider, search in batches
+    ])
+
+    for _ in range(args.clicks):
+        await asyncio.sleep(random.uniform(0.5, 2.0) * args.think_scale)
+        await stats.request(session, "/evaluate-prompt", f"{api}/evaluate-prompt",
+                            {"company_profile": profile, "prompt": random.choice(prompts), "provider": "gemini"}, headers)
+
+
+async def poll_health(session: ClientSession, api: str, peaks: dict, stop: asyncio.Event):
+    while not stop.is_set():
+        try:
+            async with session.get(f"{api}/health/executors") as response:
+                data = await response.json()
+            for name, gauges in data.get("executors", {}).items():
+                peaks[name] = max(peaks.get(name, 0), gauges["queued"])
+        except Exception:
+            pass
+        try:
+            await asyncio.wait_for(stop.wait(), timeout=1.0)
+        except asyncio.TimeoutError:
+            pass
+
+
+def print_report(stats: Stats, loop_lag: dict, peaks: dict, upstreams, elapsed: float):
+    print(f"\nDuration: {elapsed:.1f}s")
+    header = f"{'endpoint':<18}{'count':>7}{'p50 s':>9}{'p95 s':>9}{'p99 s':>9}{'max s':>9}  errors"
+    print(header)
+    print("-" * (len(header) + 10))
+    for endpoint in ("/analyze", "/evaluate-all", "/evaluate-prompt"):
+        values = stats.latencies.get(endpoint, [])
+        errors = dict(stats.errors.get(endpoint, {}))
+        print(f"{endpoint:<18}{len(values):>7}{_percentile(values, .5):>9.2f}{_percentile(values, .95):>9.2f}"
+              f"{_percentile(values, .99):>9.2f}{max(values, default=0):>9.2f}  {errors or '-'}")
+
+    print(f"\nEvent-loop lag (ms): p50={loop_lag.get('p50_ms')} p95={loop_lag.get('p95_ms')} "
+          f"p99={loop_lag.get('p99_ms')} max={loop_lag.get('max_ms')} ({loop_lag.get('samples')} samples)")
+    print("Peak executor queue depth: " + ", ".join(f"{k}={v}" for k, v in peaks.items()))
+    print("Upstream traffic: " + "; ".join(f"{u.name} {dict(u.counts)}" for u in upstreams))
+
+
+async def main_async(args):
+    gemini = StandIn("gemini", args.upstream_latency_ms, args.upstream_sigma, args.gemini_rps, args.error_rate)
+    openai = StandIn("openai", args.upstream_latency_ms, args.upstream_sigma, args.openai_rps, args.error_rate)
+    site = StandIn("site", args.site_latency_ms, args.upstream_sigma, 0, 0)
+
+    site_runner, site_base = await start_app(site_app(site))
+    gemini_runner, gemini_base = await start_app(gemini_app(gemini, site_base))
+    openai_runner, openai_base = await start_app(openai_app(openai, site_base))
+
+    data_dir = tempfile.mkdtemp(prefix="geo-load-")
+    env = dict(
+        os.environ,
+        GEMINI_API_KEY="stand-in", GEMINI_BASE_URL=gemini_base,
+        CEREBRAS_API_KEY="stand-in", CEREBRAS_BASE_URL=openai_base,
+        OPENROUTER_API_KEY="stand-in", OPENROUTER_BASE_URL=f"{openai_base}/v1",
+        DATABASE_URL=f"sqlite:///{os.path.join(data_dir, 'load.db')}",
+        GEO_DATA_DIR=data_dir,
+    )
+    env.pop("GEO_OFFLINE_MODE", None)
+    api = f"http://127.0.0.1:{args.port}"
+    proc = launch_api(args.port, env, args.workers)
+
+    stats, peaks = Stats(), {}
+    try:
+        async with ClientSession(timeout=ClientTimeout(total=args.request_timeout)) as session:
+            await wait_ready(session, api, proc)
+            async with session.get(f"{api}/health/loop", params={"reset": "true"}):
+                pass
+
+            stop = asyncio.Event()
+            poller = asyncio.create_task(poll_health(session, api, peaks, stop))
+            started = time.perf_counter()
+            await asyncio.gather(*[virtual_user(u, session, api, site_base, stats, args) for u in range(args.users)])
+            elapsed = time.perf_counter() - started
+            stop.set()
+            await poller
+
+            async with session.get(f"{api}/health/loop") as response:
+                loop_lag = await response.json()
+        print_report(stats, loop_lag, peaks, [gemini, openai, site], elapsed)
+    finally:
+        proc.terminate()
+        try:
+            proc.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+        for runner in (gemini_runner, openai_runner, site_runner):
+            await runner.cleanup()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test server.py against local stand-in upstreams.")
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--prompts", type=int, default=20, help="Prompts per /evaluate-all batch")
+    parser.add_argument("--clicks", type=int, default=3, help="/evaluate-prompt clicks per user")
+    parser.add_argument("--ramp-seconds", type=float, default=5.0)
+    parser.add_argument("--think-scale", type=float, default=1.0, help="Multiplier for click think time")
+    parser.add_argument("--upstream-latency-ms", type=float, default=800)
+    parser.add_argument("--upstream-sigma", type=float, default=0.5, help="Log-normal latency spread")
+    parser.add_argument("--site-latency-ms", type=float, default=50)
+    parser.add_argument("--gemini-rps", type=float, default=0, help="Stand-in Gemini rate limit (0 = unlimited)")
+    parser.add_argument("--openai-rps", type=float, default=0, help="Stand-in OpenAI-compatible rate limit (0 = unlimited)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of upstream calls answered with 500")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes")
+    parser.add_argument("--request-timeout", type=float, default=600)
+    args = parser.parse_args()
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
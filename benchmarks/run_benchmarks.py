@@ -0,0 +1,322 @@
+# benchmarks/run_benchmarks.py
+"""
+Pipeline benchmark suite with regression thresholds.
+
+Drives the real pipeline code against local stand-ins — the simulated provider
+(GEO_OFFLINE_MODE) and a local aiohttp server for metadata fetches — so no API
+quota or network is used:
+
+    evaluate_visibility            N prompts
+    enrich_sources_with_metadata   N sources (fetched from the local stand-in server)
+    clean_chunk                    N crawled pages through clean_text + chunk_text
+    summarize_company              N company summaries
+    generate_user_prompts          one prompt set of N prompts (repeated)
+
+for N in 1, 20, 200, 2000. Every case runs in its own subprocess so peak RSS
+and caches are per case. Reported per case: throughput (items/s), p50/p95/p99
+latency per item (ms), peak RSS (MB) and provider call count.
+
+Usage:
+    python benchmarks/run_benchmarks.py                       # run all, compare to baselines
+    python benchmarks/run_benchmarks.py --sizes 1 20          # subset of sizes
+    python benchmarks/run_benchmarks.py --only evaluate_visibility
+    python benchmarks/run_benchmarks.py --update-baselines    # record current numbers
+
+Exits with status 1 when a case regresses beyond the tolerances stored in
+baselines.json. Baselines are machine-specific: record them on the machine
+(or CI runner class) that enforces them.
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines.json")
+
+BENCHMARKS = ["evaluate_visibility", "enrich_sources_with_metadata", "clean_chunk", "summarize_company", "generate_user_prompts"]
+SIZES = [1, 20, 200, 2000]
+
+DEFAULT_TOLERANCES = {
+    "throughput": 0.30,   # Fail if throughput drops by more than 30%
+    "p95_ms": 0.50,       # ... p95 latency grows by more than 50% (single-sample cases are noisy)
+    "peak_rss_mb": 0.20,  # ... peak RSS grows by more than 20%
+    "provider_calls": 0.0,  # Call counts are deterministic: any increase is a regression
+}
+
+# Deterministic simulated provider for the child processes
+BENCH_ENV = {
+    "GEO_OFFLINE_MODE": "1",
+    "SIMULATED_LATENCY_MS": "2",
+    "SIMULATED_LATENCY_SIGMA": "0",
+    "SIMULATED_TOKENS_PER_SECOND": "0",
+    "SIMULATED_RATE_LIMIT_RATE": "0",
+    "SIMULATED_QUOTA_ERROR_RATE": "0",
+    "SIMULATED_SEED": "0",
+}
+
+PAGE_HTML = """<html><head><title>Vendor {i} - Platform</title>
+<meta name="description" content="Vendor {i} builds analytics and automation software for growing teams.">
+<link rel="icon" href="/favicon-{i}.ico"></head>
+<body><nav>Home About Pricing</nav><main>{body}</main><footer>(c) Vendor {i}</footer></body></html>"""
+
+
+def _percentile(values, q):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    k = (len(ordered) - 1) * q
+    lo, hi = int(k), min(int(k) + 1, len(ordered) - 1)
+    return ordered[lo] + (ordered[hi] - ordered[lo]) * (k - lo)
+
+
+def _peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024  # bytes on macOS, KB on Linux
+
+
+# --- Child process: run one case -------------------------------------------------
+
+def _timed(module, name, latencies):
+    """Replace module.name with a wrapper that records each call's latency (sync or async)."""
+    original = getattr(module, name)
+    if asyncio.iscoroutinefunction(original):
+        async def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return await original(*args, **kwargs)
+            finally:
+                latencies.append(time.perf_counter() - start)
+    else:
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return original(*args, **kwargs)
+            finally:
+                latencies.append(time.perf_counter() - start)
+    setattr(module, name, wrapper)
+
+
+def _company():
+    from app.schemas import CompanyUnderstanding
+    return CompanyUnderstanding(
+        company_name="Acme Corp",
+        company_summary="Acme Corp builds analytics software.",
+        industry="B2B SaaS",
+        offerings=["Analytics dashboards", "Workflow automation"],
+        target_users=["startups", "enterprises"],
+        core_problems_solved=["Manual reporting"],
+        url="https://acme-corp.com",
+        region="India",
+    )
+
+
+async def _start_stand_in_server():
+    from aiohttp import web
+
+    body = " ".join(["Analytics and workflow automation for growing teams."] * 40)
+
+    async def page(request):
+        i = request.match_info["i"]
+        return web.Response(text=PAGE_HTML.format(i=i, body=body), content_type="text/html")
+
+    app = web.Application()
+    app.router.add_get("/page/{i}", page)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, f"http://127.0.0.1:{port}"
+
+
+async def _run_case(benchmark: str, size: int) -> dict:
+    import app.ai_client as ai_client
+    import app.evaluator as evaluator
+    import app.site_metadata as site_metadata
+    from app.prompt_generator import generate_user_prompts
+    from app.prompt_library import prompt_library
+    from app.schemas import GeneratedPrompt, SearchSource
+    from app.simulated_provider import simulated_page_text
+    from app.summarizer import summarize_company
+    from app.text_cleaner import clean_text, chunk_text
+
+    provider_calls = [0]
+    simulated = ai_client.generate_simulated_response
+
+    def counted(*args, **kwargs):
+        provider_calls[0] += 1
+        return simulated(*args, **kwargs)
+    ai_client.generate_simulated_response = counted
+
+    latencies = []
+    company = _company()
+    loop = asyncio.get_running_loop()
+    started = time.perf_counter()
+
+    if benchmark == "evaluate_visibility":
+        _timed(evaluator, "evaluate_single_prompt", latencies)
+        prompts = [GeneratedPrompt(prompt_text=f"Best B2B SaaS analytics vendor #{i} for startups in India", intent_category="Unbiased Discovery") for i in range(size)]
+        await evaluator.evaluate_visibility(company, prompts, provider="simulated")
+        items = size
+
+    elif benchmark == "enrich_sources_with_metadata":
+        site_metadata.OFFLINE_MODE = False  # Fetch from the local stand-in instead
+        _timed(site_metadata, "fetch_site_metadata", latencies)
+        runner, base = await _start_stand_in_server()
+        try:
+            sources = [SearchSource(title="Verified Web Source", url=f"{base}/page/{i}") for i in range(size)]
+            await site_metadata.enrich_sources_with_metadata(sources)
+        finally:
+            await runner.cleanup()
+        items = size
+
+    elif benchmark == "clean_chunk":
+        pages = [" \n ".join(simulated_page_text(f"https://vendor{i}.com/about") for _ in range(30)) for i in range(size)]
+        for page in pages:
+            start = time.perf_counter()
+            chunk_text(clean_text(page))
+            latencies.append(time.perf_counter() - start)
+        items = size
+
+    elif benchmark == "summarize_company":
+        chunks = chunk_text(clean_text(" ".join(simulated_page_text("https://acme-corp.com/") for _ in range(50))))
+        for _ in range(size):
+            start = time.perf_counter()
+            await loop.run_in_executor(None, summarize_company, chunks, "", "India", "https://acme-corp.com")
+            latencies.append(time.perf_counter() - start)
+        items = size
+
+    elif benchmark == "generate_user_prompts":
+        repeats = max(3, min(20, 200 // size))
+        items = 0
+        for _ in range(repeats):
+            prompt_library._entries = {}  # Cold library each time, so every run does the same work
+            start = time.perf_counter()
+            items += len(await loop.run_in_executor(None, generate_user_prompts, company, None, size))
+            latencies.append(time.perf_counter() - start)
+
+    else:
+        raise ValueError(f"Unknown benchmark '{benchmark}'")
+
+    elapsed = time.perf_counter() - started
+    return {
+        "benchmark": benchmark,
+        "size": size,
+        "items": items,
+        "seconds": round(elapsed, 4),
+        "throughput": round(items / elapsed, 2) if elapsed else 0.0,
+        "p50_ms": round(_percentile(latencies, 0.50) * 1000, 3),
+        "p95_ms": round(_percentile(latencies, 0.95) * 1000, 3),
+        "p99_ms": round(_percentile(latencies, 0.99) * 1000, 3),
+        "peak_rss_mb": round(_peak_rss_mb(), 1),
+        "provider_calls": provider_calls[0],
+    }
+
+
+def run_child(benchmark: str, size: int):
+    sys.path.insert(0, ROOT)
+    # The app logs every call; keep benchmark output readable
+    with contextlib.redirect_stdout(io.StringIO()):
+        result = asyncio.run(_run_case(benchmark, size))
+    print(json.dumps(result))
+
+
+# --- Parent process: orchestrate, compare, report ----------------------------------
+
+def run_case_subprocess(benchmark: str, size: int, data_dir: str) -> dict:
+    env = dict(os.environ, **BENCH_ENV)
+    env["GEO_DATA_DIR"] = os.path.join(data_dir, f"{benchmark}-{size}")
+    env.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(data_dir, 'bench.db')}")
+    proc = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--child", benchmark, str(size)],
+        capture_output=True, text=True, env=env, cwd=ROOT,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"{benchmark}[{size}] failed:\n{proc.stderr[-2000:]}")
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def load_baselines() -> dict:
+    if os.path.exists(BASELINES_PATH):
+        with open(BASELINES_PATH, "r", encoding="utf-8") as f:
+            return json.load(f)
+    return {"tolerances": DEFAULT_TOLERANCES, "cases": {}}
+
+
+def compare(result: dict, baseline: dict, tolerances: dict) -> list:
+    """Regressions of `result` against `baseline` as human-readable strings."""
+    problems = []
+    tol = {**DEFAULT_TOLERANCES, **tolerances}
+    if baseline.get("throughput") and result["throughput"] < baseline["throughput"] * (1 - tol["throughput"]):
+        problems.append(f"throughput {result['throughput']} < baseline {baseline['throughput']} (-{tol['throughput']:.0%} allowed)")
+    for metric in ("p95_ms", "peak_rss_mb", "provider_calls"):
+        if baseline.get(metric) is not None and result[metric] > baseline[metric] * (1 + tol[metric]):
+            problems.append(f"{metric} {result[metric]} > baseline {baseline[metric]} (+{tol[metric]:.0%} allowed)")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run pipeline benchmarks against local stand-ins.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=SIZES)
+    parser.add_argument("--only", nargs="+", choices=BENCHMARKS, default=BENCHMARKS)
+    parser.add_argument("--update-baselines", action="store_true", help="Store these results as the new baselines")
+    parser.add_argument("--output", help="Also write results as JSON to this path")
+    parser.add_argument("--child", nargs=2, metavar=("BENCHMARK", "SIZE"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.child[0], int(args.child[1]))
+        return
+
+    baselines = load_baselines()
+    results, regressions = [], []
+    header = f"{'case':<38}{'items/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'RSS MB':>9}{'calls':>8}"
+    print(header)
+    print("-" * len(header))
+    with tempfile.TemporaryDirectory() as data_dir:
+        for benchmark in args.only:
+            for size in args.sizes:
+                key = f"{benchmark}[{size}]"
+                result = run_case_subprocess(benchmark, size, data_dir)
+                results.append(result)
+                problems = compare(result, baselines["cases"].get(key, {}), baselines.get("tolerances", {}))
+                status = "REGRESSED" if problems else ""
+                print(f"{key:<38}{result['throughput']:>10}{result['p50_ms']:>10}{result['p95_ms']:>10}{result['p99_ms']:>10}"
+                      f"{result['peak_rss_mb']:>9}{result['provider_calls']:>8}  {status}")
+                regressions.extend(f"{key}: {p}" for p in problems)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+    if args.update_baselines:
+        for result in results:
+            baselines["cases"][f"{result['benchmark']}[{result['size']}]"] = {
+                k: result[k] for k in ("throughput", "p50_ms", "p95_ms", "p99_ms", "peak_rss_mb", "provider_calls")
+            }
+        baselines.setdefault("tolerances", DEFAULT_TOLERANCES)
+        with open(BASELINES_PATH, "w", encoding="utf-8") as f:
+            json.dump(baselines, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"\nBaselines updated: {BASELINES_PATH}")
+        return
+
+    if regressions:
+        print("\nRegressions:")
+        for line in regressions:
+            print(f"  - {line}")
+        sys.exit(1)
+    print("\nNo regressions against baselines.")
+
+
+if __name__ == "__main__":
+    main()
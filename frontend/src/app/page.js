@@ -39,6 +39,12 @@ export default function Home() {
 
   console.log("Home Component User:", user);
 
+  // The session token from /login identifies the user's fair share of provider capacity
+  const apiHeaders = {
+    'Content-Type': 'application/json',
+    ...(user?.token ? { Authorization: `Bearer ${user.token}` } : {}),
+  };
+
   if (authLoading) {
     return (
       <div style={{ height: '100vh', width: '100vw', display: 'flex', alignItems: 'center', justifyContent: 'center', background: '#0f172a' }}>
@@ -98,9 +104,7 @@ export default function Home() {
     try {
       const response = await fetch(`${API_BASE_URL}/analyze`, {
         method: 'POST',
-        headers: {
-          'Content-Type': 'application/json',
-        },
+        headers: apiHeaders,
         body: JSON.stringify({ url, points, region }),
       });
 
@@ -159,7 +163,7 @@ export default function Home() {
       try {
         const response = await fetch(`${API_BASE_URL}/evaluate-all`, {
           method: 'POST',
-          headers: { 'Content-Type': 'application/json' },
+          headers: apiHeaders,
           body: JSON.stringify({
             company_profile: companyProfile,
             prompts: prompts,
@@ -239,7 +243,7 @@ export default function Home() {
     try {
       const response = await fetch(`${API_BASE_URL}/evaluate-prompt`, {
         method: 'POST',
-        headers: { 'Content-Type': 'application/json' },
+        headers: apiHeaders,
         body: JSON.stringify({
           company_profile: result.company_profile,
           prompt: prompt,
@@ -301,8 +305,11 @@ export default function Home() {
     try {
       const response = await fetch(`${API_BASE_URL}/refresh-prompts`, {
         method: 'POST',
-        headers: { 'Content-Type': 'application/json' },
-        body: JSON.stringify(result.company_profile),
+        headers: apiHeaders,
+        body: JSON.stringify({
+          company_profile: result.company_profile,
+          current_prompts: result.prompts.map(({ prompt_text, intent_category }) => ({ prompt_text, intent_category })),
+        }),
       });
 
       if (!response.ok) throw new Error("Failed to refresh prompts");
@@ -333,7 +340,7 @@ export default function Home() {
     try {
       const response = await fetch(`${API_BASE_URL}/bulk-import-prompts`, {
         method: 'POST',
-        headers: { 'Content-Type': 'application/json' },
+        headers: apiHeaders,
         body: JSON.stringify({ prompts }),
       });
 
@@ -38,7 +38,7 @@ export default function AuthView() {
             }
 
             if (isLogin) {
-                setAuthUser(data.user);
+                setAuthUser({ ...data.user, token: data.token });
             } else {
                 // After signup, switch to login or auto-login
                 setIsLogin(true);
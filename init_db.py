@@ -4,12 +4,12 @@ import os
 # Add the project root to sys.path so we can import app modules
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from app.database import engine, Base
+from app.database import get_engine, Base
 from app.models import User
 
 def init_db():
     print("Creating tables in Neon database...")
-    Base.metadata.create_all(bind=engine)
+    Base.metadata.create_all(bind=get_engine())
     print("Tables created successfully!")
 
 if __name__ == "__main__":
@@ -1,7 +1,9 @@
 # main.py
 
 import argparse
+import asyncio
 import logging
+import os
 import sys
 import json
 from app.website_loader import load_website_content
@@ -55,13 +57,52 @@ def run_simple_pipeline(url: str, points: str = ""):
     except Exception as e:
         logger.error(f"Pipeline failed: {e}")
 
+def run_batch_audit(args):
+    """Batch mode: full audit of every company in a CSV/JSONL file, one JSONL report line each."""
+    from app.batch import load_batch_file, run_batch
+
+    items = load_batch_file(args.batch)
+    if not items:
+        logger.error(f"No companies found in {args.batch}")
+        sys.exit(1)
+    output = args.output or os.path.splitext(args.batch)[0] + ".reports.jsonl"
+    logger.info(f"Auditing {len(items)} companies from {args.batch} -> {output}")
+
+    totals = asyncio.run(run_batch(
+        items,
+        output,
+        concurrency=args.concurrency,
+        provider=args.provider,
+        use_google_search=args.search,
+        provider_concurrency=args.provider_concurrency,
+        max_prompts=args.max_prompts,
+        store=args.store,
+    ))
+    logger.info(f"Batch finished: {json.dumps(totals)}")
+    if totals["error"]:
+        sys.exit(2)
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Simple GEO Prompt Pipeline")
     parser.add_argument("url", nargs="?", default="", help="Company website URL")
     parser.add_argument("--points", "-p", default="", help="Manual points/details about the company")
-    
+
+    batch = parser.add_argument_group("batch mode")
+    batch.add_argument("--batch", metavar="FILE", help="CSV (url,points,region) or JSONL of companies to audit end to end")
+    batch.add_argument("--output", "-o", help="Report JSONL (default: <FILE>.reports.jsonl); re-runs resume from it")
+    batch.add_argument("--concurrency", type=int, default=4, help="Companies analyzed (crawl + summarize + prompts) at once")
+    batch.add_argument("--provider-concurrency", type=int, help="Concurrent calls per provider across all companies (default PROVIDER_CONCURRENCY)")
+    batch.add_argument("--provider", default="gemini", help="Evaluation provider")
+    batch.add_argument("--search", action="store_true", help="Evaluate with Google Search grounding")
+    batch.add_argument("--max-prompts", type=int, help="Evaluate only the first N prompts per company")
+    batch.add_argument("--store", action="store_true", help="Also record each audit in the database (needs DATABASE_URL)")
+
     args = parser.parse_args()
-    
+
+    if args.batch:
+        run_batch_audit(args)
+        sys.exit(0)
+
     if not args.url and not args.points:
         logger.error("Please provide either a URL or manual points.")
         sys.exit(1)
@@ -1,22 +1,43 @@
-from fastapi import FastAPI, HTTPException
+import asyncio
+import hmac
+from functools import partial
+from fastapi import FastAPI, HTTPException, Request, Response
 from pydantic import BaseModel
-from typing import List, Optional
+from typing import Dict, List, Optional, Union
 import uvicorn
 from fastapi.middleware.cors import CORSMiddleware
+from starlette.concurrency import run_in_threadpool
 
-from app.website_loader import load_website_content
-from app.text_cleaner import clean_text, chunk_text
-from app.summarizer import summarize_company
-from app.prompt_generator import generate_user_prompts
-from app.evaluator import evaluate_visibility
+from app.pipeline import analyze_pipeline
+from app.prompt_generator import regenerate_prompts
+from app.evaluator import evaluate_visibility, evaluate_prompts
+from app.incremental_audit import evaluate_visibility_incremental
+from app.config import AUDIT_FRESHNESS_HOURS, ADMIN_TOKEN, MONITOR_ENABLED
 from app.database import get_db
 from sqlalchemy.orm import Session
 from fastapi import Depends
-from app.models import User
-from app.auth_utils import get_password_hash, verify_password
-from app.schemas import CompanyUnderstanding, GeneratedPrompt, ModelResponse, VisibilityReport, UserCreate, UserResponse, LoginRequest
+from app.models import User, MonitoringSchedule
+from app.audit_store import record_audit, list_audits, share_of_voice
+from app.rollups import get_trends
+from app.auth_utils import get_password_hash, verify_password, create_session_token, verify_session_token
+from app.schemas import CompanyUnderstanding, GeneratedPrompt, ModelResponse, VisibilityReport, CompactVisibilityReport, UserCreate, UserResponse, LoginRequest
+from app.report_format import to_compact_report
+from app.responses import ORJSONModelResponse, add_compression
+from app.executors import ExecutorSaturated, executor_stats, password_executor, provider_executor
+from app.ai_client import has_provider
+from app.provider_health import provider_health
+from app.loop_monitor import loop_monitor
+from app.fair_queue import current_tenant, current_priority, provider_slot, scheduler_stats, INTERACTIVE, DEFAULT_TENANT
+from app.telemetry import http_request, metrics_payload
+from app.structured_logging import get_logger, set_log_context, new_audit_id
+from app.profiling import profile_request, save_profile, list_profiles, load_profile, load_folded
+from app.monitoring import monitoring_scheduler, create_schedule, schedule_to_dict, list_runs, plan_summary
+from app.database import DATABASE_URL
 
-app = FastAPI(title="GEO Analytics API")
+logger = get_logger("app.api")  # Under app.* so records go through the structured logger
+
+app = FastAPI(title="GEO Analytics API", default_response_class=ORJSONModelResponse)
+add_compression(app)
 
 # Enable CORS for frontend
 app.add_middleware(
@@ -27,28 +48,147 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.on_event("startup")
+async def start_loop_monitor():
+    loop_monitor.start()
+
+@app.on_event("shutdown")
+async def stop_loop_monitor():
+    loop_monitor.stop()
+
+@app.on_event("startup")
+async def start_monitoring_scheduler():
+    # Recurring monitoring audits (app.monitoring); needs the database for schedules and runs
+    if MONITOR_ENABLED and DATABASE_URL:
+        monitoring_scheduler.start()
+
+@app.on_event("shutdown")
+async def stop_monitoring_scheduler():
+    monitoring_scheduler.stop()
+
+def request_tenant(request: Request) -> str:
+    # Logged-in users are identified by their signed session token; anyone else by client IP
+    scheme, _, token = request.headers.get("Authorization", "").partition(" ")
+    user_id = verify_session_token(token) if scheme.lower() == "bearer" and token else None
+    if user_id is not None:
+        return f"user:{user_id}"
+    return f"ip:{request.client.host}" if request.client else DEFAULT_TENANT
+
+@app.middleware("http")
+async def tenant_context(request: Request, call_next):
+    # Provider calls are scheduled fairly per tenant (app.fair_queue)
+    tenant = request_tenant(request)
+    token = current_tenant.set(tenant)
+    try:
+        return await call_next(request)
+    finally:
+        current_tenant.reset(token)
+
+@app.middleware("http")
+async def request_telemetry(request: Request, call_next):
+    # Request span, latency histogram and in-flight gauge (app.telemetry)
+    with http_request(request.method, request.url.path) as finish:
+        response = await call_next(request)
+        route = getattr(request.scope.get("route"), "path", "unmatched")  # Templated path: bounded label values
+        finish(route, response.status_code)
+        return response
+
+def is_admin(request: Request) -> bool:
+    # Profiling and /admin are disabled unless ADMIN_TOKEN is set
+    token = request.headers.get("X-Admin-Token")
+    return bool(ADMIN_TOKEN and token and hmac.compare_digest(token, ADMIN_TOKEN))
+
+def require_admin(request: Request):
+    if not is_admin(request):
+        raise HTTPException(status_code=403, detail="Admin token required")
+
+@app.middleware("http")
+async def request_profiling(request: Request, call_next):
+    # On-demand sampling profile + stage/wait breakdown of one request (app.profiling)
+    flag = request.headers.get("X-Profile") or request.query_params.get("profile")
+    if not flag or flag.lower() in ("0", "false", "no"):
+        return await call_next(request)
+    if not is_admin(request):
+        return ORJSONModelResponse({"detail": "Profiling requires a valid X-Admin-Token"}, status_code=403)
+    with profile_request(request.method, request.url.path) as profile:
+        response = await call_next(request)
+    await asyncio.get_running_loop().run_in_executor(None, save_profile, profile)
+    response.headers["X-Profile-Id"] = profile.id
+    logger.info("Request profiled", extra={"profile_id": profile.id, "path": request.url.path, "samples": profile.samples})
+    return response
+
+@app.exception_handler(ExecutorSaturated)
+async def executor_saturated_handler(request: Request, exc: ExecutorSaturated):
+    # Fast rejection when a workload's executor queue is full
+    return ORJSONModelResponse({"detail": str(exc)}, status_code=503, headers={"Retry-After": "1"})
+
 @app.get("/")
 def health_check():
     return {"status": "ok", "message": "GEO Analytics API is running"}
 
+@app.get("/health/executors")
+def health_executors():
+    return {"executors": executor_stats(), "schedulers": scheduler_stats()}
+
+@app.get("/health/loop")
+def health_loop(reset: bool = False):
+    stats = loop_monitor.stats()
+    if reset:
+        loop_monitor.reset()
+    return stats
+
+@app.get("/health/providers")
+def health_providers():
+    return provider_health.snapshot()
+
+@app.get("/metrics")
+def metrics():
+    payload = metrics_payload()
+    if payload is None:
+        raise HTTPException(status_code=501, detail="prometheus_client is not installed")
+    body, content_type = payload
+    return Response(content=body, media_type=content_type)
+
+@app.get("/admin/profiles", dependencies=[Depends(require_admin)])
+def admin_profiles(limit: int = 50):
+    return {"profiles": list_profiles(limit)}
+
+@app.get("/admin/profiles/{profile_id}", dependencies=[Depends(require_admin)])
+def admin_profile(profile_id: str):
+    profile = load_profile(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return profile
+
+@app.get("/admin/profiles/{profile_id}/folded", dependencies=[Depends(require_admin)])
+def admin_profile_folded(profile_id: str):
+    # Folded stacks: `flamegraph.pl profile.folded > profile.svg`, or drop into speedscope
+    folded = load_folded(profile_id)
+    if folded is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return Response(content=folded, media_type="text/plain")
+
+def find_user(db: Session, email: str) -> Optional[User]:
+    return db.query(User).filter(User.email == email).first()
+
+def create_user(db: Session, email: str, hashed_password: str, full_name: Optional[str]) -> User:
+    new_user = User(email=email, hashed_password=hashed_password, full_name=full_name)
+    db.add(new_user)
+    db.commit()
+    db.refresh(new_user)
+    return new_user
+
 @app.post("/signup", response_model=UserResponse)
-def signup(user_data: UserCreate, db: Session = Depends(get_db)):
-    # Check if user already exists
-    existing_user = db.query(User).filter(User.email == user_data.email).first()
+async def signup(user_data: UserCreate, db: Session = Depends(get_db)):
+    # Check if user already exists (DB calls on the threadpool, off the event loop)
+    existing_user = await run_in_threadpool(find_user, db, user_data.email)
     if existing_user:
         raise HTTPException(status_code=400, detail="Email already registered")
     
-    # Hash password and create user
-    hashed_pwd = get_password_hash(user_data.password)
-    new_user = User(
-        email=user_data.email,
-        hashed_password=hashed_pwd,
-        full_name=user_data.full_name
-    )
-    
-    db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+    # Hash password and create user (bcrypt runs on its own pool so audits can't starve logins)
+    loop = asyncio.get_running_loop()
+    hashed_pwd = await loop.run_in_executor(password_executor, get_password_hash, user_data.password)
+    new_user = await run_in_threadpool(create_user, db, user_data.email, hashed_pwd, user_data.full_name)
     
     # Format created_at for response
     return {
@@ -59,14 +199,16 @@ def signup(user_data: UserCreate, db: Session = Depends(get_db)):
     }
 
 @app.post("/login")
-def login(request: LoginRequest, db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.email == request.email).first()
-    if not user or not verify_password(request.password, user.hashed_password):
+async def login(request: LoginRequest, db: Session = Depends(get_db)):
+    user = await run_in_threadpool(find_user, db, request.email)
+    loop = asyncio.get_running_loop()
+    if not user or not await loop.run_in_executor(password_executor, verify_password, request.password, user.hashed_password):
         raise HTTPException(status_code=401, detail="Invalid email or password")
     
     return {
         "status": "success",
         "message": "Login successful",
+        "token": create_session_token(user.id),  # Sent back as "Authorization: Bearer"; identifies the user's fair share
         "user": {
             "id": user.id,
             "email": user.email,
@@ -84,6 +226,7 @@ class AnalysisResponse(BaseModel):
     industry: str
     prompts: List[GeneratedPrompt]
     company_profile: CompanyUnderstanding # Added to help with evaluation later
+    timings: Dict[str, float] = {}  # Seconds per pipeline stage (crawl, summarize, generate_prompts, total)
 
 class EvaluatePromptRequest(BaseModel):
     company_profile: CompanyUnderstanding
@@ -97,30 +240,44 @@ async def analyze_company(request: AnalysisRequest):
         raise HTTPException(status_code=400, detail="Missing url or points")
     
     try:
-        raw_text = ""
-        if request.url:
-            raw_text = load_website_content(request.url)
-        
-        clean = clean_text(raw_text)
-        chunks = chunk_text(clean)
-        
-        company_profile = summarize_company(chunks, manual_points=request.points, region=request.region, url=request.url)
-        prompts = generate_user_prompts(company_profile)
+        company_profile, prompts, timings = await analyze_pipeline(request.url, request.points, request.region)
         
-        return AnalysisResponse(
+        return ORJSONModelResponse(AnalysisResponse.model_construct(
             company_name=company_profile.company_name,
             industry=company_profile.industry,
             prompts=prompts,
-            company_profile=company_profile
-        )
+            company_profile=company_profile,
+            timings=timings
+        ))
+    except ExecutorSaturated:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+class RefreshPromptsRequest(BaseModel):
+    company_profile: CompanyUnderstanding
+    current_prompts: List[GeneratedPrompt] = []
+    replace_categories: Optional[List[str]] = None  # Only replace prompts in these categories (default: all)
+    count: Optional[int] = None  # Replace at most this many prompts
+    exclude: List[str] = []  # Prompts that must not come back (e.g. previously rejected)
+
 @app.post("/refresh-prompts", response_model=List[GeneratedPrompt])
-async def refresh_prompts(company_profile: CompanyUnderstanding):
+async def refresh_prompts(request: RefreshPromptsRequest):
     try:
-        # Simply call the generator again for a fresh set
-        return generate_user_prompts(company_profile)
+        # Only the requested delta is generated; the rest of the current set is kept
+        loop = asyncio.get_running_loop()
+        provider = "cerebras" if has_provider("cerebras") else "gemini"
+        async with provider_slot(provider):
+            return await loop.run_in_executor(provider_executor, partial(
+                regenerate_prompts,
+                request.company_profile,
+                request.current_prompts,
+                replace_categories=request.replace_categories,
+                count=request.count,
+                exclude=request.exclude
+            ))
+    except ExecutorSaturated:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -137,14 +294,18 @@ async def bulk_import_prompts(request: BulkImportRequest):
 @app.post("/evaluate-prompt", response_model=ModelResponse)
 async def evaluate_prompt(request: EvaluatePromptRequest):
     try:
-        # evaluate_visibility expects a list, so we wrap it
-        report = await evaluate_visibility(
+        # Interactive: served ahead of bulk audits by the fair scheduler.
+        # Only the response + judge are needed here, not the report summary call.
+        current_priority.set(INTERACTIVE)
+        results = await evaluate_prompts(
             request.company_profile, 
             [request.prompt], 
             use_google_search=request.use_google_search,
             provider=request.provider
         )
-        return report.model_results[0]
+        return ORJSONModelResponse(results[0])
+    except ExecutorSaturated:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -153,19 +314,103 @@ class EvaluateAllRequest(BaseModel):
     prompts: List[GeneratedPrompt]
     use_google_search: bool = False
     provider: str = "gemini"
+    incremental: bool = False  # Reuse fresh stored results and return a diff vs. the previous audit
+    freshness_hours: float = AUDIT_FRESHNESS_HOURS
 
-@app.post("/evaluate-all", response_model=VisibilityReport)
-async def evaluate_all(request: EvaluateAllRequest):
+@app.post("/evaluate-all", response_model=Union[VisibilityReport, CompactVisibilityReport])
+async def evaluate_all(request: EvaluateAllRequest, format: str = "full"):
+    # Correlates every log record of this audit (prompt evaluations, report, persistence)
+    set_log_context(audit_id=new_audit_id(), provider=request.provider)
     try:
-        report = await evaluate_visibility(
-            request.company_profile, 
-            request.prompts, 
-            use_google_search=request.use_google_search,
-            provider=request.provider
-        )
-        return report
+        if request.incremental:
+            report = await evaluate_visibility_incremental(
+                request.company_profile,
+                request.prompts,
+                use_google_search=request.use_google_search,
+                provider=request.provider,
+                freshness_hours=request.freshness_hours
+            )
+        else:
+            report = await evaluate_visibility(
+                request.company_profile, 
+                request.prompts, 
+                use_google_search=request.use_google_search,
+                provider=request.provider
+            )
+        # Persist for history / trends (single transaction, off the event loop)
+        loop = asyncio.get_running_loop()
+        report.audit_id = await loop.run_in_executor(None, partial(
+            record_audit, request.company_profile, request.prompts, report, request.provider, request.use_google_search
+        ))
+        logger.info("Audit completed", extra={"stored_audit_id": report.audit_id, "prompts": len(request.prompts), "overall_score": report.overall_score})
+        # ?format=compact: sources serialized once in a top-level table, referenced by index
+        # Reports are built internally: skip response_model re-validation, serialize with orjson
+        if format == "compact":
+            return ORJSONModelResponse(to_compact_report(report))
+        return ORJSONModelResponse(report)
+    except ExecutorSaturated:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/audits")
+def get_audits(company: str, limit: int = 20, db: Session = Depends(get_db)):
+    return list_audits(db, company, limit=min(limit, 200))
+
+@app.get("/share-of-voice")
+def get_share_of_voice(company: str, days: int = 90, limit: int = 10, db: Session = Depends(get_db)):
+    return share_of_voice(db, company, days=days, limit=limit)
+
+@app.get("/trends")
+def get_visibility_trends(company: str, days: int = 90, granularity: str = "day", provider: Optional[str] = None, db: Session = Depends(get_db)):
+    try:
+        return get_trends(db, company, days=days, granularity=granularity, provider=provider)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+class MonitoringScheduleRequest(BaseModel):
+    company: str
+    url: str = ""
+    points: str = ""
+    region: str = "Global"
+    provider: str = "gemini"
+    use_google_search: bool = False
+    cron: str = "@daily"  # UTC
+    jitter_seconds: int = 300
+    window_minutes: int = 120
+
+@app.post("/monitoring/schedules", dependencies=[Depends(require_admin)])
+def create_monitoring_schedule(request: MonitoringScheduleRequest, db: Session = Depends(get_db)):
+    if not request.url and not request.points:
+        raise HTTPException(status_code=400, detail="Provide a url or points")
+    try:
+        schedule = create_schedule(db, **request.model_dump())
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return schedule_to_dict(schedule)
+
+@app.get("/monitoring/schedules", dependencies=[Depends(require_admin)])
+def get_monitoring_schedules(db: Session = Depends(get_db)):
+    schedules = db.query(MonitoringSchedule).order_by(MonitoringSchedule.id).all()
+    return {"schedules": [schedule_to_dict(s) for s in schedules], "scheduler": monitoring_scheduler.stats()}
+
+@app.delete("/monitoring/schedules/{schedule_id}", dependencies=[Depends(require_admin)])
+def disable_monitoring_schedule(schedule_id: int, db: Session = Depends(get_db)):
+    # Disabled rather than deleted, so run history stays linked
+    schedule = db.get(MonitoringSchedule, schedule_id)
+    if schedule is None:
+        raise HTTPException(status_code=404, detail="Schedule not found")
+    schedule.enabled = False
+    db.commit()
+    return schedule_to_dict(schedule)
+
+@app.get("/monitoring/schedules/{schedule_id}/runs", dependencies=[Depends(require_admin)])
+def get_monitoring_runs(schedule_id: int, limit: int = 50, db: Session = Depends(get_db)):
+    return list_runs(db, schedule_id, limit=min(limit, 500))
+
+@app.get("/monitoring/plan", dependencies=[Depends(require_admin)])
+def get_monitoring_plan(db: Session = Depends(get_db)):
+    return plan_summary(db)
+
 if __name__ == "__main__":
     uvicorn.run(app, host="0.0.0.0", port=8000)